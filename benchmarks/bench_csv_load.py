@@ -0,0 +1,137 @@
+"""
+Memory and time report of the Kaggle csv ingestion: untyped csv reads, schema
+csv reads and reads of the staged parquet cache
+
+Each read runs in its own process so that its peak RSS is measured alone.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_csv_load.py [--rows 500000] [--folder DIR]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import synthetic  # noqa: E402
+from delivery_insights.loader.cache import read_cache, stage_file  # noqa: E402
+from delivery_insights.loader.schema import (  # noqa: E402
+    ACCIDENT_INFORMATION,
+    VEHICLE_INFORMATION,
+    read_csv,
+)
+
+
+def write_files(folder: str, rows: int) -> None:
+    """
+    Write synthetic Kaggle csv files if they are missing
+
+    :param folder:
+    :param rows:
+    :return:
+    """
+    if os.path.exists(os.path.join(folder, VEHICLE_INFORMATION)):
+        return
+    accidents = synthetic.accident_information(rows)
+    accidents.to_csv(os.path.join(folder, ACCIDENT_INFORMATION), index=False)
+    synthetic.vehicle_information(accidents).to_csv(
+        os.path.join(folder, VEHICLE_INFORMATION), index=False, encoding="ISO-8859-1"
+    )
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process
+
+    :return:
+    """
+    # ru_maxrss survives exec on linux, VmHWM is reset with the address space
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1e3
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def read(folder: str, variant: str) -> dict:
+    """
+    Read and merge both files like main.main and report usage
+
+    :param folder:
+    :param variant: "untyped", "schema" or "parquet"
+    :return:
+    """
+    start = time.perf_counter()
+    if variant == "untyped":
+        accident_info = pd.read_csv(os.path.join(folder, ACCIDENT_INFORMATION))
+        vehicle_info = pd.read_csv(
+            os.path.join(folder, VEHICLE_INFORMATION), encoding="ISO-8859-1"
+        )
+    elif variant == "schema":
+        accident_info = read_csv(os.path.join(folder, ACCIDENT_INFORMATION))
+        vehicle_info = read_csv(os.path.join(folder, VEHICLE_INFORMATION))
+    else:
+        accident_info = read_cache(folder, ACCIDENT_INFORMATION)
+        vehicle_info = read_cache(folder, VEHICLE_INFORMATION)
+    load_time = time.perf_counter() - start
+
+    data = accident_info.merge(vehicle_info, on=["Accident_Index", "Year"], how="inner")
+    return {
+        "variant": variant,
+        "load_s": round(load_time, 2),
+        "frames_mb": round(
+            (
+                accident_info.memory_usage(deep=True).sum()
+                + vehicle_info.memory_usage(deep=True).sum()
+            )
+            / 1e6,
+            1,
+        ),
+        "merged_mb": round(data.memory_usage(deep=True).sum() / 1e6, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    """
+    Main function
+    :return:
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", help="synthetic accidents", type=int, default=500_000)
+    parser.add_argument("--folder", help="folder with Kaggle csv files", type=str)
+    parser.add_argument("--variant", help=argparse.SUPPRESS, type=str)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(read(args.folder, args.variant)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.folder or tmp
+        write_files(folder, args.rows)
+        for filename in [ACCIDENT_INFORMATION, VEHICLE_INFORMATION]:
+            stage_file(folder, filename)
+        reports = []
+        for variant in ["untyped", "schema", "parquet"]:
+            output = subprocess.run(
+                [sys.executable, __file__, "--folder", folder, "--variant", variant],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            reports.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(pd.DataFrame(reports).set_index("variant").T.to_string())
+
+
+if __name__ == "__main__":
+    main()
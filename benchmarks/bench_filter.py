@@ -0,0 +1,136 @@
+"""
+Benchmark Accidents.filter_data mask filter against the former in place drop
+
+Peak memory is the peak of allocations traced by tracemalloc during the call,
+which numpy and pandas buffers report to.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_filter.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import synthetic  # noqa: E402
+from delivery_insights.loader.schema import coerce_dtypes  # noqa: E402
+from delivery_insights.models.accidents import Accidents  # noqa: E402
+from delivery_insights.models.filters import Filter  # noqa: E402
+
+WEATHER_CONDITIONS = ["Unknown", "Data missing or out of range"]
+AGE_CONDITIONS = {
+    "Age_band_of_vehicule": ["Data missing"],
+    "Age_Band_of_Driver": ["Data missing or out of range"],
+}
+
+
+def drop_filter_data(data, column: str, filter_conditions=None):
+    """
+    Former Accidents.filter_data, dropping rows of data in place
+
+    :param data:
+    :param column:
+    :param filter_conditions:
+    :return:
+    """
+    if filter_conditions:
+        if isinstance(filter_conditions, list):
+            data.drop(
+                data[data[column].isin(filter_conditions)].index,
+                axis=0,
+                inplace=True,
+            )
+        elif isinstance(filter_conditions, str):
+            data.drop(
+                data[data[column] == filter_conditions].index,
+                axis=0,
+                inplace=True,
+            )
+
+    return data
+
+
+def drop_share_count(data: pd.DataFrame, cols: list, filter_conditions: dict):
+    """
+    Former Accidents.get_accidents_share_count counting, dropping filtered
+    values after the aggregation
+
+    :param data:
+    :param cols:
+    :param filter_conditions:
+    :return:
+    """
+    counts = data.groupby(cols, observed=True).size().sort_index()
+    for key, values in filter_conditions.items():
+        counts = counts.drop(values, level=key)
+    return counts
+
+
+def measured(fct, *args, **kwargs) -> dict:
+    """
+    Run fct and report its duration and traced peak memory
+
+    :param fct:
+    :return:
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fct(*args, **kwargs)
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"result": result, "time_s": round(duration, 3), "peak_mb": peak / 1e6}
+
+
+def main() -> None:
+    """
+    Main function
+    :return:
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", help="synthetic accidents", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    data = Accidents.transform(coerce_dtypes(synthetic.merged_data(args.rows)))
+    rows = len(data)
+    frame_mb = data.memory_usage(deep=True).sum() / 1e6
+    cols = ["Age_band_of_vehicule", "Age_Band_of_Driver"]
+
+    reports = {
+        "filter_data drop": measured(
+            drop_filter_data, data.copy(), "Weather_Conditions", WEATHER_CONDITIONS
+        ),
+        "filter_data mask": measured(
+            Accidents.filter_data, data, "Weather_Conditions", WEATHER_CONDITIONS
+        ),
+        "mask indices": measured(
+            Filter().drop("Weather_Conditions", WEATHER_CONDITIONS).indices, data
+        ),
+        "share count drop": measured(drop_share_count, data, cols, AGE_CONDITIONS),
+        "share count mask": measured(
+            Accidents.get_accidents_share_count, data, cols, AGE_CONDITIONS
+        ),
+    }
+    assert len(data) == rows
+    assert reports["filter_data drop"]["result"].equals(
+        reports["filter_data mask"]["result"]
+    )
+
+    print(f"rows: {rows}, frame: {frame_mb:.1f} MB")
+    print(
+        pd.DataFrame(
+            {
+                name: {k: v for k, v in r.items() if k != "result"}
+                for name, r in reports.items()
+            }
+        ).T.to_string()
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark Accidents.transform banding against the former per-row apply path
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_transform.py [--rows 2000000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.utils.fct import set_daytime_bands, set_vehicule_age_bands
+
+
+def synthetic_data(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Create a frame with the columns used by Accidents.transform
+
+    :param rows:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(0, 30, rows).astype("float64")
+    ages[rng.random(rows) < 0.1] = np.nan
+    minutes = rng.integers(0, 24 * 60, rows)
+    return pd.DataFrame(
+        {
+            "Accident_date": pd.Timestamp("2005-01-01")
+            + pd.to_timedelta(rng.integers(0, 4748, rows), unit="D"),
+            "Time": [f"{m // 60:02d}:{m % 60:02d}" for m in minutes],
+            "Age_of_Vehicle": ages,
+        }
+    )
+
+
+def apply_transform(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Former Accidents.transform, banding with one python call per row
+
+    :param data:
+    :return:
+    """
+    data["Accident_date"] = pd.to_datetime(data["Accident_date"], format="%Y-%m-%d")
+    data["Hour"] = pd.to_numeric(data["Time"].str[0:2])
+    data = data.dropna(subset=["Hour"])
+    data["Hour"] = data["Hour"].astype("int")
+    data["Daytime"] = data["Hour"].apply(set_daytime_bands)
+    data["Age_band_of_vehicule"] = data["Age_of_Vehicle"].apply(set_vehicule_age_bands)
+    return data
+
+
+def timed(fct, data: pd.DataFrame):
+    """
+    Run fct on a copy of data and return its result and duration
+
+    :param fct:
+    :param data:
+    :return:
+    """
+    data = data.copy()
+    start = time.perf_counter()
+    result = fct(data)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    Main function
+    :return:
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", help="synthetic rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    data = synthetic_data(args.rows)
+
+    applied, apply_time = timed(apply_transform, data)
+    vectorized, transform_time = timed(Accidents.transform, data)
+
+    for column in ["Daytime", "Age_band_of_vehicule"]:
+        assert applied[column].tolist() == vectorized[column].astype(str).tolist()
+
+    print(f"rows: {args.rows}")
+    print(f"Accidents.transform with apply: {apply_time:.2f}s")
+    print(f"Accidents.transform vectorized: {transform_time:.2f}s")
+    print(
+        "bands memory: "
+        f"{applied[['Daytime', 'Age_band_of_vehicule']].memory_usage(deep=True).sum() / 1e6:.1f} MB"
+        " -> "
+        f"{vectorized[['Daytime', 'Age_band_of_vehicule']].memory_usage(deep=True).sum() / 1e6:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
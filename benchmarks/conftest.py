@@ -0,0 +1,107 @@
+"""
+Fixtures of the benchmark suite: seeded synthetic Kaggle files staged in a
+session folder, and the merged, transformed and counted accidents read back
+from them
+
+Usage (from the repository root):
+    PYTHONPATH=. pytest benchmarks [--bench-rows 10000]
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_csv_load import write_files  # noqa: E402
+from delivery_insights.loader.cache import read_source, stage_file  # noqa: E402
+from delivery_insights.loader.merge import merge_sources  # noqa: E402
+from delivery_insights.loader.schema import (  # noqa: E402
+    ACCIDENT_INFORMATION,
+    VEHICLE_INFORMATION,
+)
+from delivery_insights.models.accidents import Accidents  # noqa: E402
+from delivery_insights.models.cube import AccidentsCube  # noqa: E402
+
+
+def pytest_addoption(parser):
+    """
+    Add the dataset size option
+
+    :param parser:
+    :return:
+    """
+    parser.addoption(
+        "--bench-rows",
+        help="Synthetic accidents, e.g 10000, 1000000 or 5000000, vehicles are "
+        "about 1.8 times more",
+        default=10_000,
+        type=int,
+    )
+
+
+def pytest_report_header(config):
+    """
+    Show the dataset size of the run
+
+    :param config:
+    :return:
+    """
+    return f"synthetic accidents: {config.getoption('--bench-rows')}"
+
+
+@pytest.fixture(scope="session")
+def bench_rows(request) -> int:
+    """
+    Number of synthetic accidents
+
+    :return:
+    """
+    return request.config.getoption("--bench-rows")
+
+
+@pytest.fixture(scope="session")
+def staged_folder(tmp_path_factory, bench_rows) -> str:
+    """
+    Folder with synthetic csv files and their staged parquet cache
+
+    :return:
+    """
+    folder = str(tmp_path_factory.mktemp(f"accidents-{bench_rows}"))
+    write_files(folder, bench_rows)
+    for filename in [ACCIDENT_INFORMATION, VEHICLE_INFORMATION]:
+        stage_file(folder, filename)
+    return folder
+
+
+@pytest.fixture(scope="session")
+def merged(staged_folder):
+    """
+    Merged accidents and vehicles, as read by main in memory join mode
+
+    :return:
+    """
+    return merge_sources(
+        read_source(staged_folder, ACCIDENT_INFORMATION),
+        read_source(staged_folder, VEHICLE_INFORMATION),
+    )
+
+
+@pytest.fixture(scope="session")
+def transformed(merged):
+    """
+    Merged data transformed by Accidents.transform
+
+    :return:
+    """
+    return Accidents.transform(merged.copy())
+
+
+@pytest.fixture(scope="session")
+def cube(transformed) -> AccidentsCube:
+    """
+    Accidents cube of the transformed data
+
+    :return:
+    """
+    return AccidentsCube.from_data(transformed)
@@ -0,0 +1,367 @@
+"""
+Seeded generator of synthetic Accident_Information/Vehicle_Information frames
+
+Frames use the Kaggle dataset column names, category vocabularies and the
+2005-2017 date range so that benchmarks run fully offline.
+"""
+import numpy as np
+import pandas as pd
+
+START_DATE = pd.Timestamp("2005-01-01")
+END_DATE = pd.Timestamp("2017-12-31")
+
+VOCABULARIES = {
+    "Accident_Severity": (["Fatal", "Serious", "Slight"], [0.013, 0.137, 0.85]),
+    "Weather_Conditions": (
+        [
+            "Fine no high winds",
+            "Raining no high winds",
+            "Raining + high winds",
+            "Fine + high winds",
+            "Snowing no high winds",
+            "Fog or mist",
+            "Snowing + high winds",
+            "Other",
+            "Unknown",
+            "Data missing or out of range",
+        ],
+        [0.79, 0.12, 0.015, 0.013, 0.008, 0.005, 0.002, 0.022, 0.02, 0.005],
+    ),
+    "Light_Conditions": (
+        [
+            "Daylight",
+            "Darkness - lights lit",
+            "Darkness - no lighting",
+            "Darkness - lighting unknown",
+            "Darkness - lights unlit",
+        ],
+        [0.73, 0.19, 0.06, 0.01, 0.01],
+    ),
+    "Road_Surface_Conditions": (
+        ["Dry", "Wet or damp", "Frost or ice", "Snow", "Flood over 3cm. deep"],
+        [0.69, 0.28, 0.02, 0.008, 0.002],
+    ),
+    "Road_Type": (
+        [
+            "Single carriageway",
+            "Dual carriageway",
+            "Roundabout",
+            "One way street",
+            "Slip road",
+            "Unknown",
+        ],
+        [0.74, 0.15, 0.07, 0.02, 0.01, 0.01],
+    ),
+    "Urban_or_Rural_Area": (["Urban", "Rural"], [0.64, 0.36]),
+    "Age_Band_of_Driver": (
+        [
+            "0 - 5",
+            "6 - 10",
+            "11 - 15",
+            "16 - 20",
+            "21 - 25",
+            "26 - 35",
+            "36 - 45",
+            "46 - 55",
+            "56 - 65",
+            "66 - 75",
+            "Over 75",
+            "Data missing or out of range",
+        ],
+        [0.001, 0.004, 0.01, 0.07, 0.11, 0.2, 0.18, 0.15, 0.09, 0.045, 0.03, 0.11],
+    ),
+    "Sex_of_Driver": (
+        ["Male", "Female", "Not known", "Data missing or out of range"],
+        [0.64, 0.29, 0.065, 0.005],
+    ),
+    "Driver_Home_Area_Type": (
+        ["Urban area", "Rural", "Small town", "Data missing or out of range"],
+        [0.7, 0.1, 0.08, 0.12],
+    ),
+    "Journey_Purpose_of_Driver": (
+        [
+            "Journey as part of work",
+            "Commuting to/from work",
+            "Taking pupil to/from school",
+            "Pupil riding to/from school",
+            "Other",
+            "Not known",
+            "Other/Not known (2005-10)",
+            "Data missing or out of range",
+        ],
+        [0.13, 0.09, 0.01, 0.005, 0.2, 0.3, 0.25, 0.015],
+    ),
+    "Vehicle_Manoeuvre": (
+        [
+            "Going ahead other",
+            "Turning right",
+            "Slowing or stopping",
+            "Moving off",
+            "Waiting to go - held up",
+            "Parked",
+            "Going ahead right-hand bend",
+            "Going ahead left-hand bend",
+            "Turning left",
+            "Overtaking moving vehicle - offside",
+            "Reversing",
+            "Changing lane to right",
+            "Changing lane to left",
+            "U-turn",
+            "Waiting to turn right",
+            "Data missing or out of range",
+        ],
+        [
+            0.46,
+            0.1,
+            0.06,
+            0.05,
+            0.05,
+            0.04,
+            0.03,
+            0.03,
+            0.04,
+            0.02,
+            0.02,
+            0.01,
+            0.01,
+            0.01,
+            0.02,
+            0.04,
+        ],
+    ),
+    "Vehicle_Type": (
+        [
+            "Car",
+            "Van / Goods 3.5 tonnes mgw or under",
+            "Motorcycle over 500cc",
+            "Pedal cycle",
+            "Bus or coach (17 or more pass seats)",
+            "Goods 7.5 tonnes mgw and over",
+            "Taxi/Private hire car",
+        ],
+        [0.72, 0.06, 0.04, 0.07, 0.03, 0.03, 0.05],
+    ),
+    "Local_Authority_(District)": (
+        [
+            "Birmingham",
+            "Leeds",
+            "Westminster",
+            "Manchester",
+            "Bradford",
+            "Cornwall",
+            "Glasgow City",
+            "Liverpool",
+            "Sheffield",
+            "Edinburgh, City of",
+        ],
+        [0.16, 0.12, 0.1, 0.1, 0.09, 0.09, 0.09, 0.09, 0.08, 0.08],
+    ),
+    "Local_Authority_(Highway)": (
+        [
+            "Birmingham",
+            "Leeds",
+            "Westminster",
+            "Manchester",
+            "Bradford",
+            "Cornwall",
+            "Glasgow City",
+            "Liverpool",
+            "Sheffield",
+            "Edinburgh, City of",
+        ],
+        [0.16, 0.12, 0.1, 0.1, 0.09, 0.09, 0.09, 0.09, 0.08, 0.08],
+    ),
+}
+
+ACCIDENT_COLUMNS = [
+    "Accident_Index",
+    "1st_Road_Class",
+    "1st_Road_Number",
+    "Accident_Severity",
+    "Date",
+    "Day_of_Week",
+    "Latitude",
+    "Light_Conditions",
+    "Local_Authority_(District)",
+    "Local_Authority_(Highway)",
+    "Longitude",
+    "LSOA_of_Accident_Location",
+    "Number_of_Casualties",
+    "Number_of_Vehicles",
+    "Police_Force",
+    "Road_Surface_Conditions",
+    "Road_Type",
+    "Speed_limit",
+    "Time",
+    "Urban_or_Rural_Area",
+    "Weather_Conditions",
+    "Year",
+]
+
+VEHICLE_COLUMNS = [
+    "Accident_Index",
+    "Age_Band_of_Driver",
+    "Age_of_Vehicle",
+    "Driver_Home_Area_Type",
+    "Driver_IMD_Decile",
+    "Engine_Capacity_.CC.",
+    "Journey_Purpose_of_Driver",
+    "make",
+    "model",
+    "Sex_of_Driver",
+    "Vehicle_Manoeuvre",
+    "Vehicle_Reference",
+    "Vehicle_Type",
+    "Year",
+]
+
+
+def _choice(rng, column: str, rows: int) -> np.ndarray:
+    """
+    Draw values of an enumerated column
+
+    :param rng:
+    :param column:
+    :param rows:
+    :return:
+    """
+    values, weights = VOCABULARIES[column]
+    weights = np.asarray(weights) / np.sum(weights)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), rows, p=weights)]
+
+
+def accident_information(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Create a synthetic Accident_Information frame
+
+    :param rows:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    days = (END_DATE - START_DATE).days + 1
+    dates = START_DATE + pd.to_timedelta(np.sort(rng.integers(0, days, rows)), unit="D")
+    minutes = rng.integers(0, 24 * 60, rows)
+    hours, minutes = np.divmod(minutes, 60)
+
+    data = pd.DataFrame(
+        {
+            "Accident_Index": pd.Index(dates.year.astype(str))
+            + pd.Index(np.arange(rows).astype(str)).str.zfill(9),
+            "1st_Road_Class": rng.choice(["A", "B", "C", "Motorway"], rows),
+            "1st_Road_Number": rng.integers(0, 9999, rows),
+            "Accident_Severity": _choice(rng, "Accident_Severity", rows),
+            "Date": dates.strftime("%Y-%m-%d"),
+            "Day_of_Week": dates.day_name(),
+            "Latitude": rng.uniform(50.0, 58.5, rows).round(6),
+            "Light_Conditions": _choice(rng, "Light_Conditions", rows),
+            "Local_Authority_(District)": _choice(
+                rng, "Local_Authority_(District)", rows
+            ),
+            "Local_Authority_(Highway)": _choice(rng, "Local_Authority_(Highway)", rows),
+            "Longitude": rng.uniform(-5.5, 1.7, rows).round(6),
+            "LSOA_of_Accident_Location": pd.Index(
+                rng.integers(1, 35000, rows).astype(str)
+            ).str.zfill(8),
+            "Number_of_Casualties": rng.integers(1, 6, rows),
+            "Number_of_Vehicles": rng.integers(1, 4, rows),
+            "Police_Force": rng.choice(["Metropolitan Police", "Kent", "Essex"], rows),
+            "Road_Surface_Conditions": _choice(rng, "Road_Surface_Conditions", rows),
+            "Road_Type": _choice(rng, "Road_Type", rows),
+            "Speed_limit": rng.choice([20, 30, 40, 50, 60, 70], rows),
+            "Time": pd.Index(hours.astype(str)).str.zfill(2)
+            + ":"
+            + pd.Index(minutes.astype(str)).str.zfill(2),
+            "Urban_or_Rural_Area": _choice(rng, "Urban_or_Rural_Area", rows),
+            "Weather_Conditions": _choice(rng, "Weather_Conditions", rows),
+            "Year": dates.year,
+        }
+    )
+    data["LSOA_of_Accident_Location"] = "E" + data["LSOA_of_Accident_Location"]
+    return data[ACCIDENT_COLUMNS]
+
+
+def vehicle_information(accidents: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """
+    Create a synthetic Vehicle_Information frame with one to three vehicles
+    per accident
+
+    :param accidents:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed + 1)
+    vehicles = rng.choice([1, 2, 3], len(accidents), p=[0.3, 0.6, 0.1])
+    rows = int(vehicles.sum())
+    ages = rng.integers(0, 25, rows).astype("float64")
+    ages[rng.random(rows) < 0.16] = np.nan
+
+    data = pd.DataFrame(
+        {
+            "Accident_Index": np.repeat(accidents["Accident_Index"].to_numpy(), vehicles),
+            "Age_Band_of_Driver": _choice(rng, "Age_Band_of_Driver", rows),
+            "Age_of_Vehicle": ages,
+            "Driver_Home_Area_Type": _choice(rng, "Driver_Home_Area_Type", rows),
+            "Driver_IMD_Decile": rng.integers(1, 11, rows),
+            "Engine_Capacity_.CC.": rng.integers(50, 5000, rows),
+            "Journey_Purpose_of_Driver": _choice(rng, "Journey_Purpose_of_Driver", rows),
+            "make": rng.choice(["FORD", "VAUXHALL", "VOLKSWAGEN", "PEUGEOT"], rows),
+            "model": rng.choice(["FOCUS", "CORSA", "GOLF", "206", "FIESTA"], rows),
+            "Sex_of_Driver": _choice(rng, "Sex_of_Driver", rows),
+            "Vehicle_Manoeuvre": _choice(rng, "Vehicle_Manoeuvre", rows),
+            "Vehicle_Reference": np.arange(rows)
+            - np.repeat(np.cumsum(vehicles) - vehicles, vehicles)
+            + 1,
+            "Vehicle_Type": _choice(rng, "Vehicle_Type", rows),
+            "Year": np.repeat(accidents["Year"].to_numpy(), vehicles),
+        }
+    )
+    return data[VEHICLE_COLUMNS]
+
+
+def merged_data(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Create the merged accidents/vehicles frame read by Accidents.transform
+
+    :param rows: number of accidents, the frame has about 1.8 times more rows
+    :param seed:
+    :return:
+    """
+    accidents = accident_information(rows, seed)
+    vehicles = vehicle_information(accidents, seed)
+    return accidents.merge(vehicles, on=["Accident_Index", "Year"], how="inner").rename(
+        columns={"Date": "Accident_date"}
+    )
+
+
+# Centers and spreads in degrees of the clusters of accident_coordinates,
+# i.e London, Birmingham, Manchester, Leeds, Glasgow and the rest of Britain
+CLUSTERS = [
+    (51.51, -0.13, 0.15, 0.25),
+    (52.48, -1.9, 0.1, 0.15),
+    (53.48, -2.24, 0.1, 0.15),
+    (53.8, -1.55, 0.08, 0.12),
+    (55.86, -4.25, 0.08, 0.12),
+    (53.5, -2.0, 1.6, 1.4),
+]
+CLUSTER_WEIGHTS = [0.2, 0.08, 0.08, 0.05, 0.04, 0.55]
+
+
+def accident_coordinates(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Create accident coordinates and severities clustered around cities, as
+    accident_information coordinates are uniform
+
+    :param rows:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    clusters = np.asarray(CLUSTERS)[rng.choice(len(CLUSTERS), rows, p=CLUSTER_WEIGHTS)]
+    return pd.DataFrame(
+        {
+            "Latitude": rng.normal(clusters[:, 0], clusters[:, 2]).astype("float32"),
+            "Longitude": rng.normal(clusters[:, 1], clusters[:, 3]).astype("float32"),
+            "Accident_Severity": pd.Categorical(_choice(rng, "Accident_Severity", rows)),
+        }
+    )
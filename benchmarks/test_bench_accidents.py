@@ -0,0 +1,168 @@
+"""
+Benchmarks of Accidents transformation, filtering and aggregations
+
+Aggregations are timed on the row level frame and on its accidents cube, and
+area rankings on staged accidents and on their area tables.
+"""
+import pytest
+
+from delivery_insights.loader.cache import read_source
+from delivery_insights.loader.schema import ACCIDENT_INFORMATION
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.areas import AreaAggregates
+from delivery_insights.models.filters import Filter
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Aggregations of the charts, as called by get_chart_jobs
+AGGREGATIONS = {
+    "count_by_column": (
+        Accidents().get_accidents_count_by_column,
+        dict(column="Driver_Home_Area_Type", min_value=100),
+    ),
+    "list_values_by_column": (
+        Accidents().get_list_accidents_values_by_column,
+        dict(
+            column="Weather_Conditions",
+            filter_conditions=["Unknown", "Data missing or out of range"],
+        ),
+    ),
+    "share_count": (
+        Accidents.get_accidents_share_count,
+        dict(
+            cols=["Age_band_of_vehicule", "Age_Band_of_Driver"],
+            filter_conditions={
+                "Age_band_of_vehicule": ["Data missing"],
+                "Age_Band_of_Driver": ["Data missing or out of range"],
+            },
+        ),
+    ),
+    "counts_using_two_columns": (
+        Accidents.get_accidents_counts_using_two_columns,
+        dict(
+            cols=["Age_Band_of_Driver", "Sex_of_Driver"],
+            filter_conditions={
+                "Age_Band_of_Driver": ["Data missing or out of range"],
+                "Sex_of_Driver": ["Not known", "Data missing or out of range"],
+            },
+            new_cols_name=["Age_Band_of_Driver", "Sex_of_Driver", "Total"],
+        ),
+    ),
+    "per_year": (Accidents.get_accidents_per_year, {}),
+    "per_month": (Accidents.get_accidents_per_period, dict(rule="M")),
+    "fatalities_per_week": (
+        Accidents.get_accidents_per_period,
+        dict(rule="W", row_filter=Filter().keep("Accident_Severity", ["Fatal"])),
+    ),
+    "per_hour": (Accidents.get_accidents_per_hour, {}),
+    "per_daytime": (Accidents.get_accidents_per_daytime, {}),
+    "per_weekday_and_year": (
+        Accidents.get_accidents_per_weekday_and_year,
+        dict(days=DAYS),
+    ),
+}
+
+
+@pytest.mark.benchmark(group="transform")
+def test_transform(benchmark, merged):
+    """
+    Benchmark Accidents.transform, which modifies its input, on copies of
+    merged data
+
+    :return:
+    """
+    result = benchmark.pedantic(
+        Accidents.transform,
+        setup=lambda: ((merged.copy(),), {}),
+        rounds=5,
+    )
+    assert len(result) > 0
+
+
+@pytest.mark.benchmark(group="filter")
+def test_filter_data(benchmark, transformed):
+    """
+    Benchmark Accidents.filter_data
+
+    :return:
+    """
+    result = benchmark(
+        Accidents.filter_data,
+        transformed,
+        "Weather_Conditions",
+        ["Unknown", "Data missing or out of range"],
+    )
+    assert len(result) < len(transformed)
+
+
+@pytest.mark.benchmark(group="aggregations")
+@pytest.mark.parametrize("source", ["frame", "cube"])
+@pytest.mark.parametrize("name", list(AGGREGATIONS))
+def test_aggregation(benchmark, transformed, cube, name, source):
+    """
+    Benchmark each aggregation of the charts
+
+    :return:
+    """
+    fct, kwargs = AGGREGATIONS[name]
+    data = transformed if source == "frame" else cube
+
+    result = benchmark(fct, data=data, **kwargs)
+    assert result is not None
+
+
+@pytest.fixture(scope="module")
+def accidents(staged_folder):
+    """
+    Staged accidents, one row per accident
+
+    :return:
+    """
+    return read_source(staged_folder, ACCIDENT_INFORMATION)
+
+
+@pytest.mark.benchmark(group="areas")
+def test_build_areas(benchmark, accidents):
+    """
+    Benchmark AreaAggregates.from_data
+
+    :return:
+    """
+    result = benchmark(AreaAggregates.from_data, accidents)
+    assert len(result.tables["lsoa"]) > 0
+
+
+@pytest.mark.benchmark(group="areas")
+@pytest.mark.parametrize("source", ["frame", "areas"])
+def test_top_areas(benchmark, accidents, source):
+    """
+    Benchmark Accidents.get_top_areas of the LSOAs with the most fatal
+    accidents
+
+    :return:
+    """
+    data = accidents if source == "frame" else AreaAggregates.from_data(accidents)
+
+    result = benchmark(
+        Accidents.get_top_areas,
+        data,
+        "lsoa",
+        k=10,
+        dimension="Accident_Severity",
+        value="Fatal",
+    )
+    assert len(result) == 10
+
+
+@pytest.mark.benchmark(group="areas")
+def test_get_area(benchmark, accidents):
+    """
+    Benchmark AreaAggregates.get_area of the counts by year of an LSOA
+
+    :return:
+    """
+    areas = AreaAggregates.from_data(accidents)
+    area = accidents["LSOA_of_Accident_Location"].iloc[0]
+
+    result = benchmark(areas.get_area, "lsoa", area, dimension="Year")
+    assert result.sum() > 0
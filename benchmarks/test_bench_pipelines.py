@@ -0,0 +1,114 @@
+"""
+Benchmarks of the stages of main: merge of the staged files, transformed
+file writing, counting and chart rendering
+"""
+import pytest
+
+from delivery_insights.analysis.scheduler import init_worker, render_job
+from delivery_insights.loader.cache import read_source
+from delivery_insights.loader.merge import iter_merged, merge_sources
+from delivery_insights.loader.schema import ACCIDENT_INFORMATION, VEHICLE_INFORMATION
+from delivery_insights.models.cube import AccidentsCube
+from delivery_insights.pipelines.transform.pipeline import transform
+from delivery_insights.pipelines.visualize.pipeline import (
+    CHART_FILENAMES,
+    get_chart_jobs,
+)
+
+# Columns written by main
+TRANSFORM_COLUMNS = [
+    "Accident_Index",
+    "Vehicle_Reference",
+    "Year",
+    "Age_Band_of_Driver",
+    "Age_of_Vehicle",
+    "Driver_Home_Area_Type",
+    "Journey_Purpose_of_Driver",
+    "Accident_Severity",
+    "Accident_date",
+    "Day_of_Week",
+]
+
+
+def merge(folder: str, join_mode: str) -> list:
+    """
+    Merge of main in a join mode
+
+    :param folder:
+    :param join_mode:
+    :return: merged chunks
+    """
+    if join_mode == "memory":
+        return [
+            merge_sources(
+                read_source(folder, ACCIDENT_INFORMATION),
+                read_source(folder, VEHICLE_INFORMATION),
+            )
+        ]
+    return list(iter_merged(folder, join_mode=join_mode))
+
+
+@pytest.mark.benchmark(group="merge")
+@pytest.mark.parametrize("join_mode", ["memory", "year", "hash"])
+def test_merge(benchmark, staged_folder, merged, join_mode):
+    """
+    Benchmark the merge of staged files in each join mode of main
+
+    :return:
+    """
+    chunks = benchmark(merge, staged_folder, join_mode)
+    assert sum(len(chunk) for chunk in chunks) == len(merged)
+
+
+@pytest.mark.benchmark(group="transform")
+def test_transform_file(benchmark, transformed, tmp_path):
+    """
+    Benchmark the writing of the transformed file
+
+    :return:
+    """
+    result = benchmark(
+        transform,
+        data=transformed,
+        output_folder=str(tmp_path),
+        columns=TRANSFORM_COLUMNS,
+    )
+    assert len(result) == len(transformed)
+
+
+@pytest.mark.benchmark(group="cube")
+def test_cube(benchmark, transformed):
+    """
+    Benchmark counting of transformed data into a cube
+
+    :return:
+    """
+    cube = benchmark(AccidentsCube.from_data, transformed)
+    assert cube.cuboids["date"]["Count"].sum() == len(transformed)
+
+
+@pytest.fixture(scope="module")
+def chart_jobs(cube) -> dict:
+    """
+    Chart jobs of the cube by filename
+
+    :return:
+    """
+    init_worker()
+    return {
+        kwargs["filename"]: (method, kwargs) for method, kwargs in get_chart_jobs(cube)
+    }
+
+
+@pytest.mark.benchmark(group="charts")
+@pytest.mark.parametrize("filename", CHART_FILENAMES)
+def test_chart(benchmark, chart_jobs, tmp_path, filename):
+    """
+    Benchmark the rendering of each chart
+
+    :return:
+    """
+    method, kwargs = chart_jobs[filename]
+
+    path = benchmark(render_job, str(tmp_path), method, kwargs)
+    assert path.endswith(filename)
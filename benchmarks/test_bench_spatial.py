@@ -0,0 +1,203 @@
+"""
+Benchmarks of the spatial index, the route risk scorer and the raster
+tiles: building them, and answering batches of queries around depots or
+route points, scoring batches of routes, or reading the cells of a map
+
+Coordinates are clustered around cities, with SPATIAL_ROWS accidents
+whatever --bench-rows, as queries are meant to stay fast on the full dataset.
+"""
+import numpy as np
+import pytest
+from synthetic import accident_coordinates
+
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.raster import RasterTiles
+from delivery_insights.models.risk import RouteRiskScorer
+from delivery_insights.models.spatial import GridIndex
+
+SPATIAL_ROWS = 2_000_000
+QUERIES = 10_000
+ROUTES = 5_000
+ROUTE_POINTS = 20
+# Bounding box of Greater London, min latitude, min longitude, max latitude
+# and max longitude
+LONDON = (51.28, -0.51, 51.69, 0.33)
+
+
+@pytest.fixture(scope="module")
+def coordinates():
+    """
+    Clustered accident coordinates
+
+    :return:
+    """
+    data = accident_coordinates(SPATIAL_ROWS)
+    rng = np.random.default_rng(0)
+    data["Hour"] = rng.integers(0, 24, SPATIAL_ROWS)
+    data["Year"] = rng.integers(2005, 2018, SPATIAL_ROWS)
+    return data
+
+
+@pytest.fixture(scope="module")
+def grid(coordinates) -> GridIndex:
+    """
+    Spatial index of the accident coordinates
+
+    :return:
+    """
+    return GridIndex.from_data(coordinates)
+
+
+@pytest.fixture(scope="module")
+def queries(coordinates) -> tuple:
+    """
+    Query points drawn among accidents, i.e on roads
+
+    :return:
+    """
+    rows = np.random.default_rng(1).choice(len(coordinates), QUERIES, replace=False)
+    return (
+        coordinates["Latitude"].to_numpy("float64")[rows],
+        coordinates["Longitude"].to_numpy("float64")[rows],
+    )
+
+
+@pytest.mark.benchmark(group="spatial")
+def test_build_grid(benchmark, coordinates):
+    """
+    Benchmark GridIndex.from_data
+
+    :return:
+    """
+    result = benchmark.pedantic(GridIndex.from_data, args=(coordinates,), rounds=3)
+    assert len(result) == SPATIAL_ROWS
+
+
+@pytest.mark.benchmark(group="spatial")
+@pytest.mark.parametrize("radius_km", [0.5, 2.0, 5.0])
+def test_accidents_within_radius(benchmark, grid, queries, radius_km):
+    """
+    Benchmark Accidents.get_accidents_within_radius of QUERIES points
+
+    :return:
+    """
+    result = benchmark.pedantic(
+        Accidents.get_accidents_within_radius,
+        args=(grid, *queries, radius_km),
+        rounds=3,
+    )
+    assert (result["Count"] > 0).all()
+
+
+@pytest.mark.benchmark(group="spatial")
+def test_count_in_bbox(benchmark, grid, queries):
+    """
+    Benchmark GridIndex.count_in_bbox of QUERIES boxes of about 2 x 2 km
+
+    :return:
+    """
+    latitudes, longitudes = queries
+    result = benchmark(
+        grid.count_in_bbox,
+        latitudes - 0.01,
+        longitudes - 0.015,
+        latitudes + 0.01,
+        longitudes + 0.015,
+    )
+    assert (result > 0).all()
+
+
+@pytest.mark.benchmark(group="spatial")
+@pytest.mark.parametrize("k", [1, 10])
+def test_k_nearest(benchmark, grid, queries, k):
+    """
+    Benchmark GridIndex.k_nearest of QUERIES points
+
+    :return:
+    """
+    distances, _ = benchmark(grid.k_nearest, *queries, k=k)
+    assert distances.shape == (QUERIES, k)
+
+
+@pytest.fixture(scope="module")
+def routes(queries) -> list:
+    """
+    Routes of ROUTE_POINTS points about 500 m apart, starting at query points
+
+    :return:
+    """
+    rng = np.random.default_rng(2)
+    starts = np.column_stack(queries)[:ROUTES]
+    steps = rng.normal(0, 0.004, (ROUTES, ROUTE_POINTS, 2)).cumsum(axis=1)
+    return list(starts[:, None, :] + steps)
+
+
+@pytest.mark.benchmark(group="risk")
+def test_build_risk(benchmark, coordinates):
+    """
+    Benchmark RouteRiskScorer.from_data
+
+    :return:
+    """
+    result = benchmark.pedantic(RouteRiskScorer.from_data, args=(coordinates,), rounds=3)
+    assert result.rates.sum() > 0
+
+
+@pytest.mark.benchmark(group="risk")
+def test_score_routes(benchmark, coordinates, routes):
+    """
+    Benchmark RouteRiskScorer.score of ROUTES routes at various hours
+
+    :return:
+    """
+    scorer = RouteRiskScorer.from_data(coordinates)
+    hours = np.random.default_rng(3).integers(0, 24, ROUTES)
+
+    result = benchmark(scorer.score, routes, hours)
+    assert sum(len(scores) for scores in result) == ROUTES * (ROUTE_POINTS - 1)
+
+
+@pytest.fixture(scope="module")
+def tiles(coordinates, tmp_path_factory) -> RasterTiles:
+    """
+    Raster tiles of the accident coordinates
+
+    :return:
+    """
+    return RasterTiles.build(coordinates, str(tmp_path_factory.mktemp("raster")))
+
+
+@pytest.mark.benchmark(group="raster")
+def test_build_raster(benchmark, coordinates, tmp_path):
+    """
+    Benchmark RasterTiles.build
+
+    :return:
+    """
+    result = benchmark.pedantic(
+        RasterTiles.build, args=(coordinates, str(tmp_path)), rounds=3
+    )
+    assert result.levels[-1].sum() == SPATIAL_ROWS
+
+
+@pytest.mark.benchmark(group="raster")
+@pytest.mark.parametrize("bbox", [LONDON, None], ids=["london", "all"])
+def test_read_raster(benchmark, tiles, bbox):
+    """
+    Benchmark reading fatal and serious accidents of recent years from the
+    level of a 600 cells wide map, summed into its cells
+
+    :return:
+    """
+
+    def read():
+        level = tiles.get_level(600, bbox)
+        return sum(
+            tiles.read(bbox, level, years=(2015, 2017), severity=severity)[0].sum(
+                axis=(0, 1), dtype="int64"
+            )
+            for severity in ["Fatal", "Serious"]
+        )
+
+    result = benchmark(read)
+    assert result.sum() > 0
@@ -0,0 +1,72 @@
+"""
+Benchmarks of the startup of the commands: `COMMAND --help` in a new
+interpreter, with the modules it imports as reported by python -X importtime
+
+Usage (from the repository root):
+    PYTHONPATH=. pytest benchmarks/test_bench_startup.py
+"""
+import subprocess
+import sys
+
+import pytest
+
+from delivery_insights.cli import COMMANDS
+
+# Slowest imports shown in the extra info of each benchmark
+TOP_IMPORTS = 5
+
+
+def start(command: str) -> str:
+    """
+    Run `command --help` in a new interpreter, with import times
+
+    :param command: one of COMMANDS
+    :return: python -X importtime report
+    """
+    code = (
+        f"import sys; sys.argv = [{command!r}, '--help']; "
+        f"from delivery_insights.cli import COMMANDS; COMMANDS[{command!r}]()"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stderr
+
+
+def get_import_times(report: str) -> dict:
+    """
+    Get cumulative import time of each top-level module of an importtime
+    report, in microseconds
+
+    :param report:
+    :return:
+    """
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # nested imports are indented under the module importing them
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.benchmark(group="startup")
+@pytest.mark.parametrize("command", list(COMMANDS))
+def test_help(benchmark, command):
+    """
+    Benchmark `command --help`
+
+    :return:
+    """
+    report = benchmark.pedantic(start, args=(command,), rounds=5, iterations=1)
+
+    times = get_import_times(report)
+    benchmark.extra_info["import_us"] = sum(times.values())
+    benchmark.extra_info["slowest_imports"] = dict(
+        sorted(times.items(), key=lambda item: -item[1])[:TOP_IMPORTS]
+    )
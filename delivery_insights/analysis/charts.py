@@ -1,9 +1,14 @@
 import os
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import squarify
+from matplotlib.colors import LogNorm
+
+from delivery_insights.models.raster import RasterTiles
+from delivery_insights.utils.profiling import profiled
 
 
 class Chart:
@@ -51,6 +56,7 @@ class Chart:
             ]
             ax.bar_label(p, labels=labels, label_type="edge", size=9)
 
+    @profiled
     def total_count_per_date_line_chart(
         self,
         data: pd.DataFrame,
@@ -73,13 +79,39 @@ class Chart:
         :param rule:
         :return:
         """
+        # Downsampling series to 1 month data and get size
+        counts = data.set_index(index_date_column).resample(rule).size()
+        self.count_line_chart(
+            data=counts,
+            title=title,
+            line_legend_title=line_legend_title,
+            filename=filename,
+            xlabel_title=xlabel_title,
+        )
+
+    @profiled
+    def count_line_chart(
+        self,
+        data: pd.Series,
+        title: str,
+        line_legend_title: str,
+        filename: str,
+        xlabel_title: str = "",
+    ) -> None:
+        """
+        Create Line chart of counts per period
+
+        :param data: counts indexed by period
+        :param title:
+        :param line_legend_title:
+        :param filename:
+        :param xlabel_title:
+        :return:
+        """
         sns.set_style("white")
         fig, ax = plt.subplots(figsize=(15, 6))
 
-        # Downsampling series to 1 month data and get size
-        data.set_index(index_date_column).resample(rule).size().plot(
-            label=line_legend_title, color="lightgrey", ax=ax
-        )
+        data.plot(label=line_legend_title, color="lightgrey", ax=ax)
 
         ax.set_title(title, fontsize=14, fontweight="bold")
         ax.set(ylabel="Total Count\n", xlabel=xlabel_title)
@@ -89,7 +121,9 @@ class Chart:
         sns.despine(ax=ax, top=True, right=True, left=False, bottom=False)
 
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
 
+    @profiled
     def pie_share_chart(
         self, data_list: [], names_list: [], chart_title: str, filename: str
     ) -> None:
@@ -120,7 +154,9 @@ class Chart:
         fig.set_size_inches(15, 15)
         plt.title(chart_title, fontsize=14, fontweight="bold")
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
 
+    @profiled
     def stacked_bar_chart(
         self,
         data: pd.DataFrame,
@@ -171,7 +207,9 @@ class Chart:
         # remove all spines
         sns.despine(top=True, right=True, left=True, bottom=True)
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
 
+    @profiled
     def grouped_bar_char(
         self,
         data: pd.DataFrame,
@@ -228,7 +266,9 @@ class Chart:
         # remove all spines
         sns.despine(top=True, right=True, left=True, bottom=True)
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
 
+    @profiled
     def bar_chart(
         self, data: pd.Series, graph_title: str, ylabel: str, filename: str
     ) -> None:
@@ -255,7 +295,9 @@ class Chart:
         # remove all spines
         sns.despine(ax=ax, top=True, right=True, left=True, bottom=True)
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
 
+    @profiled
     def heatmap_chart(
         self,
         data: pd.DataFrame,
@@ -274,13 +316,15 @@ class Chart:
         :param ylabel:
         :return:
         """
-        plt.figure(figsize=(10, 6))
+        fig = plt.figure(figsize=(10, 6))
         sns.heatmap(data, cmap="Greys")
         plt.title(graph_title, fontsize=14, fontweight="bold")
         plt.xlabel(xlabel)
         plt.ylabel(ylabel)
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
 
+    @profiled
     def treemap_chart(
         self, labels: pd.DataFrame, sizes: list, filename: str, title: str
     ) -> None:
@@ -295,10 +339,84 @@ class Chart:
         colors = [plt.cm.Pastel1(i / float(len(labels))) for i in range(len(labels))]
 
         # plot
-        plt.figure(figsize=(8, 6), dpi=80)
+        fig = plt.figure(figsize=(8, 6), dpi=80)
         squarify.plot(sizes=sizes, label=labels, color=colors, alpha=0.8)
 
         # Decorate
         plt.title(title, fontsize=14, fontweight="bold")
         plt.axis("off")
         plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
+
+    @profiled
+    def hotspot_map(
+        self,
+        counts: np.ndarray,
+        extent: list,
+        chart_title: str,
+        filename: str,
+    ) -> None:
+        """
+        Create density map of accident counts of grid cells, empty cells being
+        left blank
+
+        :param counts: counts of grid cells, whose first row is the southern one
+        :param extent: west, east, south and north bounds of the grid
+        :param chart_title:
+        :param filename:
+        :return:
+        """
+        vmax = max(1, counts.max())
+        counts = np.ma.masked_equal(counts, 0)
+        # degrees of longitude shrink with the cosine of the latitude
+        aspect = 1 / np.cos(np.radians((extent[2] + extent[3]) / 2))
+
+        fig = plt.figure(figsize=(8, 10))
+        image = plt.imshow(
+            counts,
+            extent=extent,
+            origin="lower",
+            cmap="inferno",
+            norm=LogNorm(vmin=1, vmax=vmax),
+            aspect=aspect,
+            interpolation="nearest",
+        )
+        plt.colorbar(image, label="Accidents", shrink=0.6)
+        plt.title(chart_title, fontsize=14, fontweight="bold")
+        plt.xlabel("Longitude")
+        plt.ylabel("Latitude")
+        plt.savefig(os.path.join(self.output_folder, filename))
+        plt.close(fig)
+
+    @profiled
+    def tile_heatmap(
+        self,
+        folder: str,
+        chart_title: str,
+        filename: str,
+        max_cells: int,
+        bbox: tuple = None,
+        years=None,
+        severities: list = None,
+    ) -> None:
+        """
+        Create density map of accident counts read from raster tiles, at the
+        finest level with at most max_cells cells along each side
+
+        :param folder: folder of RasterTiles
+        :param chart_title:
+        :param filename:
+        :param max_cells:
+        :param bbox: min latitude, min longitude, max latitude and max
+            longitude, the whole rasters by default
+        :param years: a year or the first and last years, all years by default
+        :param severities: severities to count, all severities by default
+        :return:
+        """
+        tiles = RasterTiles.load(folder)
+        level = tiles.get_level(max_cells, bbox)
+        counts = 0
+        for severity in severities or [None]:
+            view, extent = tiles.read(bbox, level, years=years, severity=severity)
+            counts = counts + view.sum(axis=(0, 1), dtype="int64")
+        self.hotspot_map(counts, extent, chart_title, filename)
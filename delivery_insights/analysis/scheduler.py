@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from delivery_insights.utils import profiling
+
+
+def init_worker(profiling_settings: dict = None) -> None:
+    """
+    Set up matplotlib in a rendering process: non interactive Agg backend and
+    the seaborn style the charts share, so that a figure looks the same
+    whatever the process and the jobs rendered before it
+
+    :param profiling_settings: stage records settings of the parent process,
+        cProfile profiles being only taken in the parent process
+    :return:
+    """
+    # the plotting stack is only imported by rendering processes
+    import matplotlib
+
+    profiling.init_process(profiling_settings)
+    matplotlib.use("Agg")
+    import seaborn as sns
+
+    sns.set_style("white")
+
+
+def render_job(output_folder: str, method: str, kwargs: dict) -> str:
+    """
+    Render one chart job
+
+    :param output_folder:
+    :param method: name of the Chart method drawing the figure
+    :param kwargs: aggregated data and titles passed to the method
+    :return: path of the saved figure
+    """
+    import matplotlib.pyplot as plt
+
+    from delivery_insights.analysis.charts import Chart
+
+    try:
+        getattr(Chart(output_folder=output_folder), method)(**kwargs)
+    finally:
+        # a failed job must not leave a figure behind for the next one
+        plt.close("all")
+    return os.path.join(output_folder, kwargs["filename"])
+
+
+def render_jobs(jobs: list, output_folder: str, workers: int = 1) -> list:
+    """
+    Render chart jobs, in a pool of processes when workers is more than one
+
+    Jobs only hold aggregates, so that sending them to the processes is cheap.
+
+    :param jobs: list of (Chart method name, method kwargs)
+    :param output_folder:
+    :param workers: number of rendering processes
+    :return: paths of the saved figures
+    """
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        init_worker()
+        return [render_job(output_folder, method, kwargs) for method, kwargs in jobs]
+
+    # processes are spawned, as forking while run_dag runs other stages
+    # on threads copies their locks in whatever state they are
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(profiling.get_settings(),),
+    ) as executor:
+        futures = [
+            executor.submit(render_job, output_folder, method, kwargs)
+            for method, kwargs in jobs
+        ]
+        return [future.result() for future in futures]
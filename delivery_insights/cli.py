@@ -0,0 +1,87 @@
+from delivery_insights.utils import config
+
+# Commands parse their arguments before importing their pipeline, so that
+# --help and wrong arguments answer without importing pandas, pyarrow,
+# matplotlib or psycopg2.
+
+
+def main():
+    """
+    Run all package pipelines
+
+    :return:
+    """
+    settings = config.parse_arguments()
+    from delivery_insights import main as pipelines
+
+    pipelines.main(settings)
+
+
+def extract_pipeline():
+    """
+    Run Extract pipeline
+
+    :return:
+    """
+    args = config.get_extract_parser().parse_args()
+    from delivery_insights.pipelines.extract import pipeline
+
+    pipeline.extract_pipeline(args)
+
+
+def stage_pipeline():
+    """
+    Run Stage pipeline
+
+    :return:
+    """
+    args = config.get_stage_parser().parse_args()
+    from delivery_insights.pipelines.stage import pipeline
+
+    pipeline.stage_pipeline(args)
+
+
+def transform_pipeline():
+    """
+    Run Transform pipeline
+
+    :return:
+    """
+    args = config.get_transform_parser().parse_args()
+    from delivery_insights.pipelines.transform import pipeline
+
+    pipeline.transform_pipeline(args)
+
+
+def load_pipeline():
+    """
+    Run Load pipeline
+
+    :return:
+    """
+    args = config.get_load_parser().parse_args()
+    from delivery_insights.pipelines.load import pipeline
+
+    pipeline.load_pipeline(args)
+
+
+def visualize_pipeline():
+    """
+    Run Visualize pipeline
+
+    :return:
+    """
+    args = config.get_visualize_parser().parse_args()
+    from delivery_insights.pipelines.visualize import pipeline
+
+    pipeline.visualize_pipeline(args)
+
+
+COMMANDS = {
+    "delivery_insights": main,
+    "extract_pipeline": extract_pipeline,
+    "stage_pipeline": stage_pipeline,
+    "transform_pipeline": transform_pipeline,
+    "load_pipeline": load_pipeline,
+    "visualize_pipeline": visualize_pipeline,
+}
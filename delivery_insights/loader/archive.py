@@ -0,0 +1,128 @@
+import os
+from contextlib import contextmanager
+from zipfile import ZipFile
+
+import pyarrow.csv as pv
+
+ARCHIVE_SUFFIX = ".zip"
+
+
+def split_archive(path: str):
+    """
+    Split a source path into its zip archive and member
+
+    Sources are csv files, zip archives holding a csv file named like them
+    without the .zip suffix, i.e Kaggle downloads, or members of an archive
+    given as ARCHIVE.zip/MEMBER.
+
+    :param path:
+    :return: archive path and member name, archive is None for csv files and
+        member None for the only member of the archive
+    """
+    head, _, tail = path.partition(f"{ARCHIVE_SUFFIX}{os.sep}")
+    if tail:
+        return f"{head}{ARCHIVE_SUFFIX}", tail
+    if path.endswith(ARCHIVE_SUFFIX):
+        return path, None
+    return None, None
+
+
+def get_member_name(path: str) -> str:
+    """
+    Get name of the csv file of a source
+
+    :param path:
+    :return:
+    """
+    archive, member = split_archive(path)
+    if member is not None:
+        return os.path.basename(member)
+    if archive is not None:
+        return os.path.basename(archive)[: -len(ARCHIVE_SUFFIX)]
+    return os.path.basename(path)
+
+
+def get_source_path(folder: str, filename: str) -> str:
+    """
+    Get path of a source of folder, the zip archive of a csv file being used
+    when the csv file was not extracted
+
+    :param folder:
+    :param filename: csv file, zip archive or archive member
+    :return:
+    """
+    path = os.path.join(folder, filename)
+    if split_archive(path)[0] is not None or os.path.exists(path):
+        return path
+    if os.path.exists(f"{path}{ARCHIVE_SUFFIX}"):
+        return f"{path}{ARCHIVE_SUFFIX}"
+    return path
+
+
+def get_stat_path(path: str) -> str:
+    """
+    Get path of the file holding a source, i.e to check its size and content
+
+    :param path:
+    :return:
+    """
+    return split_archive(path)[0] or path
+
+
+def source_exists(folder: str, filename: str) -> bool:
+    """
+    Check a csv file or its zip archive is in folder
+
+    :param folder:
+    :param filename:
+    :return:
+    """
+    return os.path.exists(get_stat_path(get_source_path(folder, filename)))
+
+
+@contextmanager
+def open_source(path: str):
+    """
+    Open a source as a binary stream, zip members are decompressed while
+    read without being extracted to disk
+
+    :param path:
+    :return:
+    """
+    archive, member = split_archive(path)
+    if archive is None:
+        with open(path, "rb") as f:
+            yield f
+        return
+
+    with ZipFile(archive) as zf:
+        names = [info.filename for info in zf.infolist() if not info.is_dir()]
+        if member is None:
+            member = get_member_name(path) if len(names) > 1 else names[0]
+        if member not in names:
+            raise Exception(f"{member} is not in {os.path.basename(archive)}.")
+        with zf.open(member) as f:
+            yield f
+
+
+def iter_record_batches(
+    path: str, columns: list = None, encoding: str = None, block_size: int = 1 << 24
+):
+    """
+    Read a csv source as Arrow record batches, without holding the whole file
+    in memory
+
+    :param path:
+    :param columns: columns to read, all when None
+    :param encoding:
+    :param block_size: bytes of csv parsed per batch
+    :return: generator of pyarrow.RecordBatch
+    """
+    read_options = pv.ReadOptions(block_size=block_size, encoding=encoding or "utf8")
+    convert_options = pv.ConvertOptions(include_columns=columns)
+    with open_source(path) as f:
+        reader = pv.open_csv(
+            f, read_options=read_options, convert_options=convert_options
+        )
+        for batch in reader:
+            yield batch
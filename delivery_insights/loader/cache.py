@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from delivery_insights.loader.archive import (
+    get_member_name,
+    get_source_path,
+    get_stat_path,
+)
+from delivery_insights.loader.formats import has_schema, read_frame
+from delivery_insights.loader.schema import (
+    SCHEMA_VERSION,
+    coerce_dtypes,
+    read_csv,
+)
+
+CACHE_FOLDER = "cache"
+MANIFEST = "_manifest.json"
+PARTITION_COLUMN = "Year"
+
+
+def get_cache_path(folder: str, filename: str) -> str:
+    """
+    Get folder of the cached parquet partitions of a csv file, shared with
+    its zip archive
+
+    :param folder:
+    :param filename:
+    :return:
+    """
+    name = os.path.splitext(get_member_name(filename))[0]
+    return os.path.join(folder, CACHE_FOLDER, name)
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Compute sha256 of file content
+
+    :param path:
+    :param block_size:
+    :return:
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def read_manifest(cache_path: str):
+    """
+    Read cache manifest, None when there is no cache
+
+    :param cache_path:
+    :return:
+    """
+    if not os.path.exists(os.path.join(cache_path, MANIFEST)):
+        return None
+    with open(os.path.join(cache_path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def is_cached(folder: str, filename: str, columns: list = None) -> bool:
+    """
+    Check that the cache of a csv file is up to date and has the columns
+
+    The content hash is only recomputed when size or modification time of
+    the csv file, or of its zip archive, changed since it was staged.
+
+    :param folder:
+    :param filename:
+    :param columns:
+    :return:
+    """
+    manifest = read_manifest(get_cache_path(folder, filename))
+    path = get_stat_path(get_source_path(folder, filename))
+    if manifest is None or not os.path.exists(path):
+        return False
+    if manifest["schema_version"] != SCHEMA_VERSION:
+        return False
+    if columns is not None and not set(columns).issubset(manifest["columns"]):
+        return False
+
+    stat = os.stat(path)
+    if stat.st_size == manifest["size"] and stat.st_mtime_ns == manifest["mtime_ns"]:
+        return True
+    return file_hash(path) == manifest["sha256"]
+
+
+def stage_file(folder: str, filename: str, chunksize: int = 1_000_000) -> str:
+    """
+    Convert a csv file of folder into parquet files partitioned by Year, the
+    csv file is streamed out of its zip archive when it was not extracted
+
+    :param folder:
+    :param filename:
+    :param chunksize: csv rows read at once
+    :return: cache folder
+    """
+    path = get_source_path(folder, filename)
+    stat_path = get_stat_path(path)
+    cache_path = get_cache_path(folder, filename)
+    tmp_path = f"{cache_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    stat = os.stat(stat_path)
+    columns, fingerprints = None, {}
+    for i, chunk in enumerate(read_csv(path, chunksize=chunksize)):
+        columns = list(chunk.columns)
+        for year, partition in chunk.groupby(PARTITION_COLUMN):
+            fingerprints[int(year)] = add_fingerprint(
+                fingerprints.get(int(year)), partition
+            )
+            partition_path = os.path.join(tmp_path, f"{PARTITION_COLUMN}={year}")
+            os.makedirs(partition_path, exist_ok=True)
+            pq.write_table(
+                to_arrow_table(partition.drop(columns=PARTITION_COLUMN)),
+                os.path.join(partition_path, f"part-{i:05d}.parquet"),
+            )
+
+    manifest = {
+        "source": os.path.relpath(path, folder),
+        "schema_version": SCHEMA_VERSION,
+        "sha256": file_hash(stat_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "columns": columns,
+        "years": sorted(fingerprints.keys()),
+        "fingerprints": {
+            str(year): f"{rows}-{total:016x}"
+            for year, (rows, total) in sorted(fingerprints.items())
+        },
+    }
+    os.makedirs(tmp_path, exist_ok=True)
+    with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def add_fingerprint(fingerprint: tuple, data: pd.DataFrame) -> tuple:
+    """
+    Add rows of data to a fingerprint of rows content
+
+    The fingerprint is the number of rows and the sum of their hashes, so that
+    it does not depend on the order of rows nor on how they are chunked.
+
+    :param fingerprint: (rows, hashes sum), None for no rows
+    :param data:
+    :return:
+    """
+    rows, total = fingerprint or (0, 0)
+    hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    # uint64 sums wrap around
+    total = (total + int(hashes.sum(dtype="uint64"))) % (1 << 64)
+    return rows + len(hashes), total
+
+
+def to_arrow_table(data: pd.DataFrame) -> pa.Table:
+    """
+    Convert frame to arrow with the same dictionary type for every chunk, as
+    categoricals index width depends on their number of categories
+
+    :param data:
+    :return:
+    """
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(
+                i,
+                field.name,
+                table.column(i).cast(pa.dictionary(pa.int32(), field.type.value_type)),
+            )
+    return table
+
+
+def read_cache(
+    folder: str, filename: str, columns: list = None, years: list = None
+) -> pd.DataFrame:
+    """
+    Read cached partitions of a csv file
+
+    :param folder:
+    :param filename:
+    :param columns:
+    :param years: partitions to read, all when None
+    :return:
+    """
+    dataset = ds.dataset(
+        get_cache_path(folder, filename),
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(PARTITION_COLUMN, pa.int16())]), flavor="hive"
+        ),
+        exclude_invalid_files=False,
+        ignore_prefixes=[".", "_"],
+    )
+    if columns is None:
+        columns = read_manifest(get_cache_path(folder, filename))["columns"]
+    row_filter = ds.field(PARTITION_COLUMN).isin(years) if years is not None else None
+    data = dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+    return coerce_dtypes(data)
+
+
+def read_source(
+    folder: str, filename: str, columns: list = None, years: list = None
+) -> pd.DataFrame:
+    """
+    Read a file of folder from its parquet cache when it is up to date and
+    from csv otherwise
+
+    :param folder:
+    :param filename:
+    :param columns:
+    :param years: years to keep, all when None
+    :return:
+    """
+    if has_schema(os.path.join(folder, filename)):
+        # files written by the pipelines are read with their own reader
+        data = read_frame(os.path.join(folder, filename), columns=columns)
+        if years is not None:
+            # transformed files have lowercase columns
+            column = [c for c in data.columns if c.lower() == PARTITION_COLUMN.lower()]
+            data = data[data[column[0]].isin(years)]
+        return data
+
+    if is_cached(folder, filename, columns):
+        print(f"Reading {filename} from cache")
+        return read_cache(folder, filename, columns=columns, years=years)
+
+    data = read_csv(get_source_path(folder, filename), columns=columns)
+    if years is not None:
+        data = data[data[PARTITION_COLUMN].isin(years)]
+    return data
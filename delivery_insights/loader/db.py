@@ -1,13 +1,60 @@
+import io
+import itertools
+import struct
+import threading
+import time
 from configparser import ConfigParser
+from contextlib import contextmanager
 
+import numpy as np
 import pandas as pd
 import psycopg2
-from sqlalchemy import create_engine
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+
+COPY_FORMATS = ["csv", "binary"]
+
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+NULL_FIELD = struct.pack("!i", -1)
+POSTGRES_EPOCH = pd.Timestamp("2000-01-01")
+
+# numpy format of fixed width postgres types, dates and timestamps are counted
+# from POSTGRES_EPOCH in days and microseconds
+BINARY_NUMBERS = {
+    "smallint": (">i2", None),
+    "integer": (">i4", None),
+    "bigint": (">i8", None),
+    "real": (">f4", None),
+    "double precision": (">f8", None),
+    "date": (">i4", pd.Timedelta(days=1)),
+    "timestamp without time zone": (">i8", pd.Timedelta(microseconds=1)),
+}
+BINARY_TEXTS = ["text", "character varying", "character"]
 
 
 class Database:
-    def __init__(self, config_file_path: str):
+    def __init__(self, config_file_path: str, minconn: int = 1, maxconn: int = 4):
+        """
+        Database whose connections are taken from a pool created on first use
+
+        :param config_file_path:
+        :param minconn: connections kept open by the pool
+        :param maxconn: maximum connections opened by the pool
+        """
         self.config_file_path = config_file_path
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._credentials = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self.stats = {"statements": 0, "statement_seconds": 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def parser(self, section="postgresql") -> dict:
         """
@@ -37,43 +84,148 @@ class Database:
 
         return db
 
+    @property
+    def credentials(self) -> dict:
+        """
+        Connection arguments, the ini file is parsed once
+
+        :return:
+        """
+        if self._credentials is None:
+            self._credentials = self.parser()
+        return self._credentials
+
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        """
+        Connection pool, created on first use
+
+        :return:
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(
+                    self.minconn, self.maxconn, **self.credentials
+                )
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a pooled connection, committed when the block succeeds and
+        rolled back otherwise
+
+        :return:
+        """
+        conn = self.pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            # broken connections are discarded instead of returned to the pool
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    def execute(self, cur, query, params=None) -> None:
+        """
+        Execute a statement on a cursor and record its duration
+
+        :param cur:
+        :param query:
+        :param params:
+        :return:
+        """
+        start = time.perf_counter()
+        try:
+            cur.execute(query, params)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def copy(self, cur, query, buffer) -> None:
+        """
+        Run a COPY FROM STDIN statement on a cursor and record its duration
+
+        :param cur:
+        :param query:
+        :param buffer:
+        :return:
+        """
+        start = time.perf_counter()
+        try:
+            cur.copy_expert(query, buffer)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def _record(self, duration: float) -> None:
+        """
+        Add a statement duration to stats
+
+        :param duration:
+        :return:
+        """
+        with self._lock:
+            self.stats["statements"] += 1
+            self.stats["statement_seconds"] += duration
+
+    def get_stats(self) -> dict:
+        """
+        Pool size and statement timing stats
+
+        :return:
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            pool = self._pool
+        stats["minconn"] = self.minconn
+        stats["maxconn"] = self.maxconn
+        stats["open_connections"] = (
+            0 if pool is None or pool.closed else len(pool._pool) + len(pool._used)
+        )
+        stats["used_connections"] = 0 if pool is None or pool.closed else len(pool._used)
+        stats["mean_statement_ms"] = (
+            1e3 * stats["statement_seconds"] / stats["statements"]
+            if stats["statements"] > 0
+            else 0.0
+        )
+        return stats
+
+    def close(self) -> None:
+        """
+        Close all pooled connections
+
+        :return:
+        """
+        with self._lock:
+            if self._pool is not None and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+
     def test_connection(self) -> None:
         """
         Function to test postgres connection
 
         :return:
         """
-        """Connect to the PostgreSQL database server"""
-        conn = None
-        credentials = self.parser()
         try:
-            # connect to the PostgreSQL server
             print("Connecting to the PostgreSQL database...")
-            conn = psycopg2.connect(**credentials)
-
-            # create a cursor
-            cur = conn.cursor()
-
-            # execute a statement
-            print("PostgreSQL database version:")
-            cur.execute("SELECT version()")
+            with self.connection() as conn:
+                cur = conn.cursor()
 
-            # display the PostgreSQL database server version
-            db_version = cur.fetchone()
-            print(db_version)
+                # display the PostgreSQL database server version
+                print("PostgreSQL database version:")
+                self.execute(cur, "SELECT version()")
+                print(cur.fetchone())
 
-            # close the communication with the PostgreSQL
-            cur.close()
+                cur.close()
         except (Exception, psycopg2.DatabaseError) as error:
             print(error)
-        finally:
-            if conn is not None:
-                conn.close()
-                print("Database connection closed.")
 
     def execute_query(self, query: str) -> None:
         """
-        Function to execute string query
+        Function to execute string query, errors being raised so that callers
+        do not go on after a failed write
 
         :param query:
         :return:
@@ -81,22 +233,14 @@ class Database:
         if query is None:
             raise Exception("You need to specify your query")
 
-        conn = None
-        credentials = self.parser()
         try:
             print("Execute query into database")
-            conn = psycopg2.connect(**credentials)
-
-            cur = conn.cursor()
-            cur.execute(query)
-            cur.close()
-
-            conn.commit()
+            with self.connection() as conn:
+                cur = conn.cursor()
+                self.execute(cur, query)
+                cur.close()
         except Exception as error:
-            print(error)
-        finally:
-            if conn is not None:
-                conn.close()
+            raise Exception(f"Query failed: {error}") from error
 
     def select_query(self, query: str) -> None:
         """
@@ -108,50 +252,299 @@ class Database:
         if query is None:
             raise Exception("You need to specify your query")
 
-        conn = None
-        credentials = self.parser()
         try:
             print("Select query execution")
-            conn = psycopg2.connect(**credentials)
+            with self.connection() as conn:
+                cur = conn.cursor()
+                self.execute(cur, query)
+                print("The number of rows: ", cur.rowcount)
+                cur.close()
+        except Exception as error:
+            print(error)
+
+    def count_rows(self, table_name: str):
+        """
+        Count rows of a table
+
+        :param table_name:
+        :return: number of rows, None when the table does not exist
+        """
+        with self.connection() as conn:
             cur = conn.cursor()
+            self.execute(cur, "SELECT to_regclass(%s)", (table_name,))
+            if cur.fetchone()[0] is None:
+                cur.close()
+                return None
+            self.execute(
+                cur, sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(table_name))
+            )
+            rows = cur.fetchone()[0]
+            cur.close()
+        return rows
 
-            cur.execute(query)
+    def insert_df_into_table(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        chunksize: int = 100_000,
+        copy_format: str = "csv",
+    ) -> int:
+        """
+        Append dataframe to an existing postgres table with COPY FROM STDIN
 
-            print("The number of rows: ", cur.rowcount)
+        Chunks are sent in a single transaction, so that a failed load leaves
+        the table unchanged and raises.
 
-            cur.close()
+        :param df:
+        :param table_name:
+        :param chunksize: rows sent per COPY statement
+        :param copy_format: "csv" or "binary"
+        :return: number of loaded rows
+        """
+        if len(df) == 0:
+            print("Dataframe is empty.")
+            return 0
+        if table_name is None:
+            raise Exception("Please add a table name to insert into.")
+        if copy_format not in COPY_FORMATS:
+            raise Exception(f"Copy format {copy_format} is not one of {COPY_FORMATS}.")
 
-            conn.commit()
+        start = time.perf_counter()
+        try:
+            with self.connection() as conn:
+                cur = conn.cursor()
+                self.copy_df(cur, df, table_name, table_name, chunksize, copy_format)
+                cur.close()
         except Exception as error:
-            print(error)
-        finally:
-            if conn is not None:
-                conn.close()
+            raise Exception(f"Loading {table_name} failed: {error}") from error
 
-    def insert_df_into_table(self, df: pd.DataFrame, table_name: str) -> None:
+        self._print_load(len(df), table_name, time.perf_counter() - start)
+        return len(df)
+
+    def upsert_df_into_table(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        keys: list,
+        chunksize: int = 100_000,
+        copy_format: str = "csv",
+        scope: str = None,
+    ) -> int:
         """
-        Using sqlAlchemy append dataframe to postgres table
+        Insert dataframe rows into an existing postgres table and update the
+        rows having the same keys
+
+        Rows are copied into a temporary table first, then merged with
+        INSERT ON CONFLICT in the same transaction, a failure leaving the
+        table unchanged and raising.
 
         :param df:
         :param table_name:
-        :return:
+        :param keys: columns of the table primary key
+        :param chunksize: rows sent per COPY statement
+        :param copy_format: "csv" or "binary"
+        :param scope: column whose values in df are fully replaced, i.e year,
+            table rows of these values missing from df are deleted
+        :return: number of upserted rows
         """
         if len(df) == 0:
             print("Dataframe is empty.")
-            return
+            return 0
         if table_name is None:
             raise Exception("Please add a table name to insert into.")
+        if copy_format not in COPY_FORMATS:
+            raise Exception(f"Copy format {copy_format} is not one of {COPY_FORMATS}.")
 
-        conn = None
-        credentials = self.parser()
-
+        staging_name = f"{table_name}_upsert"
+        table, staging = sql.Identifier(table_name), sql.Identifier(staging_name)
+        columns = sql.SQL(", ").join(map(sql.Identifier, df.columns))
+        start = time.perf_counter()
         try:
-            conn = create_engine(
-                f"""postgresql+psycopg2://{credentials['user']}:{credentials['password']}@{credentials['host']}:
-                5432/{credentials['database']}"""
-            )
+            with self.connection() as conn:
+                cur = conn.cursor()
+                self.execute(
+                    cur,
+                    sql.SQL(
+                        "CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP"
+                    ).format(staging, table),
+                )
+                self.copy_df(cur, df, staging_name, table_name, chunksize, copy_format)
 
-            df.to_sql(table_name, conn, index=False, if_exists="replace")
-            conn.commit()
+                if scope is not None:
+                    self.execute(
+                        cur,
+                        sql.SQL(
+                            "DELETE FROM {table} t "
+                            "WHERE t.{scope} IN (SELECT DISTINCT {scope} FROM {staging}) "
+                            "AND NOT EXISTS (SELECT 1 FROM {staging} s WHERE {match})"
+                        ).format(
+                            table=table,
+                            staging=staging,
+                            scope=sql.Identifier(scope),
+                            match=sql.SQL(" AND ").join(
+                                sql.SQL("s.{key} = t.{key}").format(
+                                    key=sql.Identifier(key)
+                                )
+                                for key in keys
+                            ),
+                        ),
+                    )
+
+                updates = [
+                    sql.SQL("{column} = EXCLUDED.{column}").format(
+                        column=sql.Identifier(column)
+                    )
+                    for column in df.columns
+                    if column not in keys
+                ]
+                self.execute(
+                    cur,
+                    sql.SQL(
+                        "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                        "ON CONFLICT ({keys}) DO "
+                    ).format(
+                        table=table,
+                        columns=columns,
+                        staging=staging,
+                        keys=sql.SQL(", ").join(map(sql.Identifier, keys)),
+                    )
+                    + (
+                        sql.SQL("UPDATE SET ") + sql.SQL(", ").join(updates)
+                        if len(updates) > 0
+                        else sql.SQL("NOTHING")
+                    ),
+                )
+                cur.close()
         except Exception as error:
-            print(error)
+            raise Exception(f"Loading {table_name} failed: {error}") from error
+
+        self._print_load(len(df), table_name, time.perf_counter() - start)
+        return len(df)
+
+    def copy_df(
+        self,
+        cur,
+        df: pd.DataFrame,
+        table_name: str,
+        types_table_name: str,
+        chunksize: int,
+        copy_format: str,
+    ) -> None:
+        """
+        Send dataframe chunks to a table with COPY FROM STDIN
+
+        :param cur:
+        :param df:
+        :param table_name:
+        :param types_table_name: table whose column types are used to encode
+            binary data, i.e the target of a temporary table
+        :param chunksize:
+        :param copy_format:
+        :return:
+        """
+        copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT {})").format(
+            sql.Identifier(table_name),
+            sql.SQL(", ").join(map(sql.Identifier, df.columns)),
+            sql.SQL(copy_format),
+        )
+        if copy_format == "binary":
+            self.execute(
+                cur,
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = %s",
+                (types_table_name,),
+            )
+            column_types = dict(cur.fetchall())
+            types = [column_types[c] for c in df.columns]
+
+        for chunk_start in range(0, len(df), chunksize):
+            chunk = df.iloc[chunk_start : chunk_start + chunksize]
+            if copy_format == "binary":
+                buffer = io.BytesIO(encode_binary_copy(chunk, types))
+            else:
+                buffer = io.StringIO()
+                chunk.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+            self.copy(cur, copy_query, buffer)
+
+    @staticmethod
+    def _print_load(rows: int, table_name: str, duration: float) -> None:
+        """
+        Print load throughput
+
+        :param rows:
+        :param table_name:
+        :param duration:
+        :return:
+        """
+        print(
+            f"{rows} rows loaded into {table_name} in {duration:.1f}s "
+            f"({rows / duration:.0f} rows/s)"
+        )
+
+
+def encode_binary_copy(df: pd.DataFrame, types: list) -> bytes:
+    """
+    Encode dataframe in PostgreSQL binary COPY format
+
+    :param df:
+    :param types: postgres data type of each column
+    :return:
+    """
+    fields = [
+        _encode_binary_column(df[column], data_type)
+        for column, data_type in zip(df.columns, types)
+    ]
+    field_count = struct.pack("!h", len(fields))
+    rows = itertools.chain.from_iterable(
+        zip(itertools.repeat(field_count, len(df)), *fields)
+    )
+    return BINARY_HEADER + b"".join(rows) + BINARY_TRAILER
+
+
+def _encode_binary_column(column: pd.Series, data_type: str) -> list:
+    """
+    Encode each value of a column as a binary COPY field
+
+    :param column:
+    :param data_type:
+    :return: length prefixed values
+    """
+    missing = column.isna().to_numpy()
+    if data_type in BINARY_NUMBERS:
+        if pd.api.types.is_datetime64_any_dtype(column):
+            column = column.dt.tz_localize(None) if column.dt.tz else column
+            values = (column - POSTGRES_EPOCH) // BINARY_NUMBERS[data_type][1]
+        else:
+            values = column
+        fmt = BINARY_NUMBERS[data_type][0]
+        kind = "float64" if np.dtype(fmt).kind == "f" else "int64"
+        values = values.to_numpy(dtype=kind, na_value=0).astype(fmt)
+        record = np.empty(len(values), dtype=[("size", ">i4"), ("value", fmt)])
+        record["size"] = np.dtype(fmt).itemsize
+        record["value"] = values
+        step = record.itemsize
+        buffer = record.tobytes()
+        encoded = [buffer[i : i + step] for i in range(0, len(buffer), step)]
+    elif data_type in BINARY_TEXTS:
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # encode each category once
+            categories = [_encode_text(c) for c in column.cat.categories.astype(str)]
+            encoded = [categories[code] for code in column.cat.codes.to_numpy()]
+        else:
+            encoded = [_encode_text(str(v)) for v in column.to_numpy()]
+    else:
+        raise Exception(f"Binary copy of {data_type} columns is not supported.")
+
+    return [NULL_FIELD if m else field for field, m in zip(encoded, missing)]
+
+
+def _encode_text(value: str) -> bytes:
+    """
+    Encode text as a length prefixed binary COPY field
+
+    :param value:
+    :return:
+    """
+    value = value.encode("utf-8")
+    return struct.pack("!i", len(value)) + value
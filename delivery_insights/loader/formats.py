@@ -0,0 +1,445 @@
+import gzip
+import json
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Formats of files written by the pipelines, by name and suffix. Parquet and
+# feather files are folders of parts, so that chunks can be appended.
+FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+SCHEMA_SUFFIX = ".schema.json"
+CSV_SEP = ";"
+# rows converted at once, so that memory does not grow with the written frame
+WRITE_ROWS = 100_000
+
+
+def get_format_path(filename: str, file_format: str) -> str:
+    """
+    Get filename with the suffix of a format, instead of the one of another
+    format
+
+    :param filename:
+    :param file_format: one of FORMATS
+    :return:
+    """
+    if file_format not in FORMATS:
+        raise Exception(f"Format {file_format} is not one of {list(FORMATS)}.")
+    for suffix in sorted(FORMATS.values(), key=len, reverse=True):
+        if filename.endswith(suffix):
+            filename = filename[: -len(suffix)]
+            break
+    return f"{filename}{FORMATS[file_format]}"
+
+
+def has_schema(path: str) -> bool:
+    """
+    Check a file was written with a schema sidecar
+
+    :param path:
+    :return:
+    """
+    return os.path.exists(f"{path}{SCHEMA_SUFFIX}")
+
+
+def read_schema(path: str) -> dict:
+    """
+    Read the schema sidecar of a file
+
+    :param path:
+    :return: format, csv separator, dtypes of columns and number of rows
+    """
+    with open(f"{path}{SCHEMA_SUFFIX}") as f:
+        return json.load(f)
+
+
+def update_schema(path: str, file_format: str, schema: dict, append: bool = False):
+    """
+    Write the schema sidecar of a file, adding the schema of appended rows to
+    the one of the file
+
+    :param path:
+    :param file_format:
+    :param schema: get_schema result of the written rows
+    :param append:
+    :return: schema of the file
+    """
+    if append and has_schema(path):
+        schema = merge_schemas(read_schema(path), schema)
+    schema = {"format": file_format, "sep": CSV_SEP, **schema}
+    with open(f"{path}{SCHEMA_SUFFIX}.tmp", "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(f"{path}{SCHEMA_SUFFIX}.tmp", f"{path}{SCHEMA_SUFFIX}")
+    return schema
+
+
+def get_schema(data: pd.DataFrame) -> dict:
+    """
+    Describe columns of a frame, with the categories of categorical columns
+
+    :param data:
+    :return:
+    """
+    columns = {}
+    for column in data.columns:
+        dtype = data[column].dtype
+        columns[column] = {"dtype": str(dtype)}
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[column]["categories"] = dtype.categories.tolist()
+    return {"columns": columns, "rows": len(data)}
+
+
+def merge_schemas(schema: dict, other: dict) -> dict:
+    """
+    Merge schemas of two parts of a file, differing categories being merged
+    and sorted like in schema.concat_frames
+
+    :param schema:
+    :param other:
+    :return:
+    """
+    if list(schema["columns"]) != list(other["columns"]):
+        raise Exception(
+            f"Columns {list(other['columns'])} differ from {list(schema['columns'])}."
+        )
+    columns = {}
+    for column, description in schema["columns"].items():
+        columns[column] = dict(description)
+        categories = other["columns"][column].get("categories")
+        if categories is not None and categories != description.get("categories"):
+            columns[column]["categories"] = sorted(
+                set(description.get("categories", [])) | set(categories)
+            )
+    return {"columns": columns, "rows": schema["rows"] + other["rows"]}
+
+
+def write_frame(
+    data: pd.DataFrame,
+    path: str,
+    file_format: str = "csv",
+    append: bool = False,
+    header: bool = None,
+    workers: int = None,
+) -> dict:
+    """
+    Write a frame WRITE_ROWS rows at a time, without its schema sidecar
+
+    Parquet and feather rows are written as a new part of the path folder,
+    feather parts being uncompressed Arrow IPC files that can be memory
+    mapped. Compressed csv blocks are compressed by threads while the next
+    ones are formatted, as gzip members of a single file.
+
+    :param data:
+    :param path:
+    :param file_format: one of FORMATS
+    :param append: append rows to the file
+    :param header: write csv header, when the file is not appended by default
+    :param workers: compressing threads, number of CPUs when None
+    :return: get_schema result of data
+    """
+    if file_format not in FORMATS:
+        raise Exception(f"Format {file_format} is not one of {list(FORMATS)}.")
+    if not append:
+        remove_frame(path)
+    header = not append if header is None else header
+
+    if file_format == "csv":
+        for start in range(0, max(len(data), 1), WRITE_ROWS):
+            data.iloc[start : start + WRITE_ROWS].to_csv(
+                path,
+                index=False,
+                sep=CSV_SEP,
+                mode="w" if start == 0 and not append else "a",
+                header=header and start == 0,
+            )
+    elif file_format == "csv.gz":
+        _write_gzip(data, path, append, header, workers)
+    else:
+        _write_part(data, path, file_format)
+    return get_schema(data)
+
+
+def open_frame(path: str, file_format: str, columns: list, append: bool = False):
+    """
+    Start a file whose parts are appended with append_part, i.e written by
+    other processes
+
+    :param path:
+    :param file_format:
+    :param columns: columns of the csv header
+    :param append: keep the rows of the file
+    :return:
+    """
+    if append:
+        return
+    remove_frame(path)
+    if file_format in ["csv", "csv.gz"]:
+        write_frame(pd.DataFrame(columns=columns), path, file_format)
+
+
+def append_part(part_path: str, path: str, file_format: str) -> None:
+    """
+    Append a part written without csv header by write_frame to a file, the
+    part being removed
+
+    :param part_path:
+    :param path:
+    :param file_format:
+    :return:
+    """
+    if file_format in ["csv", "csv.gz"]:
+        # gzip members can be concatenated
+        with open(part_path, "rb") as part, open(path, "ab") as output:
+            shutil.copyfileobj(part, output, 1 << 20)
+        os.remove(part_path)
+        return
+
+    os.makedirs(path, exist_ok=True)
+    for name in sorted(os.listdir(part_path)):
+        os.replace(
+            os.path.join(part_path, name),
+            os.path.join(path, _get_part_name(path, file_format)),
+        )
+    shutil.rmtree(part_path)
+
+
+def remove_frame(path: str) -> None:
+    """
+    Remove a file or folder of parts written by write_frame, and its schema
+
+    :param path:
+    :return:
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    if has_schema(path):
+        os.remove(f"{path}{SCHEMA_SUFFIX}")
+
+
+def read_frame(path: str, columns: list = None) -> pd.DataFrame:
+    """
+    Read a file written by write_frame with the reader and dtypes of its
+    schema sidecar
+
+    Feather parts are memory mapped, so that only the pages of the read
+    columns are loaded, and are shared by processes reading the same file.
+
+    :param path:
+    :param columns: columns to read, all when None
+    :return:
+    """
+    schema, columns = _get_read_schema(path, columns)
+    descriptions = schema["columns"]
+
+    if schema["format"] in ["csv", "csv.gz"]:
+        data = pd.read_csv(path, **_get_csv_kwargs(schema, columns))[columns]
+    elif schema["format"] == "feather":
+        data = pa.concat_tables(_iter_feather(path, columns)).to_pandas()
+    else:
+        data = ds.dataset(path, format="parquet").to_table(columns=columns).to_pandas()
+    return _set_categories(data, descriptions)
+
+
+def iter_frame(path: str, columns: list = None, batch_rows: int = WRITE_ROWS):
+    """
+    Read a file written by write_frame batch_rows rows at a time, like
+    read_frame
+
+    :param path:
+    :param columns: columns to read, all when None
+    :param batch_rows: rows of each batch
+    :return: generator of frames
+    """
+    schema, columns = _get_read_schema(path, columns)
+    descriptions = schema["columns"]
+
+    if schema["format"] in ["csv", "csv.gz"]:
+        chunks = pd.read_csv(
+            path, chunksize=batch_rows, **_get_csv_kwargs(schema, columns)
+        )
+        for chunk in chunks:
+            yield _set_categories(chunk[columns], descriptions)
+        return
+
+    if schema["format"] == "feather":
+        # batches are slices of the memory mapped parts, without copy
+        batches = (
+            batch
+            for table in _iter_feather(path, columns)
+            for batch in table.to_batches(max_chunksize=batch_rows)
+        )
+    else:
+        batches = ds.dataset(path, format="parquet").to_batches(
+            columns=columns, batch_size=batch_rows
+        )
+    for batch in batches:
+        if batch.num_rows > 0:
+            yield _set_categories(batch.to_pandas(), descriptions)
+
+
+def _get_read_schema(path: str, columns: list = None) -> tuple:
+    """
+    Read the schema sidecar of a file, checking read columns are in it
+
+    :param path:
+    :param columns: columns to read, all when None
+    :return: schema and read columns
+    """
+    schema = read_schema(path)
+    columns = list(schema["columns"]) if columns is None else columns
+    wrong_cols = [c for c in columns if c not in schema["columns"]]
+    if len(wrong_cols) > 0:
+        raise Exception(f"Columns {wrong_cols} are not in {os.path.basename(path)}.")
+    return schema, columns
+
+
+def _get_csv_kwargs(schema: dict, columns: list) -> dict:
+    """
+    Get read_csv arguments reading columns with the separator and dtypes of
+    a schema
+
+    :param schema:
+    :param columns:
+    :return:
+    """
+    descriptions = schema["columns"]
+    dates = [c for c in columns if descriptions[c]["dtype"].startswith("datetime")]
+    return dict(
+        sep=schema["sep"],
+        usecols=columns,
+        dtype={c: descriptions[c]["dtype"] for c in columns if c not in set(dates)},
+        parse_dates=dates,
+        compression="gzip" if schema["format"] == "csv.gz" else None,
+    )
+
+
+def _set_categories(data: pd.DataFrame, descriptions: dict) -> pd.DataFrame:
+    """
+    Set categories of the file to categorical columns of read rows
+
+    :param data:
+    :param descriptions: columns of a schema
+    :return:
+    """
+    for column in data.columns:
+        categories = descriptions[column].get("categories")
+        if categories is not None:
+            # astype keeps the order of categories of an unordered categorical
+            data[column] = data[column].astype("category").cat.set_categories(categories)
+    return data
+
+
+def _write_gzip(data: pd.DataFrame, path: str, append: bool, header: bool, workers):
+    """
+    Write csv blocks of data as gzip members compressed by threads
+
+    :param data:
+    :param path:
+    :param append:
+    :param header:
+    :param workers:
+    :return:
+    """
+    workers = workers or os.cpu_count()
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(
+        path, "ab" if append else "wb"
+    ) as f:
+        members = deque()
+        for start in range(0, max(len(data), 1), WRITE_ROWS):
+            text = data.iloc[start : start + WRITE_ROWS].to_csv(
+                index=False, sep=CSV_SEP, header=header and start == 0
+            )
+            # zlib releases the GIL, blocks are compressed while the next
+            # ones are formatted
+            members.append(
+                executor.submit(gzip.compress, text.encode(), compresslevel=6, mtime=0)
+            )
+            while len(members) > workers:
+                f.write(members.popleft().result())
+        while len(members) > 0:
+            f.write(members.popleft().result())
+
+
+def _write_part(data: pd.DataFrame, path: str, file_format: str) -> None:
+    """
+    Write data as a new parquet or feather part of the path folder
+
+    :param data:
+    :param path:
+    :param file_format:
+    :return:
+    """
+    os.makedirs(path, exist_ok=True)
+    part_path = os.path.join(path, _get_part_name(path, file_format))
+    schema = _get_arrow_schema(data)
+    tables = (
+        pa.Table.from_pandas(
+            data.iloc[start : start + WRITE_ROWS], schema=schema, preserve_index=False
+        )
+        for start in range(0, max(len(data), 1), WRITE_ROWS)
+    )
+    if file_format == "parquet":
+        with pq.ParquetWriter(f"{part_path}.tmp", schema) as writer:
+            for table in tables:
+                writer.write_table(table)
+    else:
+        with pa.OSFile(f"{part_path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for table in tables:
+                    writer.write_table(table)
+    os.replace(f"{part_path}.tmp", part_path)
+
+
+def _iter_feather(path: str, columns: list):
+    """
+    Read columns of feather parts through memory maps
+
+    :param path:
+    :param columns:
+    :return: generator of Arrow tables of each part
+    """
+    for name in sorted(os.listdir(path)):
+        with pa.memory_map(os.path.join(path, name), "r") as source:
+            yield pa.ipc.open_file(source).read_all().select(columns)
+
+
+def _get_arrow_schema(data: pd.DataFrame) -> pa.Schema:
+    """
+    Get Arrow schema of a whole frame, so that its blocks all have the same,
+    i.e when a block has only missing values in a column
+
+    :param data:
+    :return:
+    """
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(
+                i,
+                field.with_type(pa.dictionary(pa.int32(), field.type.value_type)),
+            )
+    return schema
+
+
+def _get_part_name(path: str, file_format: str) -> str:
+    """
+    Get name of the next part of a folder of parts
+
+    :param path:
+    :param file_format:
+    :return:
+    """
+    parts = [name for name in os.listdir(path) if not name.endswith(".tmp")]
+    return f"part-{len(parts):05d}{FORMATS[file_format]}"
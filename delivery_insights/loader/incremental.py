@@ -0,0 +1,74 @@
+import json
+import os
+
+from delivery_insights.loader.cache import get_cache_path, read_manifest
+
+RUN_MANIFEST = "_run_manifest.json"
+
+
+def get_year_fingerprints(folder: str, files_list: list) -> dict:
+    """
+    Get fingerprints of each Year partition of staged files
+
+    :param folder:
+    :param files_list:
+    :return: combined fingerprint of files by year
+    """
+    manifests = []
+    for f in files_list:
+        manifest = read_manifest(get_cache_path(folder, f))
+        if manifest is None:
+            raise Exception(f"{f} is not staged.")
+        manifests.append(manifest["fingerprints"])
+
+    years = sorted({int(year) for fingerprints in manifests for year in fingerprints})
+    return {
+        year: "/".join(fingerprints.get(str(year), "") for fingerprints in manifests)
+        for year in years
+    }
+
+
+def read_run_manifest(output_folder: str) -> dict:
+    """
+    Read year fingerprints of the last incremental run, empty when there was
+    no run
+
+    :param output_folder:
+    :return:
+    """
+    path = os.path.join(output_folder, RUN_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {int(year): fp for year, fp in json.load(f)["fingerprints"].items()}
+
+
+def write_run_manifest(output_folder: str, fingerprints: dict) -> None:
+    """
+    Record year fingerprints of a finished incremental run
+
+    :param output_folder:
+    :param fingerprints:
+    :return:
+    """
+    path = os.path.join(output_folder, RUN_MANIFEST)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(
+            {"fingerprints": {str(y): fp for y, fp in sorted(fingerprints.items())}},
+            f,
+            indent=2,
+        )
+    os.replace(f"{path}.tmp", path)
+
+
+def get_changed_years(previous: dict, current: dict):
+    """
+    Compare year fingerprints of two runs
+
+    :param previous:
+    :param current:
+    :return: new or changed years and removed years
+    """
+    changed = sorted(y for y, fp in current.items() if previous.get(y) != fp)
+    removed = sorted(set(previous) - set(current))
+    return changed, removed
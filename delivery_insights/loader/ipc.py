@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from delivery_insights.loader.cache import to_arrow_table
+from delivery_insights.loader.schema import coerce_dtypes
+
+IPC_SUFFIX = ".arrow"
+
+
+def write_ipc(data: pd.DataFrame, path: str) -> str:
+    """
+    Write a frame as an Arrow IPC file, under a temporary name renamed once
+    complete
+
+    :param data:
+    :param path:
+    :return: path
+    """
+    table = to_arrow_table(data)
+    with pa.OSFile(f"{path}.tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def read_ipc(path: str, columns: list = None) -> pd.DataFrame:
+    """
+    Read an Arrow IPC file through a memory map, so that only the columns
+    converted to pandas are copied
+
+    :param path:
+    :param columns: columns to read, all when None
+    :return:
+    """
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        data = table.to_pandas()
+    return coerce_dtypes(data)
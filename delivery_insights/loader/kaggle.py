@@ -1,46 +1,331 @@
-import os.path
-from zipfile import ZipFile
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import BadZipFile, ZipFile, is_zipfile
 
-from kaggle.api.kaggle_api_extended import KaggleApi
+from delivery_insights.loader.cache import file_hash
+
+DOWNLOAD_FOLDER = ".download"
+DOWNLOAD_MANIFEST = "_downloads.json"
 
 
 class kaggle:
-    def __init__(self, repo: str, files_list: []):
+    def __init__(
+        self,
+        repo: str,
+        files_list: [],
+        output_folder: str = None,
+        workers: int = 4,
+        retries: int = 3,
+        backoff: float = 1.0,
+        keep_zip: bool = False,
+        api=None,
+    ):
+        """
+        Loader of csv files of a Kaggle dataset
+
+        :param repo:
+        :param files_list:
+        :param output_folder: folder csv files are written to, current
+            directory when None
+        :param workers: number of files downloaded at the same time
+        :param retries: attempts of a file download before failing
+        :param backoff: seconds before the first retry, doubled at each retry
+        :param keep_zip: store downloaded zip archives instead of decompressing
+            them, pipelines reading csv files out of them
+        :param api: authenticated KaggleApi, created when None
+        """
         self.repo = repo
         self.files_list = files_list
+        self.output_folder = output_folder or os.getcwd()
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_zip = keep_zip
+        self._api = api
+        self._lock = threading.Lock()
 
-    def load_files(self):
+    @property
+    def api(self):
         """
-        Using Kaggle API load csv files from Kaggle repo
+        Kaggle API, authenticated on first use
 
         :return:
         """
-        try:
-            api = KaggleApi()
-            api.authenticate()
-            for f in self.files_list:
-                if os.path.exists(os.path.join(os.getcwd(), f)):
-                    print(f"{f} exists already.")
-                elif os.path.exists(os.path.join(os.getcwd(), f"{f}.zip")):
-                    print(f"{f}.zip file found. Unzipping...")
-                    self.unzip_file(f)
-                else:
-                    print(f"Loading file : {f}")
-                    api.dataset_download_file(self.repo, f)
-                    self.unzip_file(f)
+        with self._lock:
+            if self._api is None:
+                # the kaggle package authenticates when imported
+                from kaggle.api.kaggle_api_extended import KaggleApi
+
+                self._api = KaggleApi()
+                self._api.authenticate()
+            return self._api
+
+    def load_files(self) -> list:
+        """
+        Using Kaggle API load csv files from Kaggle repo into output folder,
+        several files at a time
+
+        :return: paths of csv files or of their zip archives
+        """
+        sizes = self.get_remote_sizes()
+        workers = max(1, min(self.workers, len(self.files_list)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                f: executor.submit(self.load_file, f, sizes.get(f))
+                for f in self.files_list
+            }
+        errors = {}
+        for f, future in futures.items():
+            if future.exception() is not None:
+                errors[f] = future.exception()
+        if errors:
+            raise Exception(
+                "Failed to load "
+                + ", ".join(f"{f} ({error})" for f, error in errors.items())
+            )
+        shutil.rmtree(
+            os.path.join(self.output_folder, DOWNLOAD_FOLDER), ignore_errors=True
+        )
+        return [futures[f].result() for f in self.files_list]
 
+    def get_remote_sizes(self) -> dict:
+        """
+        Get sizes of dataset files from Kaggle, empty when they can not be
+        listed
+
+        :return: uncompressed size by file name
+        """
+        try:
+            files = self.api.dataset_list_files(self.repo).files
         except Exception as e:
-            print(f"Error: {e}")
+            print(f"Files of {self.repo} can not be listed: {e}")
+            return {}
+        return {f.name: int(f.totalBytes) for f in files}
 
-    def unzip_file(self, f):
+    def load_file(self, f: str, size: int = None) -> str:
         """
-        Unzip csv files loaded from Kaggle
+        Load a csv file unless it is already complete in output folder
+
+        A file is complete when it matches the download manifest and has the
+        size listed by Kaggle. A zip left by an interrupted run is used
+        instead of being downloaded again when its content has the listed
+        size.
+
+        :param f:
+        :param size: uncompressed size listed by Kaggle, not checked when None
+        :return: path of csv file, or of its zip archive when zips are kept
+        """
+        path = self.get_stored_path(f, size)
+        if path is not None:
+            print(f"{f} exists already.")
+            return path
+
+        download_folder = os.path.join(self.output_folder, DOWNLOAD_FOLDER)
+        os.makedirs(download_folder, exist_ok=True)
+        download = find_download(download_folder, f)
+        if download is not None and is_download_complete(download, size):
+            print(f"{os.path.basename(download)} found.")
+        else:
+            download = self.download_file(f, download_folder)
+
+        if self.keep_zip and download.endswith(".zip"):
+            # pipelines stream the csv file out of the archive
+            path = os.path.join(self.output_folder, os.path.basename(download))
+            entry = {"size": get_zip_size(download), "sha256": file_hash(download)}
+            os.replace(download, path)
+        else:
+            print(f"Extracting file : {f}")
+            path = os.path.join(self.output_folder, f)
+            entry = extract_file(download, path)
+            os.remove(download)
+        if size is not None and entry["size"] != size:
+            os.remove(path)
+            raise Exception(f"{f} has {entry['size']} bytes instead of {size}.")
+
+        stat = os.stat(path)
+        entry.update(
+            file=os.path.basename(path),
+            stored_size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+        self.update_manifest(f, entry)
+        return path
+
+    def download_file(self, f: str, download_folder: str) -> str:
+        """
+        Download a file of Kaggle repo, retrying failed downloads
 
         :param f:
+        :param download_folder:
+        :return: path of downloaded file, a zip for compressed files
+        """
+        for attempt in range(self.retries):
+            try:
+                print(f"Loading file : {f}")
+                self.api.dataset_download_file(
+                    self.repo, f, path=download_folder, force=True, quiet=True
+                )
+                download = find_download(download_folder, f)
+                if download is None:
+                    raise Exception(f"{f} was not downloaded.")
+                if is_zipfile(download) or not download.endswith(".zip"):
+                    return download
+                raise BadZipFile(f"{os.path.basename(download)} is not a zip file.")
+            except Exception as e:
+                if attempt == self.retries - 1:
+                    raise
+                delay = self.backoff * 2**attempt
+                print(f"Loading {f} failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+
+    def get_stored_path(self, f: str, size: int = None):
+        """
+        Get path of a csv file, or of its zip archive, of output folder when it
+        matches its download manifest entry
+
+        The checksum is only computed again when the stored file was modified
+        since it was written.
+
+        :param f:
+        :param size: uncompressed size listed by Kaggle, not checked when None
+        :return: path, None when the file is missing or incomplete
+        """
+        entry = self.read_manifest().get(f)
+        if entry is None or (size is not None and entry["size"] != size):
+            return None
+        path = os.path.join(self.output_folder, entry["file"])
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if stat.st_size != entry["stored_size"]:
+            return None
+        if stat.st_mtime_ns == entry["mtime_ns"] or file_hash(path) == entry["sha256"]:
+            return path
+        return None
+
+    def read_manifest(self) -> dict:
+        """
+        Read sizes and checksums of stored files
+
+        :return:
+        """
+        path = os.path.join(self.output_folder, DOWNLOAD_MANIFEST)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as manifest:
+            return json.load(manifest)
+
+    def update_manifest(self, f: str, entry: dict) -> None:
+        """
+        Record size and checksum of a stored file
+
+        :param f:
+        :param entry:
         :return:
         """
-        print(f"Unzipping file : {f}")
-        zf = ZipFile(f"{f}.zip")
-        # extracted data is saved in the same directory as notebook
-        zf.extractall()
-        zf.close()
+        path = os.path.join(self.output_folder, DOWNLOAD_MANIFEST)
+        with self._lock:
+            manifest = self.read_manifest()
+            manifest[f] = entry
+            with open(f"{path}.tmp", "w") as tmp:
+                json.dump(manifest, tmp, indent=2)
+            os.replace(f"{path}.tmp", path)
+
+
+def find_download(download_folder: str, f: str):
+    """
+    Get downloaded file of f, Kaggle serves large files zipped
+
+    :param download_folder:
+    :param f:
+    :return: path of downloaded file, None when there is none
+    """
+    for name in [f"{f}.zip", f]:
+        if os.path.exists(os.path.join(download_folder, name)):
+            return os.path.join(download_folder, name)
+    return None
+
+
+def is_download_complete(download: str, size: int = None) -> bool:
+    """
+    Check a download left by an interrupted run can be extracted
+
+    :param download:
+    :param size: uncompressed size listed by Kaggle
+    :return:
+    """
+    if size is None:
+        return False
+    if not download.endswith(".zip"):
+        return os.path.getsize(download) == size
+    try:
+        return get_zip_size(download) == size
+    except BadZipFile:
+        return False
+
+
+def get_zip_size(path: str) -> int:
+    """
+    Get uncompressed size of the files of a zip archive
+
+    :param path:
+    :return:
+    """
+    with ZipFile(path) as zf:
+        return sum(info.file_size for info in zf.infolist())
+
+
+def extract_file(download: str, path: str, block_size: int = 1 << 20) -> dict:
+    """
+    Decompress a download into path as a stream, hashing its content
+
+    A zip holding the file is read member by member, without extracting it
+    elsewhere first. The file is written under a temporary name and renamed
+    once complete.
+
+    :param download: zip file, or the file itself when it was not compressed
+    :param path:
+    :param block_size:
+    :return: size and sha256 of the file
+    """
+    sha = hashlib.sha256()
+    size = 0
+    with open(f"{path}.part", "wb") as dst:
+        if download.endswith(".zip"):
+            with ZipFile(download) as zf:
+                members = zf.infolist()
+                if len(members) != 1:
+                    raise Exception(
+                        f"{download} holds {len(members)} files instead of 1."
+                    )
+                # zip members are checked against their CRC while read
+                with zf.open(members[0]) as src:
+                    size = _copy(src, dst, sha, block_size)
+        else:
+            with open(download, "rb") as src:
+                size = _copy(src, dst, sha, block_size)
+    os.replace(f"{path}.part", path)
+    return {"size": size, "sha256": sha.hexdigest()}
+
+
+def _copy(src, dst, sha, block_size: int) -> int:
+    """
+    Copy src into dst block by block, updating sha with the blocks
+
+    :param src:
+    :param dst:
+    :param sha:
+    :param block_size:
+    :return: number of bytes copied
+    """
+    size = 0
+    for block in iter(lambda: src.read(block_size), b""):
+        sha.update(block)
+        dst.write(block)
+        size += len(block)
+    return size
@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from delivery_insights.loader.cache import (
+    get_cache_path,
+    is_cached,
+    read_cache,
+    read_manifest,
+    stage_file,
+    to_arrow_table,
+)
+from delivery_insights.loader.schema import (
+    ACCIDENT_INFORMATION,
+    VEHICLE_INFORMATION,
+    coerce_dtypes,
+)
+
+JOIN_KEYS = ["Accident_Index", "Year"]
+JOIN_MODES = ["memory", "year", "hash"]
+
+
+def merge_sources(accident_info: pd.DataFrame, vehicle_info: pd.DataFrame):
+    """
+    Merge accidents and vehicles data
+
+    :param accident_info:
+    :param vehicle_info:
+    :return:
+    """
+    return accident_info.merge(vehicle_info, on=JOIN_KEYS, how="inner").rename(
+        columns={"Date": "Accident_date"}
+    )
+
+
+def stage_sources(folder: str, files_list: list) -> None:
+    """
+    Stage files of folder whose parquet cache is missing or outdated
+
+    :param folder:
+    :param files_list:
+    :return:
+    """
+    for f in files_list:
+        if not is_cached(folder, f):
+            print(f"Staging file : {f}")
+            stage_file(folder, f)
+
+
+def iter_merged(
+    folder: str, join_mode: str = "year", partitions: int = 16, years: list = None
+):
+    """
+    Merge accidents and vehicles files of folder partition by partition
+
+    With "year", both files are merged one staged Year partition at a time.
+    With "hash", both files are first spilled into partitions by a hash of
+    Accident_Index, so that partitions keep a bounded size whatever the
+    years distribution.
+
+    :param folder:
+    :param join_mode: "year" or "hash"
+    :param partitions: number of hash partitions
+    :param years: years to merge, all when None
+    :return: generator of merged chunks
+    """
+    files_list = [ACCIDENT_INFORMATION, VEHICLE_INFORMATION]
+    stage_sources(folder, files_list)
+
+    if join_mode == "year":
+        staged_years = set.intersection(
+            *[set(read_manifest(get_cache_path(folder, f))["years"]) for f in files_list]
+        )
+        for year in sorted(staged_years if years is None else staged_years & set(years)):
+            print(f"Merging year {year}")
+            yield merge_sources(
+                *[read_cache(folder, f, years=[year]) for f in files_list]
+            )
+
+    elif join_mode == "hash":
+        spill_folder = tempfile.mkdtemp(prefix="merge-", dir=folder)
+        try:
+            for f in files_list:
+                spill(folder, f, os.path.join(spill_folder, f), partitions, years)
+            for p in range(partitions):
+                paths = [
+                    os.path.join(spill_folder, f, f"partition={p}") for f in files_list
+                ]
+                # an inner join with an empty side is empty
+                if not all(os.path.exists(path) for path in paths):
+                    continue
+                print(f"Merging partition {p + 1}/{partitions}")
+                yield merge_sources(*[read_spill(path) for path in paths])
+        finally:
+            shutil.rmtree(spill_folder, ignore_errors=True)
+
+    else:
+        raise Exception(f"Join mode {join_mode} is not one of {JOIN_MODES}.")
+
+
+def spill(
+    folder: str, filename: str, spill_path: str, partitions: int, years: list = None
+) -> None:
+    """
+    Write staged file into partitions by hash of Accident_Index, one year
+    partition at a time
+
+    :param folder:
+    :param filename:
+    :param spill_path:
+    :param partitions:
+    :param years: years to spill, all when None
+    :return:
+    """
+    for year in read_manifest(get_cache_path(folder, filename))["years"]:
+        if years is not None and year not in years:
+            continue
+        data = read_cache(folder, filename, years=[year])
+        keys = pd.util.hash_pandas_object(data["Accident_Index"], index=False)
+        for p, partition in data.groupby(keys.to_numpy() % partitions):
+            partition_path = os.path.join(spill_path, f"partition={p}")
+            os.makedirs(partition_path, exist_ok=True)
+            pq.write_table(
+                to_arrow_table(partition),
+                os.path.join(partition_path, f"year-{year}.parquet"),
+            )
+
+
+def read_spill(partition_path: str) -> pd.DataFrame:
+    """
+    Read a spilled partition
+
+    :param partition_path:
+    :return:
+    """
+    return coerce_dtypes(
+        ds.dataset(partition_path, format="parquet").to_table().to_pandas()
+    )
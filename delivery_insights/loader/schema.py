@@ -0,0 +1,212 @@
+import os
+
+import pandas as pd
+
+from delivery_insights.loader.archive import get_member_name, open_source
+
+# bump when DTYPES, SOURCES or the cache manifest change so that cached files
+# are rebuilt
+SCHEMA_VERSION = 5
+
+# Dtypes of the columns used by the transforms and charts, enumerated fields
+# are read as categoricals and numbers with the smallest fitting width.
+DTYPES = {
+    "Accident_Index": "object",
+    "Year": "int16",
+    "Time": "category",
+    "Day_of_Week": "category",
+    "Accident_Severity": "category",
+    "Weather_Conditions": "category",
+    "Age_Band_of_Driver": "category",
+    "Sex_of_Driver": "category",
+    "Age_of_Vehicle": "Int16",
+    "Driver_Home_Area_Type": "category",
+    "Journey_Purpose_of_Driver": "category",
+    "Vehicle_Manoeuvre": "category",
+    "Vehicle_Reference": "int16",
+    "Daytime": "category",
+    "Age_band_of_vehicule": "category",
+    "Hour": "int8",
+    "Latitude": "float32",
+    "Longitude": "float32",
+    "Local_Authority_(District)": "category",
+    "Local_Authority_(Highway)": "category",
+    "LSOA_of_Accident_Location": "category",
+}
+
+DATE_COLUMNS = ["Date", "Accident_date"]
+
+ACCIDENT_INFORMATION = "Accident_Information.csv"
+VEHICLE_INFORMATION = "Vehicle_Information.csv"
+
+# Kaggle files read by the pipelines
+SOURCES = {
+    ACCIDENT_INFORMATION: {
+        "columns": [
+            "Accident_Index",
+            "Year",
+            "Date",
+            "Time",
+            "Day_of_Week",
+            "Accident_Severity",
+            "Weather_Conditions",
+            "Latitude",
+            "Longitude",
+            "Local_Authority_(District)",
+            "Local_Authority_(Highway)",
+            "LSOA_of_Accident_Location",
+        ],
+        "encoding": None,
+    },
+    VEHICLE_INFORMATION: {
+        "columns": [
+            "Accident_Index",
+            "Year",
+            "Age_Band_of_Driver",
+            "Sex_of_Driver",
+            "Age_of_Vehicle",
+            "Driver_Home_Area_Type",
+            "Journey_Purpose_of_Driver",
+            "Vehicle_Manoeuvre",
+            "Vehicle_Reference",
+        ],
+        "encoding": "ISO-8859-1",
+    },
+}
+
+# columns are matched case insensitively as transform lowercases them
+_DTYPES = {column.lower(): dtype for column, dtype in DTYPES.items()}
+_DATE_COLUMNS = [column.lower() for column in DATE_COLUMNS]
+
+
+def get_dtypes(columns: list) -> dict:
+    """
+    Get declared dtypes of columns, dates excluded
+
+    :param columns:
+    :return:
+    """
+    return {c: _DTYPES[c.lower()] for c in columns if c.lower() in _DTYPES}
+
+
+def get_date_columns(columns: list) -> list:
+    """
+    Get columns to parse as dates
+
+    :param columns:
+    :return:
+    """
+    return [c for c in columns if c.lower() in _DATE_COLUMNS]
+
+
+def read_csv(
+    path: str, columns: list = None, encoding: str = None, sep: str = ",", **kwargs
+):
+    """
+    Read csv file keeping only needed columns with their declared dtypes
+
+    Columns default to the ones declared in SOURCES for Kaggle files and to
+    all file columns otherwise. The file can be read from a zip archive, see
+    archive.split_archive.
+
+    :param path:
+    :param columns:
+    :param encoding:
+    :param sep:
+    :param kwargs: other pd.read_csv arguments, i.e chunksize
+    :return:
+    """
+    name = get_member_name(path)
+    source = SOURCES.get(name, {})
+    columns = columns if columns is not None else source.get("columns")
+    encoding = encoding if encoding is not None else source.get("encoding")
+
+    with open_source(path) as f:
+        header = list(pd.read_csv(f, nrows=0, encoding=encoding, sep=sep).columns)
+    if columns is None:
+        columns = header
+    wrong_cols = [c for c in columns if c not in header]
+    if len(wrong_cols) > 0:
+        raise Exception(f"Columns {wrong_cols} are not in {name}.")
+
+    read_kwargs = dict(
+        usecols=columns,
+        dtype=get_dtypes(columns),
+        parse_dates=get_date_columns(columns),
+        encoding=encoding,
+        sep=sep,
+        **kwargs,
+    )
+    if kwargs.get("chunksize") is None and not kwargs.get("iterator"):
+        with open_source(path) as f:
+            return sort_categories(pd.read_csv(f, **read_kwargs))
+    return _iter_csv(path, read_kwargs)
+
+
+def _iter_csv(path: str, read_kwargs: dict):
+    """
+    Read csv chunks, keeping the source open until the last one
+
+    :param path:
+    :param read_kwargs:
+    :return: generator of chunks
+    """
+    with open_source(path) as f:
+        for chunk in pd.read_csv(f, **read_kwargs):
+            yield sort_categories(chunk)
+
+
+def coerce_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast columns to their declared dtypes, i.e after reading from another
+    format than csv
+
+    :param data:
+    :return:
+    """
+    dtypes = {
+        c: dtype
+        for c, dtype in get_dtypes(data.columns).items()
+        if data[c].dtype != dtype
+    }
+    if len(dtypes) > 0:
+        data = data.astype(dtypes)
+    return sort_categories(data)
+
+
+def sort_categories(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort categories of categorical columns, as read_csv keeps them in order of
+    appearance, so that aggregations are ordered like on string columns
+
+    :param data:
+    :return:
+    """
+    for column in data.select_dtypes("category").columns:
+        data[column] = data[column].cat.reorder_categories(
+            sorted(data[column].cat.categories)
+        )
+    return data
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """
+    Concatenate frames keeping categorical columns categorical, pd.concat
+    falls back to object when categories differ between frames
+
+    Categories shared by all frames keep their order, i.e of bands, and
+    differing ones are merged and sorted.
+
+    :param frames:
+    :return:
+    """
+    frames = list(frames)
+    if len(frames) == 0:
+        return pd.DataFrame()
+    dtypes = {}
+    for column in frames[0].select_dtypes("category").columns:
+        categories = frames[0][column].cat.categories
+        if not all(f[column].cat.categories.equals(categories) for f in frames):
+            categories = sorted(set().union(*[f[column].cat.categories for f in frames]))
+        dtypes[column] = pd.CategoricalDtype(categories)
+    return pd.concat([f.astype(dtypes, copy=False) for f in frames], ignore_index=True)
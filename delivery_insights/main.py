@@ -1,66 +1,503 @@
-import warnings
-import pandas as pd
+import functools
 import os
+import shutil
+import warnings
+from delivery_insights.loader.archive import ARCHIVE_SUFFIX
+from delivery_insights.loader.cache import get_cache_path, read_source
+from delivery_insights.loader.db import Database
+from delivery_insights.loader.formats import (
+    SCHEMA_SUFFIX,
+    get_format_path,
+    read_schema,
+    remove_frame,
+)
+from delivery_insights.loader.incremental import (
+    get_changed_years,
+    get_year_fingerprints,
+    read_run_manifest,
+    write_run_manifest,
+)
+from delivery_insights.loader.merge import iter_merged
+from delivery_insights.loader.schema import ACCIDENT_INFORMATION, VEHICLE_INFORMATION
 from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.areas import AREA_FOLDER, AREAS, AreaAggregates
+from delivery_insights.models.backends import get_backend
+from delivery_insights.models.cube import CUBE_FOLDER, AccidentsCube
+from delivery_insights.models.raster import RASTER_FOLDER, RasterTiles
+from delivery_insights.models.risk import RISK_FOLDER, RouteRiskScorer
+from delivery_insights.models.spatial import (
+    LATITUDE,
+    LONGITUDE,
+    SEVERITY,
+    SPATIAL_FOLDER,
+    GridIndex,
+)
 from delivery_insights.pipelines.extract.pipeline import extract
-from delivery_insights.pipelines.transform.pipeline import transform
-from delivery_insights.pipelines.load.pipeline import load
-from delivery_insights.pipelines.visualize.pipeline import visualize
+from delivery_insights.pipelines.stage.pipeline import stage
+from delivery_insights.pipelines.transform.pipeline import (
+    TRANSFORMED_FILE,
+    transform,
+    transform_partitions,
+)
+from delivery_insights.pipelines.load.pipeline import (
+    AREA_TABLE,
+    load,
+    load_areas,
+    load_frame,
+)
+from delivery_insights.pipelines.visualize.pipeline import (
+    CHART_FILENAMES,
+    HEATMAP_FILENAME,
+    HOTSPOT_FILENAME,
+    visualize,
+)
+from delivery_insights.utils import profiling
 from delivery_insights.utils.config import parse_arguments
+from delivery_insights.utils.dag import DAG_MANIFEST, Stage, run_dag
 
-warnings.filterwarnings("ignore")
+REPO = "tsiaras/uk-road-safety-accidents-and-vehicles"
+FILES_LIST = [ACCIDENT_INFORMATION, VEHICLE_INFORMATION]
+TRANSFORMED_FOLDER = "transformed_data"
 
-config = parse_arguments()
-print(config)
-OUTPUT_FOLDER = config["output_folder"]
-DB_CONFIG_FILE = config["db_config_file"]
+TRANSFORM_COLUMNS = [
+    "Accident_Index",
+    "Vehicle_Reference",
+    "Year",
+    "Age_Band_of_Driver",
+    "Age_of_Vehicle",
+    "Driver_Home_Area_Type",
+    "Journey_Purpose_of_Driver",
+    "Accident_Severity",
+    "Accident_date",
+    "Day_of_Week",
+]
 
 
-def main() -> None:
+def main(config: dict = None) -> None:
     """
     Main function
+
+    :param config: parse_arguments result, parsed from command line when None
+    :return:
+    """
+    if config is None:
+        config = parse_arguments()
+    warnings.filterwarnings("ignore")
+    print(config)
+    profiling.configure(
+        metrics_file=config["metrics_file"], profile_folder=config["profile_folder"]
+    )
+    output_folder = config["output_folder"]
+    print(output_folder)
+    run_dag(
+        get_stages(config),
+        os.path.join(output_folder, DAG_MANIFEST),
+        force=config["force"],
+    )
+
+
+def get_stages(config: dict) -> list:
+    """
+    Get stages of a run: files are extracted and staged, merged data is
+    transformed and counted, then loaded while charts are drawn from counts,
+    and accident coordinates are indexed for the hotspot map, and counted
+    for route risk scores and the raster tiles of the heatmap. Accidents of
+    local authorities and LSOAs are counted and loaded next to them.
+
+    Incremental runs transform, load and count changed years in one stage.
+
+    :param config: parse_arguments result
+    :return: list of Stage
+    """
+    output_folder = config["output_folder"]
+    sources = [
+        os.path.join(output_folder, f"{f}{ARCHIVE_SUFFIX}" if config["keep_zip"] else f)
+        for f in FILES_LIST
+    ]
+    staged = [get_cache_path(output_folder, f) for f in FILES_LIST]
+    cube_folder = os.path.join(output_folder, CUBE_FOLDER)
+    spatial_folder = os.path.join(output_folder, SPATIAL_FOLDER)
+    raster_folder = os.path.join(output_folder, RASTER_FOLDER)
+    area_folder = os.path.join(output_folder, AREA_FOLDER)
+    stages = [
+        Stage(
+            "extract",
+            functools.partial(
+                extract,
+                repo=REPO,
+                files_list=FILES_LIST,
+                output_folder=output_folder,
+                keep_zip=config["keep_zip"],
+            ),
+            outputs=sources,
+            params={"repo": REPO, "keep_zip": config["keep_zip"]},
+        ),
+        Stage(
+            "stage",
+            functools.partial(stage, input_folder=output_folder, files_list=FILES_LIST),
+            after=["extract"],
+            inputs=sources,
+            outputs=staged,
+        ),
+        Stage(
+            "spatial",
+            functools.partial(run_spatial, config),
+            after=["stage"],
+            inputs=[get_cache_path(output_folder, ACCIDENT_INFORMATION)],
+            outputs=[spatial_folder],
+        ),
+        Stage(
+            "risk",
+            functools.partial(run_risk, config),
+            after=["stage"],
+            inputs=[get_cache_path(output_folder, ACCIDENT_INFORMATION)],
+            outputs=[os.path.join(output_folder, RISK_FOLDER)],
+        ),
+        Stage(
+            "raster",
+            functools.partial(run_raster, config),
+            after=["stage"],
+            inputs=[get_cache_path(output_folder, ACCIDENT_INFORMATION)],
+            outputs=[raster_folder],
+        ),
+        Stage(
+            "areas",
+            functools.partial(run_areas, config),
+            after=["stage"],
+            inputs=[get_cache_path(output_folder, ACCIDENT_INFORMATION)],
+            outputs=[area_folder],
+        ),
+        Stage(
+            "load_areas",
+            functools.partial(
+                load_areas, area_folder, db_config_file=config["db_config_file"]
+            ),
+            after=["areas"],
+            inputs=[area_folder],
+            check=functools.partial(is_areas_loaded, config),
+        ),
+    ]
+    if config["incremental"]:
+        stages.append(
+            Stage(
+                "process",
+                lambda: run_incremental(config).save(cube_folder),
+                after=["stage"],
+                # changed years are found by run_incremental
+                cache=False,
+            )
+        )
+        counted_by = "process"
+    else:
+        path = get_transformed_path(config)
+        stages += [
+            Stage(
+                "transform",
+                functools.partial(run_transform, config),
+                after=["stage"],
+                inputs=staged,
+                outputs=[path, f"{path}{SCHEMA_SUFFIX}", cube_folder],
+                params={
+                    "join_mode": config["join_mode"],
+                    "partitions": config["partitions"],
+                    "columns": TRANSFORM_COLUMNS,
+                },
+            ),
+            Stage(
+                "load",
+                functools.partial(
+                    load_frame,
+                    path,
+                    db_config_file=config["db_config_file"],
+                    replace=True,
+                ),
+                after=["transform"],
+                inputs=[path, f"{path}{SCHEMA_SUFFIX}"],
+                check=functools.partial(is_loaded, config),
+            ),
+        ]
+        counted_by = "transform"
+    stages.append(
+        Stage(
+            "visualize",
+            # charts are drawn from the counts saved by the upstream stage
+            lambda: visualize(
+                AccidentsCube.load(cube_folder),
+                output_folder=output_folder,
+                workers=config["workers"],
+                grid=GridIndex.load(spatial_folder),
+                raster_folder=raster_folder,
+            ),
+            after=[counted_by, "spatial", "raster"],
+            inputs=[cube_folder, spatial_folder, raster_folder],
+            outputs=[
+                os.path.join(output_folder, f)
+                for f in [*CHART_FILENAMES, HOTSPOT_FILENAME, HEATMAP_FILENAME]
+            ],
+        )
+    )
+    return stages
+
+
+def run_transform(config: dict) -> None:
+    """
+    Transform and count all merged data chunk by chunk, into the transformed
+    file and the accidents cube of the output folder
+
+    :param config: parse_arguments result
+    :return:
+    """
+    chunks = profiling.profiled_iter("merge", read_merged(config))
+    if config["workers"] > 1:
+        # year partitions of chunks are transformed by a pool of processes
+        partitions = transform_partitions(
+            chunks,
+            config["output_folder"],
+            TRANSFORM_COLUMNS,
+            workers=config["workers"],
+            file_format=config["output_format"],
+        )
+        cubes = list(partitions)
+    else:
+        cubes = []
+        for i, data in enumerate(chunks):
+            data = Accidents().transform(data=data)
+            transform(
+                data=data,
+                output_folder=config["output_folder"],
+                columns=TRANSFORM_COLUMNS,
+                append=i > 0,
+                file_format=config["output_format"],
+            )
+            cubes.append(AccidentsCube.from_data(data))
+            del data
+    AccidentsCube.concat(cubes).save(os.path.join(config["output_folder"], CUBE_FOLDER))
+
+
+def run_spatial(config: dict) -> None:
+    """
+    Index coordinates of staged accidents, one point per accident rather
+    than per merged vehicle, into the spatial folder of the output folder
+
+    :param config: parse_arguments result
+    :return:
+    """
+    data = read_source(
+        config["output_folder"],
+        ACCIDENT_INFORMATION,
+        columns=[LATITUDE, LONGITUDE, SEVERITY],
+    )
+    GridIndex.from_data(data).save(os.path.join(config["output_folder"], SPATIAL_FOLDER))
+
+
+def run_risk(config: dict) -> None:
+    """
+    Count severity weighted accidents per year of grid cells by daytime band,
+    from staged accidents, into the risk folder of the output folder
+
+    :param config: parse_arguments result
+    :return:
+    """
+    data = read_source(
+        config["output_folder"],
+        ACCIDENT_INFORMATION,
+        columns=[LATITUDE, LONGITUDE, SEVERITY, "Time", "Year"],
+    )
+    RouteRiskScorer.from_data(data).save(
+        os.path.join(config["output_folder"], RISK_FOLDER)
+    )
+
+
+def run_raster(config: dict) -> None:
+    """
+    Count staged accidents of grid cells by year and severity into the raster
+    tiles of the output folder
+
+    :param config: parse_arguments result
     :return:
     """
-    print(OUTPUT_FOLDER)
-    extract(
-        repo="tsiaras/uk-road-safety-accidents-and-vehicles",
-        files_list=["Accident_Information.csv", "Vehicle_Information.csv"],
-        output_folder=OUTPUT_FOLDER,
+    data = read_source(
+        config["output_folder"],
+        ACCIDENT_INFORMATION,
+        columns=[LATITUDE, LONGITUDE, SEVERITY, "Year"],
     )
+    RasterTiles.build(data, os.path.join(config["output_folder"], RASTER_FOLDER))
 
-    print("Reading file Accident_Information.csv")
-    accident_info = pd.read_csv(os.path.join(OUTPUT_FOLDER, "Accident_Information.csv"))
 
-    print("Reading file Vehicle_Information.csv")
-    vehicle_info = pd.read_csv(
-        os.path.join(OUTPUT_FOLDER, "Vehicle_Information.csv"),
-        encoding="ISO-8859-1",
+def run_areas(config: dict) -> None:
+    """
+    Count staged accidents of local authorities and LSOAs by dimension value
+    into the area tables of the output folder
+
+    :param config: parse_arguments result
+    :return:
+    """
+    data = read_source(
+        config["output_folder"],
+        ACCIDENT_INFORMATION,
+        columns=[*AREAS.values(), "Year", SEVERITY, "Weather_Conditions", "Time"],
+    )
+    AreaAggregates.from_data(data).save(
+        os.path.join(config["output_folder"], AREA_FOLDER)
     )
 
-    # Transform
-    data = accident_info.merge(
-        vehicle_info, on=["Accident_Index", "Year"], how="inner"
-    ).rename(columns={"Date": "Accident_date"})
 
+def get_transformed_path(config: dict) -> str:
+    """
+    Get path of the transformed file of a full run
+
+    :param config: parse_arguments result
+    :return:
+    """
+    return os.path.join(
+        config["output_folder"],
+        get_format_path(TRANSFORMED_FILE, config["output_format"]),
+    )
+
+
+def is_loaded(config: dict) -> bool:
+    """
+    Check the accidents table still has the rows of the transformed file
+
+    :param config: parse_arguments result
+    :return:
+    """
+    with Database(config["db_config_file"]) as db:
+        rows = db.count_rows("accidents")
+    return rows == read_schema(get_transformed_path(config))["rows"]
+
+
+def is_areas_loaded(config: dict) -> bool:
+    """
+    Check the area accidents table still has the rows of the area tables
+
+    :param config: parse_arguments result
+    :return:
+    """
+    with Database(config["db_config_file"]) as db:
+        rows = db.count_rows(AREA_TABLE)
+    aggregates = AreaAggregates.load(os.path.join(config["output_folder"], AREA_FOLDER))
+    return rows == sum(len(table) for table in aggregates.tables.values())
+
+
+def run_incremental(config: dict) -> AccidentsCube:
+    """
+    Transform, load and count only the years whose staged data changed since
+    the last incremental run, and sum the counts of every year
+
+    :param config: parse_arguments result
+    :return: accidents cube
+    """
+    output_folder = config["output_folder"]
+    fingerprints = get_year_fingerprints(output_folder, FILES_LIST)
+    changed, removed = get_changed_years(read_run_manifest(output_folder), fingerprints)
+    print(f"Changed years: {changed}, removed years: {removed}")
+
+    with Database(config["db_config_file"]) as db:
+        processed = set()
+        chunks = iter_merged(output_folder, join_mode="year", years=changed)
+        for data in profiling.profiled_iter("merge", chunks):
+            year = int(data["Year"].iloc[0])
+            data = process(
+                data,
+                config,
+                db=db,
+                filename=os.path.join(TRANSFORMED_FOLDER, f"Year={year}.csv"),
+                upsert=True,
+            )
+            AccidentsCube.from_data(data).save(get_year_cube_folder(output_folder, year))
+            processed.add(year)
+            del data
+
+        # years without merged rows left are dropped like removed ones
+        for year in sorted(set(changed) - processed) + removed:
+            print(f"Removing year {year}")
+            db.execute_query(f"DELETE FROM accidents WHERE year = {int(year)}")
+            shutil.rmtree(get_year_cube_folder(output_folder, year), ignore_errors=True)
+            remove_frame(
+                os.path.join(
+                    output_folder,
+                    TRANSFORMED_FOLDER,
+                    get_format_path(f"Year={year}", config["output_format"]),
+                )
+            )
+
+    cubes = [
+        AccidentsCube.load(get_year_cube_folder(output_folder, year))
+        for year in fingerprints
+        if os.path.exists(get_year_cube_folder(output_folder, year))
+    ]
+    # no year having rows left, i.e every year being removed, is counted as an
+    # empty cube rather than failing every later run
+    cube = AccidentsCube.concat(cubes) if len(cubes) > 0 else AccidentsCube.empty()
+
+    # reached only once every upsert and delete succeeded, as database errors
+    # are raised, so that the years of a failed run are processed again
+    write_run_manifest(output_folder, fingerprints)
+    return cube
+
+
+def process(
+    data,
+    config: dict,
+    db: Database,
+    append: bool = False,
+    filename: str = TRANSFORMED_FILE,
+    upsert: bool = False,
+):
+    """
+    Transform merged data, write and load its transformed columns
+
+    :param data:
+    :param config: parse_arguments result
+    :param db:
+    :param append: append to the transformed file
+    :param filename: transformed file in output folder
+    :param upsert: replace table rows of the years of data, which must hold
+        whole years
+    :return: transformed data
+    """
     data = Accidents().transform(data=data)
     new_data = transform(
         data=data,
-        output_folder=OUTPUT_FOLDER,
-        columns=[
-            "Accident_Index",
-            "Year",
-            "Age_Band_of_Driver",
-            "Age_of_Vehicle",
-            "Driver_Home_Area_Type",
-            "Journey_Purpose_of_Driver",
-            "Accident_Severity",
-            "Accident_date",
-            "Day_of_Week",
-        ],
+        output_folder=config["output_folder"],
+        columns=TRANSFORM_COLUMNS,
+        append=append,
+        filename=filename,
+        file_format=config["output_format"],
     )
     print(new_data.head())
-    load(data=data, db_config_file=DB_CONFIG_FILE)
-    visualize(data, output_folder=OUTPUT_FOLDER)
+    load(data=new_data, db_config_file=config["db_config_file"], db=db, upsert=upsert)
+    return data
+
+
+def get_year_cube_folder(output_folder: str, year: int) -> str:
+    """
+    Get folder of the accidents cube of a year
+
+    :param output_folder:
+    :param year:
+    :return:
+    """
+    return os.path.join(output_folder, CUBE_FOLDER, f"Year={year}")
+
+
+def read_merged(config: dict):
+    """
+    Read merged accidents and vehicles data with the backend of the join
+    mode, as a single chunk in memory join mode and partition by partition
+    otherwise
+
+    :param config: parse_arguments result
+    :return: generator of merged chunks
+    """
+    backend = get_backend(
+        config["join_mode"],
+        config["output_folder"],
+        partitions=config["partitions"],
+        memory_limit=config["memory_limit"],
+    )
+    return backend.iter_merged()
 
 
 if __name__ == "__main__":
@@ -1,21 +1,28 @@
+import numpy as np
 import pandas as pd
 
-from delivery_insights.utils.fct import set_daytime_bands, set_vehicule_age_bands
+from delivery_insights.models.areas import ALL, TOTAL, AreaAggregates
+from delivery_insights.models.cube import count_by
+from delivery_insights.models.filters import Filter
+from delivery_insights.models.spatial import BATCH_SIZE, LATITUDE, LONGITUDE, GridIndex
+from delivery_insights.utils.profiling import profiled
+from delivery_insights.utils.fct import (
+    get_daytime_bands,
+    get_hours,
+    get_vehicule_age_bands,
+)
 
 
 class Accidents:
+    @profiled
     def get_accidents_count_by_column(
         self, data: pd.DataFrame, column: str, min_value: int = 0, filter_conditions=None
     ):
-        filtered_data = self.filter_data(
-            data=data, column=column, filter_conditions=filter_conditions
-        )
+        row_filter = Filter.from_conditions(filter_conditions, column=column)
+        counts = count_by(data, [column], row_filter=row_filter)
 
-        grouped_data = (
-            filtered_data.groupby(column)
-            .size()
-            .reset_index(name="counts")
-            .sort_values(by="counts", ascending=False)
+        grouped_data = counts.reset_index(name="counts").sort_values(
+            by="counts", ascending=False
         )
         grouped_data = grouped_data[grouped_data.counts > min_value]
         labels = grouped_data.apply(
@@ -24,6 +31,7 @@ class Accidents:
         sizes = grouped_data["counts"].values.tolist()
         return grouped_data, labels, sizes
 
+    @profiled
     def get_list_accidents_values_by_column(
         self, data: pd.DataFrame, column: str, filter_conditions=None
     ):
@@ -35,17 +43,16 @@ class Accidents:
         :param filter_conditions:
         :return:
         """
-        filtered_data = self.filter_data(
-            data=data, column=column, filter_conditions=filter_conditions
+        row_filter = Filter.from_conditions(filter_conditions, column=column)
+        counts = count_by(data, [column], row_filter=row_filter).sort_values(
+            ascending=False
         )
+        cols = counts.index.values
 
-        cols = filtered_data[column].value_counts().index.values
-
-        filtered_data = [filtered_data[column].value_counts()[c] for c in cols]
-
-        return filtered_data, cols
+        return counts.tolist(), cols
 
     @staticmethod
+    @profiled
     def transform(data: pd.DataFrame):
         """
         Transform accidents data
@@ -55,11 +62,8 @@ class Accidents:
         """
         data["Accident_date"] = pd.to_datetime(data["Accident_date"], format="%Y-%m-%d")
 
-        # slice first and second string from time column
-        data["Hour"] = data["Time"].str[0:2]
-
-        # convert new column to numeric datetype
-        data["Hour"] = pd.to_numeric(data["Hour"])
+        # slice first and second string from time column as numeric hours
+        data["Hour"] = get_hours(data["Time"])
 
         # drop null values in our new column
         data = data.dropna(subset=["Hour"])
@@ -67,42 +71,28 @@ class Accidents:
         # cast to integer values
         data["Hour"] = data["Hour"].astype("int")
 
-        # apply thus function to our temporary hour column
-        data["Daytime"] = data["Hour"].apply(set_daytime_bands)
+        # band hours and vehicle ages into categorical columns
+        data["Daytime"] = get_daytime_bands(data["Hour"])
 
-        data["Age_band_of_vehicule"] = data["Age_of_Vehicle"].apply(
-            set_vehicule_age_bands
-        )
+        data["Age_band_of_vehicule"] = get_vehicule_age_bands(data["Age_of_Vehicle"])
 
         return data
 
     @staticmethod
+    @profiled
     def filter_data(data, column: str, filter_conditions=None):
         """
-        Filter accidents data by dropping unused values
+        Filter accidents data by dropping unused values, data is not modified
 
         :param data:
         :param column:
-        :param filter_conditions:
-        :return:
+        :param filter_conditions: values to drop, as a list or a string
+        :return: kept rows of data, data itself when nothing is filtered
         """
-        if filter_conditions:
-            if isinstance(filter_conditions, list):
-                data.drop(
-                    data[data[column].isin(filter_conditions)].index,
-                    axis=0,
-                    inplace=True,
-                )
-            elif isinstance(filter_conditions, str):
-                data.drop(
-                    data[data[column] == filter_conditions].index,
-                    axis=0,
-                    inplace=True,
-                )
-
-        return data
+        return Filter.from_conditions(filter_conditions, column=column).apply(data)
 
     @staticmethod
+    @profiled
     def get_accidents_share_count(
         data: pd.DataFrame, cols: [], filter_conditions: {} = None
     ):
@@ -114,14 +104,15 @@ class Accidents:
         :param filter_conditions:
         :return:
         """
-        counts = data.groupby(cols).size()
-
-        if filter_conditions and len(filter_conditions.keys()) > 0:
-            for key in filter_conditions.keys():
-                if key in counts.reset_index().columns and isinstance(
-                    filter_conditions[key], list
-                ):
-                    counts = counts.drop(filter_conditions[key], level=key)
+        # conditions on counted columns drop accidents before counting
+        row_filter = Filter.from_conditions(
+            {
+                key: values
+                for key, values in (filter_conditions or {}).items()
+                if isinstance(values, list)
+            }
+        ).restrict(cols)
+        counts = count_by(data, cols, row_filter=row_filter)
 
         counts = counts.rename_axis(cols).unstack(cols[1])
 
@@ -136,6 +127,7 @@ class Accidents:
         return counts_share
 
     @staticmethod
+    @profiled
     def get_accidents_counts_using_two_columns(
         data: pd.DataFrame, cols: [], filter_conditions: {}, new_cols_name: []
     ):
@@ -148,23 +140,17 @@ class Accidents:
         :param new_cols_name:
         :return:
         """
-        counts = data.groupby(cols).size().reset_index()
-
-        # drop the values that have no value
-        if len(filter_conditions.keys()) > 0:
-            for col in filter_conditions.keys():
-                if col in counts.columns:
-                    counts.drop(
-                        counts[counts[col].isin(filter_conditions[col])].index,
-                        axis=0,
-                        inplace=True,
-                    )
+        # drop the values that have no value before counting
+        row_filter = Filter.from_conditions(filter_conditions).restrict(cols)
+        counts = count_by(data, cols, row_filter=row_filter).reset_index()
+
         # rename the columns
         counts.columns = new_cols_name
 
         return counts
 
     @staticmethod
+    @profiled
     def get_accidents_per_year(data: pd.DataFrame):
         """
         Get accidents counts per year
@@ -172,12 +158,33 @@ class Accidents:
         :param data:
         :return:
         """
+        daily_count = count_by(data, ["Accident_date"])
         yearly_count = (
-            data["Accident_date"].dt.year.value_counts().sort_index(ascending=False)
+            daily_count.groupby(daily_count.index.year).sum().sort_index(ascending=False)
         )
         return yearly_count
 
     @staticmethod
+    @profiled
+    def get_accidents_per_period(
+        data: pd.DataFrame,
+        date_column: str = "Accident_date",
+        rule: str = "M",
+        row_filter: Filter = None,
+    ):
+        """
+        Get accidents counts per period of a date column
+
+        :param data:
+        :param date_column:
+        :param rule: resample rule, i.e "M" for months and "W" for weeks
+        :param row_filter: accidents to count
+        :return:
+        """
+        return count_by(data, [date_column], row_filter=row_filter).resample(rule).sum()
+
+    @staticmethod
+    @profiled
     def get_accidents_per_hour(data: pd.DataFrame):
         """
         Get accidents count per hour
@@ -185,10 +192,11 @@ class Accidents:
         :param data:
         :return:
         """
-        hourly_count = data["Hour"].value_counts().sort_index(ascending=False)
+        hourly_count = count_by(data, ["Hour"]).sort_index(ascending=False)
         return hourly_count
 
     @staticmethod
+    @profiled
     def get_accidents_per_daytime(data: pd.DataFrame):
         """
         Get accidents count per daytime
@@ -196,10 +204,12 @@ class Accidents:
         :param data:
         :return:
         """
-        daytime_count = data["Daytime"].value_counts().sort_index(ascending=False)
-        return daytime_count
+        daytime_count = count_by(data, ["Daytime"])
+        daytime_count.index = daytime_count.index.astype(str)
+        return daytime_count.sort_index(ascending=False)
 
     @staticmethod
+    @profiled
     def get_accidents_per_weekday_and_year(data: pd.DataFrame, days: []):
         """
         Aggregate accidents by weekday and year
@@ -208,13 +218,75 @@ class Accidents:
         :param days:
         :return:
         """
-        weekday = data["Accident_date"].dt.day_name()
-        year = data["Accident_date"].dt.year
+        daily_count = count_by(data, ["Accident_date"])
+        weekday = daily_count.index.day_name()
+        year = daily_count.index.year
 
-        accidents_per_weekday_and_year = data.groupby([year, weekday]).size()
+        accidents_per_weekday_and_year = daily_count.groupby([year, weekday]).sum()
         accidents_per_weekday_and_year = (
             accidents_per_weekday_and_year.rename_axis(["Year", "Weekday"])
             .unstack("Weekday")
             .reindex(columns=days)
         )
         return accidents_per_weekday_and_year
+
+    @staticmethod
+    @profiled
+    def get_accidents_within_radius(
+        data, latitudes, longitudes, radius_km, batch_size: int = BATCH_SIZE
+    ) -> pd.DataFrame:
+        """
+        Count accidents within a distance of query points, i.e depots or route
+        points, by severity
+
+        :param data: accidents DataFrame with Latitude, Longitude and
+            Accident_Severity columns, or its GridIndex
+        :param latitudes: array of query latitudes
+        :param longitudes: array of query longitudes
+        :param radius_km: radius of all queries or of each one
+        :param batch_size: (query, accident) pairs whose distance is computed at
+            once
+        :return: coordinates, count and counts by severity of each query
+        """
+        grid = data if isinstance(data, GridIndex) else GridIndex.from_data(data)
+        latitudes, longitudes, radius_km = np.broadcast_arrays(
+            *[
+                np.atleast_1d(np.asarray(v, dtype="float64"))
+                for v in (latitudes, longitudes, radius_km)
+            ]
+        )
+        counts, by_severity = grid.count_within(
+            latitudes, longitudes, radius_km, batch_size=batch_size
+        )
+        result = pd.DataFrame(
+            {
+                LATITUDE: latitudes,
+                LONGITUDE: longitudes,
+                "Radius_km": radius_km,
+                "Count": counts,
+            }
+        )
+        for i, category in enumerate(grid.categories):
+            result[category] = by_severity[:, i]
+        return result
+
+    @staticmethod
+    @profiled
+    def get_top_areas(
+        data, name: str = "district", k: int = 10, dimension: str = TOTAL, value=ALL
+    ) -> pd.Series:
+        """
+        Get the local authorities or LSOAs with the most accidents of a
+        dimension value, i.e a year or a severity
+
+        :param data: accidents DataFrame, one row per accident, or its
+            AreaAggregates
+        :param name: area table name of AREAS
+        :param k: number of areas
+        :param dimension: dimension of DIMENSIONS, all accidents by default
+        :param value: value of dimension
+        :return: counts by area, in decreasing order
+        """
+        if not isinstance(data, AreaAggregates):
+            data = AreaAggregates.from_data(data)
+        return data.get_top_areas(name, k=k, dimension=dimension, value=value)
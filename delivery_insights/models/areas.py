@@ -0,0 +1,261 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from delivery_insights.loader.cache import to_arrow_table
+from delivery_insights.models.cube import COUNT_COLUMN
+from delivery_insights.utils.fct import get_daytime_bands, get_hours
+from delivery_insights.utils.profiling import profiled
+
+AREA_FOLDER = "areas"
+# Area columns of accidents by name of their aggregate table
+AREAS = {
+    "district": "Local_Authority_(District)",
+    "highway": "Local_Authority_(Highway)",
+    "lsoa": "LSOA_of_Accident_Location",
+}
+AREA_TYPE_COLUMN = "Area_type"
+AREA_COLUMN = "Area"
+DIMENSION_COLUMN = "Dimension"
+VALUE_COLUMN = "Value"
+# Dimension of the accidents of each area, whose single value is ALL
+TOTAL = "Total"
+ALL = "All"
+# Dimensions counted by area, accidents missing a dimension value, i.e a time,
+# being only left out of its counts like in the charts
+DIMENSIONS = [TOTAL, "Year", "Accident_Severity", "Weather_Conditions", "Daytime"]
+
+
+class AreaAggregates:
+    def __init__(self, tables: dict):
+        """
+        Accidents counts of local authorities and LSOAs by dimension value
+
+        Tables have a row per area, dimension and value with accidents, sorted
+        by area code then dimension and value codes. Areas are categoricals
+        with sorted categories, so that the rows of an area are found by
+        binary search on codes, and so are the areas of a dimension value in
+        ranking order.
+
+        :param tables: frames of Area, Dimension, Value and Count columns by
+            name of AREAS
+        """
+        self.tables = tables
+        self._indexes = {}
+
+    @classmethod
+    @profiled
+    def from_data(cls, data: pd.DataFrame):
+        """
+        Count accidents of each area by dimension value with a bincount per
+        area column
+
+        :param data: accidents with AREAS columns, Year, Accident_Severity,
+            Weather_Conditions and Time or Hour columns, one row per accident
+        :return:
+        """
+        hours = data["Hour"] if "Hour" in data.columns else get_hours(data["Time"])
+        hours = pd.Series(hours).to_numpy(dtype="float64", na_value=np.nan)
+        # bands put missing hours in the last band, their code is set to -1
+        daytime = pd.Categorical(get_daytime_bands(pd.Series(hours)))
+        daytime = pd.Categorical.from_codes(
+            np.where(np.isnan(hours), -1, daytime.codes), dtype=daytime.dtype
+        )
+        dimensions = {
+            TOTAL: pd.Categorical(np.zeros(len(data), dtype="int64"), categories=[0]),
+            "Year": pd.Categorical(data["Year"]),
+            "Accident_Severity": pd.Categorical(data["Accident_Severity"]),
+            "Weather_Conditions": pd.Categorical(data["Weather_Conditions"]),
+            "Daytime": daytime,
+        }
+        # measures are the (dimension, value) pairs, in order of dimensions
+        # then of values, so that bands keep their order
+        labels = [
+            [ALL] if dimension == TOTAL else [str(v) for v in codes.categories]
+            for dimension, codes in dimensions.items()
+        ]
+        offsets = np.cumsum([0] + [len(values) for values in labels])
+        measure_dimensions = np.repeat(
+            np.arange(len(DIMENSIONS)), [len(values) for values in labels]
+        )
+        measure_labels = [value for values in labels for value in values]
+        values = pd.Index(pd.unique(np.array(measure_labels, dtype=object)))
+        measure_values = values.get_indexer(measure_labels)
+        measures = offsets[-1]
+
+        tables = {}
+        for name, column in AREAS.items():
+            areas = pd.Categorical(data[column]).remove_unused_categories()
+            areas = areas.reorder_categories(np.sort(areas.categories))
+            area_codes = areas.codes.astype("int64")
+            counts = np.zeros(len(areas.categories) * measures, dtype="int64")
+            for offset, codes in zip(offsets, dimensions.values()):
+                keep = (area_codes >= 0) & (codes.codes >= 0)
+                counts += np.bincount(
+                    area_codes[keep] * measures + offset + codes.codes[keep],
+                    minlength=len(counts),
+                )
+            cells = np.flatnonzero(counts)
+            tables[name] = pd.DataFrame(
+                {
+                    AREA_COLUMN: pd.Categorical.from_codes(
+                        cells // measures, categories=areas.categories
+                    ),
+                    DIMENSION_COLUMN: pd.Categorical.from_codes(
+                        measure_dimensions[cells % measures], categories=DIMENSIONS
+                    ),
+                    VALUE_COLUMN: pd.Categorical.from_codes(
+                        measure_values[cells % measures], categories=values
+                    ),
+                    COUNT_COLUMN: counts[cells],
+                }
+            )
+        return cls(tables)
+
+    def get_area(self, name: str, area: str, dimension: str = None) -> pd.Series:
+        """
+        Get counts of an area, found by binary search
+
+        :param name: table name of AREAS
+        :param area:
+        :param dimension: dimension to keep, all dimensions by default
+        :return: counts by dimension and value, or by value of dimension,
+            values without accidents being left out
+        """
+        index = self._get_index(name)
+        code = index["areas"].searchsorted(area)
+        if code == len(index["areas"]) or index["areas"][code] != area:
+            raise Exception(f"Area {area} has no accidents in {name} table.")
+        start, stop = np.searchsorted(index["area_codes"], [code, code + 1])
+        rows = np.arange(start, stop)
+        if dimension is None:
+            labels = pd.MultiIndex.from_arrays(
+                [
+                    index["dimensions"][index["dimension_codes"][rows]],
+                    index["values"][index["value_codes"][rows]],
+                ],
+                names=[DIMENSION_COLUMN, VALUE_COLUMN],
+            )
+        else:
+            self._check_dimension(dimension)
+            rows = rows[index["dimension_codes"][rows] == DIMENSIONS.index(dimension)]
+            labels = index["values"][index["value_codes"][rows]].rename(VALUE_COLUMN)
+        return pd.Series(index["counts"][rows], index=labels, name=COUNT_COLUMN)
+
+    def get_top_areas(
+        self, name: str, k: int = 10, dimension: str = TOTAL, value=ALL
+    ) -> pd.Series:
+        """
+        Get the areas with the most accidents of a dimension value, found by
+        binary search on the ranking of the table
+
+        :param name: table name of AREAS
+        :param k: number of areas
+        :param dimension:
+        :param value: value of dimension, i.e a year or a severity
+        :return: counts by area, in decreasing order then in order of areas,
+            areas without accidents being left out
+        """
+        self._check_dimension(dimension)
+        index = self._get_index(name)
+        value_code = index["values"].get_indexer([str(value)])[0]
+        key = DIMENSIONS.index(dimension) * len(index["values"]) + value_code
+        start, stop = np.searchsorted(index["keys"], [key, key + 1])
+        # values never counted have no rows
+        stop = min(stop, start + k) if value_code >= 0 else start
+        rows = index["ranking"][start:stop]
+        return pd.Series(
+            index["counts"][rows],
+            index=index["areas"][index["area_codes"][rows]].rename(AREA_COLUMN),
+            name=COUNT_COLUMN,
+        )
+
+    def to_frame(self, name: str) -> pd.DataFrame:
+        """
+        Get rows of a table with the name of their table, keeping categorical
+        columns
+
+        :param name: table name of AREAS
+        :return: frame of Area_type, Area, Dimension, Value and Count columns
+        """
+        if name not in self.tables:
+            raise Exception(f"Area table {name} is not in {list(self.tables)}.")
+        table = self.tables[name]
+        area_types = pd.Categorical.from_codes(np.zeros(len(table), "int8"), [name])
+        return pd.concat(
+            [pd.DataFrame({AREA_TYPE_COLUMN: area_types}, index=table.index), table],
+            axis=1,
+        )
+
+    def save(self, folder: str) -> str:
+        """
+        Write tables as parquet files of folder
+
+        :param folder:
+        :return:
+        """
+        os.makedirs(folder, exist_ok=True)
+        for name, table in self.tables.items():
+            pq.write_table(to_arrow_table(table), os.path.join(folder, f"{name}.parquet"))
+        return folder
+
+    @classmethod
+    def load(cls, folder: str):
+        """
+        Read tables written by save
+
+        :param folder:
+        :return:
+        """
+        tables = {}
+        for name in AREAS.keys():
+            path = os.path.join(folder, f"{name}.parquet")
+            if not os.path.exists(path):
+                raise Exception(f"Area file {path} does not exist.")
+            # parquet dictionaries keep the order of categories, i.e of codes
+            tables[name] = pq.read_table(path).to_pandas()
+        return cls(tables)
+
+    def _get_index(self, name: str) -> dict:
+        """
+        Get the columns of a table as codes, and its rows sorted by dimension
+        and value codes then decreasing counts with their keys, computed on
+        first use
+
+        :param name: table name of AREAS
+        :return:
+        """
+        if name not in self.tables:
+            raise Exception(f"Area table {name} is not in {list(self.tables)}.")
+        if name not in self._indexes:
+            table = self.tables[name]
+            index = {
+                "areas": table[AREA_COLUMN].cat.categories,
+                "dimensions": table[DIMENSION_COLUMN].cat.categories,
+                "values": table[VALUE_COLUMN].cat.categories,
+                "counts": table[COUNT_COLUMN].to_numpy(),
+            }
+            for key, column in [
+                ("area_codes", AREA_COLUMN),
+                ("dimension_codes", DIMENSION_COLUMN),
+                ("value_codes", VALUE_COLUMN),
+            ]:
+                index[key] = table[column].cat.codes.to_numpy().astype("int64")
+            keys = index["dimension_codes"] * len(index["values"]) + index["value_codes"]
+            index["ranking"] = np.lexsort((index["area_codes"], -index["counts"], keys))
+            index["keys"] = keys[index["ranking"]]
+            self._indexes[name] = index
+        return self._indexes[name]
+
+    @staticmethod
+    def _check_dimension(dimension: str) -> None:
+        """
+        Check dimension is counted
+
+        :param dimension:
+        :return:
+        """
+        if dimension not in DIMENSIONS:
+            raise Exception(f"Dimension {dimension} is not in {DIMENSIONS}.")
@@ -0,0 +1,342 @@
+import os
+
+import pandas as pd
+
+from delivery_insights.loader.cache import (
+    CACHE_FOLDER,
+    PARTITION_COLUMN,
+    get_cache_path,
+    read_manifest,
+    read_source,
+)
+from delivery_insights.loader.merge import (
+    JOIN_KEYS,
+    iter_merged,
+    merge_sources,
+    stage_sources,
+)
+from delivery_insights.loader.schema import (
+    ACCIDENT_INFORMATION,
+    VEHICLE_INFORMATION,
+    coerce_dtypes,
+)
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.cube import (
+    COUNT_COLUMN,
+    CUBOIDS,
+    DIMENSIONS,
+    AccidentsCube,
+)
+from delivery_insights.utils.fct import (
+    DAYTIME_BANDS,
+    VEHICULE_AGE_BANDS,
+    get_band_categories,
+)
+from delivery_insights.utils.profiling import profiled
+
+FILES_LIST = [ACCIDENT_INFORMATION, VEHICLE_INFORMATION]
+
+# Columns banded by Accidents.transform, with the column they band
+BANDED_COLUMNS = {
+    "Daytime": ("Hour", DAYTIME_BANDS),
+    "Age_band_of_vehicule": ("Age_of_Vehicle", VEHICULE_AGE_BANDS),
+}
+
+
+class Backend:
+    name = None
+
+    def __init__(self, folder: str, partitions: int = 16, memory_limit: str = None):
+        """
+        Engine merging accidents and vehicles files of a folder and counting
+        transformed accidents, every backend giving the same counts
+
+        :param folder: folder of the Kaggle files
+        :param partitions: number of partitions of the hash backend
+        :param memory_limit: memory the duckdb backend uses before spilling
+            to disk, i.e "4GB"
+        """
+        self.folder = folder
+        self.partitions = partitions
+        self.memory_limit = memory_limit
+
+    def iter_merged(self):
+        """
+        Merge accidents and vehicles files
+
+        :return: generator of merged chunks
+        """
+        raise Exception(f"{type(self).__name__} does not merge files.")
+
+    def iter_transformed(self):
+        """
+        Transform merged chunks with Accidents.transform
+
+        :return: generator of transformed chunks
+        """
+        for data in self.iter_merged():
+            yield Accidents.transform(data)
+
+    @profiled
+    def count(self) -> AccidentsCube:
+        """
+        Count transformed accidents, chunk by chunk
+
+        :return:
+        """
+        return AccidentsCube.concat(
+            AccidentsCube.from_data(data) for data in self.iter_transformed()
+        )
+
+
+class MemoryBackend(Backend):
+    name = "memory"
+
+    def iter_merged(self):
+        """
+        Merge full files in memory
+
+        :return: generator of a single merged chunk
+        """
+        print(f"Reading files {ACCIDENT_INFORMATION} and {VEHICLE_INFORMATION}")
+        yield merge_sources(*[read_source(self.folder, f) for f in FILES_LIST])
+
+
+class YearBackend(Backend):
+    name = "year"
+
+    def iter_merged(self):
+        """
+        Merge staged files one Year partition at a time
+
+        :return: generator of merged chunks
+        """
+        yield from iter_merged(self.folder, join_mode=self.name)
+
+
+class HashBackend(Backend):
+    name = "hash"
+
+    def iter_merged(self):
+        """
+        Merge staged files one hash partition of Accident_Index at a time
+
+        :return: generator of merged chunks
+        """
+        yield from iter_merged(
+            self.folder, join_mode=self.name, partitions=self.partitions
+        )
+
+
+class DuckDBBackend(Backend):
+    name = "duckdb"
+    # rows of the merged chunks read back from DuckDB
+    batch_rows = 1_000_000
+
+    def connect(self):
+        """
+        Open an in-memory DuckDB database spilling to the cache folder
+
+        :return:
+        """
+        try:
+            import duckdb
+        except ImportError:
+            raise Exception("The duckdb backend needs the duckdb package installed.")
+
+        con = duckdb.connect()
+        con.execute(
+            "SET temp_directory = "
+            + _quote(os.path.join(self.folder, CACHE_FOLDER, ".duckdb"))
+        )
+        if self.memory_limit:
+            con.execute(f"SET memory_limit = {_quote(self.memory_limit)}")
+        return con
+
+    def iter_merged(self):
+        """
+        Merge staged files with a DuckDB join, read back in batches
+
+        :return: generator of merged chunks
+        """
+        con = self.connect()
+        try:
+            reader = con.execute(self.get_merged_query()).fetch_record_batch(
+                self.batch_rows
+            )
+            for batch in reader:
+                yield coerce_dtypes(batch.to_pandas())
+        finally:
+            con.close()
+
+    @profiled
+    def count(self) -> AccidentsCube:
+        """
+        Count transformed accidents with a single DuckDB aggregation over the
+        staged files, rows are never loaded into pandas
+
+        :return:
+        """
+        con = self.connect()
+        try:
+            counts = con.execute(self.get_count_query()).df()
+        finally:
+            con.close()
+
+        cuboids = {}
+        for name, dims in CUBOIDS.items():
+            cuboid = counts[counts["grouping_id"] == _get_grouping_id(dims)]
+            cuboids[name] = pd.DataFrame(
+                {column: _cast_dimension(cuboid[column]) for column in dims}
+            ).assign(**{COUNT_COLUMN: cuboid[COUNT_COLUMN].to_numpy()})
+        return AccidentsCube.from_counts(cuboids)
+
+    def get_merged_query(self) -> str:
+        """
+        Get query merging staged files like merge_sources
+
+        :return:
+        """
+        stage_sources(self.folder, FILES_LIST)
+        accident_columns, vehicle_columns = [
+            read_manifest(get_cache_path(self.folder, f))["columns"] for f in FILES_LIST
+        ]
+        columns = [
+            'a."Date" AS "Accident_date"' if c == "Date" else f'a."{c}"'
+            for c in accident_columns
+        ] + [f'v."{c}"' for c in vehicle_columns if c not in JOIN_KEYS]
+        on = " AND ".join(f'a."{c}" = v."{c}"' for c in JOIN_KEYS)
+        accidents, vehicles = [self.get_scan(f) for f in FILES_LIST]
+        return (
+            f"SELECT {', '.join(columns)} "
+            f"FROM {accidents} AS a JOIN {vehicles} AS v ON {on}"
+        )
+
+    def get_count_query(self) -> str:
+        """
+        Get query transforming merged rows like Accidents.transform and
+        counting them by each cuboid with grouping sets
+
+        :return:
+        """
+        hour = 'CAST(substr("Time", 1, 2) AS INTEGER) AS "Hour"'
+        bands = ", ".join(
+            f'{_get_band_expression(column, **bands)} AS "{name}"'
+            for name, (column, bands) in BANDED_COLUMNS.items()
+        )
+        dims = ", ".join(f'"{c}"' for c in DIMENSIONS)
+        grouping_sets = ", ".join(
+            "(" + ", ".join(f'"{c}"' for c in cuboid_dims) + ")"
+            for cuboid_dims in CUBOIDS.values()
+        )
+        return (
+            f"WITH merged AS ({self.get_merged_query()}), "
+            f'hours AS (SELECT *, {hour} FROM merged WHERE "Time" IS NOT NULL), '
+            f"transformed AS (SELECT *, {bands} FROM hours) "
+            f"SELECT {dims}, GROUPING_ID({dims}) AS grouping_id, "
+            f'count(*) AS "{COUNT_COLUMN}" '
+            f"FROM transformed GROUP BY GROUPING SETS ({grouping_sets})"
+        )
+
+    def get_scan(self, filename: str) -> str:
+        """
+        Get DuckDB scan of the Year partitions of a staged file
+
+        :param filename:
+        :return:
+        """
+        path = os.path.join(
+            get_cache_path(self.folder, filename), f"{PARTITION_COLUMN}=*", "*.parquet"
+        )
+        return (
+            f"read_parquet({_quote(path)}, hive_partitioning = true, "
+            f"hive_types = {{'{PARTITION_COLUMN}': SMALLINT}})"
+        )
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in [MemoryBackend, YearBackend, HashBackend, DuckDBBackend]
+}
+
+
+def get_backend(name: str, folder: str, **kwargs) -> Backend:
+    """
+    Get a backend by name
+
+    :param name: one of BACKENDS
+    :param folder: folder of the Kaggle files
+    :param kwargs: Backend arguments
+    :return:
+    """
+    if name not in BACKENDS:
+        raise Exception(f"Backend {name} is not one of {list(BACKENDS)}.")
+    return BACKENDS[name](folder, **kwargs)
+
+
+def _get_band_expression(
+    column: str, edges: list, labels: list, missing_label: str = None
+) -> str:
+    """
+    Get SQL expression banding a column like fct.cut_bands
+
+    :param column:
+    :param edges:
+    :param labels:
+    :param missing_label:
+    :return:
+    """
+    whens = []
+    if missing_label is not None:
+        whens.append(f'WHEN "{column}" IS NULL THEN {_quote(missing_label)}')
+    whens += [
+        f'WHEN "{column}" < {edge} THEN {_quote(label)}'
+        for edge, label in zip(edges, labels)
+    ]
+    # missing values fall in the last band when there is no missing label
+    return f"CASE {' '.join(whens)} ELSE {_quote(labels[-1])} END"
+
+
+def _get_grouping_id(dims: list) -> int:
+    """
+    Get GROUPING_ID of the grouping set of dims, a set bit for each of
+    DIMENSIONS not grouped, the first dimension being the highest bit
+
+    :param dims:
+    :return:
+    """
+    return sum(
+        1 << (len(DIMENSIONS) - 1 - i)
+        for i, column in enumerate(DIMENSIONS)
+        if column not in dims
+    )
+
+
+def _cast_dimension(values: pd.Series):
+    """
+    Cast dimension values counted by DuckDB to their dtype in transformed
+    pandas data
+
+    :param values:
+    :return:
+    """
+    if values.name == "Accident_date":
+        return pd.to_datetime(values).to_numpy(dtype="datetime64[ns]")
+    if values.name == "Hour":
+        return values.to_numpy(dtype="int64")
+    if values.name in BANDED_COLUMNS:
+        _, bands = BANDED_COLUMNS[values.name]
+        categories = get_band_categories(bands["labels"], bands.get("missing_label"))
+        return pd.Categorical(values, categories=categories)
+    return pd.Categorical(values)
+
+
+def _quote(value: str) -> str:
+    """
+    Quote a SQL string literal
+
+    :param value:
+    :return:
+    """
+    value = str(value).replace("'", "''")
+    return f"'{value}'"
@@ -0,0 +1,226 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from delivery_insights.loader.cache import to_arrow_table
+from delivery_insights.loader.schema import concat_frames
+from delivery_insights.models.filters import Filter
+from delivery_insights.utils.profiling import profiled
+
+CUBE_FOLDER = "cube"
+COUNT_COLUMN = "Count"
+
+# Grouping sets of the cube. A single cube over every dimension has about
+# as many cells as the data has rows, as dates and hours make nearly every
+# combination unique, so counts are stored for the combinations charts use.
+# Dates are kept per day, years, months, weeks and weekdays derive from them.
+CUBOIDS = {
+    "date": ["Accident_date", "Accident_Severity"],
+    "hour": ["Hour", "Daytime", "Accident_Severity"],
+    "weather": ["Weather_Conditions", "Accident_Severity"],
+    "driver": ["Age_Band_of_Driver", "Sex_of_Driver", "Age_band_of_vehicule"],
+    "journey": [
+        "Driver_Home_Area_Type",
+        "Journey_Purpose_of_Driver",
+        "Vehicle_Manoeuvre",
+    ],
+}
+
+DIMENSIONS = sorted({column for dims in CUBOIDS.values() for column in dims})
+
+
+class AccidentsCube:
+    def __init__(self, cuboids: dict):
+        """
+        Accidents counts by dimension values
+
+        :param cuboids: frames of counts by name of CUBOIDS
+        """
+        self.cuboids = cuboids
+
+    @classmethod
+    @profiled
+    def from_data(cls, data: pd.DataFrame):
+        """
+        Count transformed accidents data
+
+        Each dimension is factorized once, then each cuboid counts combined
+        codes with a single bincount.
+
+        :param data:
+        :return:
+        """
+        codes = {column: _factorize(data[column]) for column in DIMENSIONS}
+        return cls({name: _count_cells(codes, dims) for name, dims in CUBOIDS.items()})
+
+    @classmethod
+    def concat(cls, cubes: list):
+        """
+        Sum cubes of data chunks
+
+        :param cubes:
+        :return:
+        """
+        cubes = list(cubes)
+        if len(cubes) == 0:
+            raise Exception("There is no cube to concatenate.")
+        return cls.from_counts(
+            {
+                name: concat_frames([cube.cuboids[name] for cube in cubes])
+                for name in CUBOIDS.keys()
+            }
+        )
+
+    @classmethod
+    def empty(cls):
+        """
+        Build a cube without accidents, i.e once every year is removed
+
+        :return:
+        """
+        return cls.from_counts(
+            {
+                name: pd.DataFrame({column: [] for column in [*dims, COUNT_COLUMN]})
+                for name, dims in CUBOIDS.items()
+            }
+        )
+
+    @classmethod
+    def from_counts(cls, counts: dict):
+        """
+        Build a cube from counts of dimension values, i.e of chunks or
+        aggregated by another engine, counts of the same cell being summed
+
+        :param counts: frames of dims values and their count by name of CUBOIDS
+        :return:
+        """
+        cuboids = {}
+        for name, dims in CUBOIDS.items():
+            cuboid = counts[name]
+            codes = {column: _factorize(cuboid[column]) for column in dims}
+            cuboids[name] = _count_cells(
+                codes, dims, weights=cuboid[COUNT_COLUMN].to_numpy()
+            )
+        return cls(cuboids)
+
+    def count(self, cols: list, row_filter: Filter = None) -> pd.Series:
+        """
+        Count accidents by columns, from the smallest cuboid having them
+
+        :param cols:
+        :param row_filter: accidents to count
+        :return:
+        """
+        row_filter = row_filter or Filter()
+        needed = set(cols) | set(row_filter.columns)
+        names = [name for name, dims in CUBOIDS.items() if needed.issubset(dims)]
+        if len(names) == 0:
+            raise Exception(f"No cuboid has columns {sorted(needed)}.")
+        cuboid = row_filter.apply(min((self.cuboids[name] for name in names), key=len))
+        return cuboid.groupby(cols, observed=True)[COUNT_COLUMN].sum().sort_index()
+
+    def save(self, folder: str) -> str:
+        """
+        Write cuboids as parquet files of folder
+
+        :param folder:
+        :return:
+        """
+        os.makedirs(folder, exist_ok=True)
+        for name, cuboid in self.cuboids.items():
+            pq.write_table(
+                to_arrow_table(cuboid), os.path.join(folder, f"{name}.parquet")
+            )
+        return folder
+
+    @classmethod
+    def load(cls, folder: str):
+        """
+        Read cuboids written by save
+
+        :param folder:
+        :return:
+        """
+        cuboids = {}
+        for name in CUBOIDS.keys():
+            path = os.path.join(folder, f"{name}.parquet")
+            if not os.path.exists(path):
+                raise Exception(f"Cube file {path} does not exist.")
+            # parquet dictionaries keep the order of categories, i.e of bands
+            cuboids[name] = pq.read_table(path).to_pandas()
+        return cls(cuboids)
+
+
+def count_by(data, cols: list, row_filter: Filter = None) -> pd.Series:
+    """
+    Count accidents by columns of row level data or of a cube
+
+    :param data: accidents DataFrame or AccidentsCube
+    :param cols:
+    :param row_filter: accidents to count
+    :return:
+    """
+    if isinstance(data, AccidentsCube):
+        return data.count(cols, row_filter=row_filter)
+
+    if row_filter is not None and len(row_filter) > 0:
+        # only grouped columns of kept rows are copied
+        data = data[cols][row_filter.mask(data)]
+    return data.groupby(cols, observed=True).size().sort_index()
+
+
+def _count_cells(codes: dict, dims: list, weights: np.ndarray = None) -> pd.DataFrame:
+    """
+    Count combinations of dimension values with a single bincount
+
+    :param codes: _factorize result by column
+    :param dims:
+    :param weights: count of each row, one when None
+    :return: frame of dims values and their count, for observed combinations
+    """
+    # code 0 holds missing values, so that they are counted like in
+    # groupby(dropna=True) once marginalized
+    shape = tuple(len(codes[column][1]) + 1 for column in dims)
+    flat = np.ravel_multi_index(tuple(codes[column][0] + 1 for column in dims), shape)
+    counts = np.bincount(flat, weights=weights, minlength=int(np.prod(shape)))
+    cells = np.flatnonzero(counts)
+    cell_codes = np.unravel_index(cells, shape)
+    cuboid = pd.DataFrame(
+        {
+            column: _decode(cell_codes[i] - 1, *codes[column][1:])
+            for i, column in enumerate(dims)
+        }
+    )
+    cuboid[COUNT_COLUMN] = counts[cells].astype("int64")
+    return cuboid
+
+
+def _factorize(values: pd.Series):
+    """
+    Get codes and sorted unique values of a column, -1 for missing values
+
+    :param values:
+    :return: codes, uniques and categorical flag
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype("int64"), values.cat.categories, True
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype("int64"), uniques, False
+
+
+def _decode(codes: np.ndarray, uniques: pd.Index, categorical: bool):
+    """
+    Get column values back from codes
+
+    :param codes:
+    :param uniques:
+    :param categorical:
+    :return:
+    """
+    if categorical:
+        return pd.Categorical.from_codes(codes, categories=uniques)
+    if (codes < 0).any():
+        return uniques.take(codes, allow_fill=True)
+    return uniques.take(codes)
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+
+class Filter:
+    def __init__(self, conditions: tuple = ()):
+        """
+        Row filter made of conditions on column values, evaluated as a boolean
+        mask only when applied to a frame
+
+        :param conditions: tuples of (column, values, keep), rows are kept
+            when the column is in values if keep is True and dropped otherwise
+        """
+        self.conditions = tuple(conditions)
+
+    def __len__(self) -> int:
+        return len(self.conditions)
+
+    @classmethod
+    def from_conditions(cls, filter_conditions, column: str = None):
+        """
+        Create a filter dropping values, from the filter_conditions arguments
+        of Accidents methods
+
+        :param filter_conditions: values of column as a list or a string, or
+            lists of values by column as a dict
+        :param column: column of a list or string filter_conditions
+        :return:
+        """
+        row_filter = cls()
+        if not filter_conditions:
+            return row_filter
+        if isinstance(filter_conditions, dict):
+            for key, values in filter_conditions.items():
+                row_filter = row_filter.drop(key, values)
+            return row_filter
+        return row_filter.drop(column, filter_conditions)
+
+    @property
+    def columns(self) -> list:
+        """
+        Columns used by the conditions
+
+        :return:
+        """
+        return list(dict.fromkeys(column for column, _, _ in self.conditions))
+
+    def drop(self, column: str, values):
+        """
+        Get a filter also dropping rows whose column is in values
+
+        :param column:
+        :param values: list of values or single value
+        :return:
+        """
+        return Filter(self.conditions + ((column, _as_list(values), False),))
+
+    def keep(self, column: str, values):
+        """
+        Get a filter also keeping only rows whose column is in values
+
+        :param column:
+        :param values: list of values or single value
+        :return:
+        """
+        return Filter(self.conditions + ((column, _as_list(values), True),))
+
+    def restrict(self, columns: list):
+        """
+        Get a filter with the conditions on columns only
+
+        :param columns:
+        :return:
+        """
+        return Filter(c for c in self.conditions if c[0] in columns)
+
+    def mask(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Compute the mask of kept rows of data
+
+        :param data:
+        :return:
+        """
+        mask = np.ones(len(data), dtype=bool)
+        for column, values, keep in self.conditions:
+            matches = _isin(data[column], values)
+            if keep:
+                mask &= matches
+            else:
+                mask &= ~matches
+        return mask
+
+    def indices(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Compute positions of kept rows of data
+
+        :param data:
+        :return:
+        """
+        return np.flatnonzero(self.mask(data))
+
+    def apply(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Select kept rows of data, data itself is returned when there is no
+        condition and is never modified
+
+        :param data:
+        :return:
+        """
+        if len(self) == 0:
+            return data
+        return data[self.mask(data)]
+
+
+def _as_list(values) -> list:
+    """
+    Wrap a single value into a list
+
+    :param values:
+    :return:
+    """
+    if isinstance(values, (list, tuple, set, np.ndarray, pd.Index)):
+        return list(values)
+    return [values]
+
+
+def _isin(column: pd.Series, values: list) -> np.ndarray:
+    """
+    Compute mask of column values in values, categorical columns are matched
+    on their codes with a lookup table of categories
+
+    :param column:
+    :param values:
+    :return:
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        positions = column.cat.categories.get_indexer(pd.Index(values).unique())
+        # slot 0 of the table is the code -1 of missing values
+        table = np.zeros(len(column.cat.categories) + 1, dtype=bool)
+        table[positions[positions >= 0] + 1] = True
+        return table[column.cat.codes.to_numpy().astype("intp") + 1]
+    return column.isin(values).to_numpy()
@@ -0,0 +1,293 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from delivery_insights.models.spatial import CELL_SIZE, LATITUDE, LONGITUDE, SEVERITY
+from delivery_insights.utils.profiling import profiled
+
+RASTER_FOLDER = "raster"
+# Resolutions of rasters, level 0 having CELL_SIZE cells and each level cells
+# twice as large as the previous one
+LEVELS = 5
+
+
+class RasterTiles:
+    def __init__(
+        self,
+        levels: list,
+        origin: tuple,
+        cell_size: float = CELL_SIZE,
+        years: list = None,
+        severities: list = None,
+    ):
+        """
+        Accident counts of grid cells at several resolutions, by year and
+        severity, as arrays of shape (years, severities, rows, columns) whose
+        first row is the southern one
+
+        Arrays are memory mapped .npy files, so that reading the cells of a
+        bounding box only maps its pages.
+
+        :param levels: array of each level, from the finest one
+        :param origin: latitude and longitude of the south west grid corner
+        :param cell_size: side of cells of level 0 in degrees
+        :param years: consecutive years of the first axis
+        :param severities: severities of the second axis
+        """
+        self.levels = levels
+        self.origin = tuple(origin)
+        self.cell_size = cell_size
+        self.years = years or []
+        self.severities = severities or []
+
+    @classmethod
+    @profiled
+    def build(
+        cls,
+        data: pd.DataFrame,
+        folder: str,
+        cell_size: float = CELL_SIZE,
+        levels: int = LEVELS,
+    ):
+        """
+        Count accidents of each cell by year and severity into the .npy files
+        of folder, a year at a time
+
+        Counts of a level are the sums of 2 x 2 cells of the previous level,
+        and are stored with the smallest unsigned dtype holding them.
+
+        :param data: accidents with Latitude, Longitude, Accident_Severity and
+            Year columns, accidents without coordinates being left out
+        :param folder:
+        :param cell_size: side of cells of level 0 in degrees
+        :param levels: number of levels
+        :return: memory mapped rasters
+        """
+        latitudes = data[LATITUDE].to_numpy(dtype="float64", na_value=np.nan)
+        longitudes = data[LONGITUDE].to_numpy(dtype="float64", na_value=np.nan)
+        severities = pd.Categorical(data[SEVERITY])
+        keep = np.isfinite(latitudes) & np.isfinite(longitudes)
+        keep &= severities.codes >= 0
+        if not keep.any():
+            raise Exception("There is no accident with coordinates to count.")
+        latitudes, longitudes = latitudes[keep], longitudes[keep]
+        codes = severities.codes[keep].astype("int64")
+        years = data["Year"].to_numpy()[keep].astype("int64")
+
+        # cells of every level start at the origin and share its edges
+        size = cell_size * 2 ** (levels - 1)
+        origin = (
+            np.floor(latitudes.min() / size) * size,
+            np.floor(longitudes.min() / size) * size,
+        )
+        rows = np.floor((latitudes - origin[0]) / cell_size).astype("int64")
+        cols = np.floor((longitudes - origin[1]) / cell_size).astype("int64")
+        factor = 2 ** (levels - 1)
+        shape = (
+            -(-(int(rows.max()) + 1) // factor) * factor,
+            -(-(int(cols.max()) + 1) // factor) * factor,
+        )
+        all_years = list(range(int(years.min()), int(years.max()) + 1))
+        categories = list(severities.categories)
+        cells = (codes * shape[0] + rows) * shape[1] + cols
+
+        def pool(counts: np.ndarray) -> np.ndarray:
+            s, r, c = counts.shape
+            return counts.reshape(s, r // 2, 2, c // 2, 2).sum(axis=(2, 4))
+
+        # counts of all years bound the ones of each year, so that counts are
+        # written once with the dtype of the bound of their level, then levels
+        # whose largest count needs a smaller dtype are narrowed
+        totals = np.bincount(cells, minlength=len(categories) * shape[0] * shape[1])
+        totals = totals.reshape(len(categories), *shape)
+        dtypes = [np.min_scalar_type(int(totals.max()))]
+        for _ in range(1, levels):
+            totals = pool(totals)
+            dtypes.append(np.min_scalar_type(int(totals.max())))
+        del totals
+        os.makedirs(folder, exist_ok=True)
+        arrays = [
+            np.lib.format.open_memmap(
+                os.path.join(folder, f"level={level}.tmp.npy"),
+                mode="w+",
+                dtype=dtypes[level],
+                shape=(len(all_years), len(categories), *[n >> level for n in shape]),
+            )
+            for level in range(levels)
+        ]
+        maxima = np.zeros(levels, dtype="int64")
+        for i, year in enumerate(all_years):
+            counts = np.bincount(
+                cells[years == year], minlength=len(categories) * shape[0] * shape[1]
+            ).reshape(len(categories), *shape)
+            for level, array in enumerate(arrays):
+                if level > 0:
+                    counts = pool(counts)
+                array[i] = counts
+                maxima[level] = max(maxima[level], counts.max())
+        for level, array in enumerate(arrays):
+            array.flush()
+            path = os.path.join(folder, f"level={level}.npy")
+            dtype = np.min_scalar_type(int(maxima[level]))
+            if dtype != array.dtype:
+                narrow = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=dtype, shape=array.shape
+                )
+                for i in range(len(array)):
+                    narrow[i] = array[i]
+                narrow.flush()
+                del narrow
+                os.remove(array.filename)
+            else:
+                os.replace(array.filename, path)
+        del arrays, array
+        # load reads levels until a missing file, so that fewer levels than a
+        # previous build must not leave its coarser ones
+        level = levels
+        while os.path.exists(os.path.join(folder, f"level={level}.npy")):
+            os.remove(os.path.join(folder, f"level={level}.npy"))
+            level += 1
+        with open(os.path.join(folder, "raster.json"), "w") as f:
+            json.dump(
+                {
+                    "origin": list(origin),
+                    "cell_size": cell_size,
+                    "years": all_years,
+                    "severities": categories,
+                },
+                f,
+            )
+        return cls.load(folder)
+
+    @classmethod
+    def load(cls, folder: str):
+        """
+        Memory map rasters written by build
+
+        :param folder:
+        :return:
+        """
+        path = os.path.join(folder, "raster.json")
+        if not os.path.exists(path):
+            raise Exception(f"Raster file {path} does not exist.")
+        with open(path) as f:
+            settings = json.load(f)
+        levels = []
+        while os.path.exists(os.path.join(folder, f"level={len(levels)}.npy")):
+            levels.append(
+                np.load(os.path.join(folder, f"level={len(levels)}.npy"), mmap_mode="r")
+            )
+        return cls(levels, **settings)
+
+    def get_cell_size(self, level: int) -> float:
+        """
+        Get side of the cells of a level in degrees
+
+        :param level:
+        :return:
+        """
+        return self.cell_size * 2**level
+
+    def get_extent(self, level: int = 0) -> list:
+        """
+        Get bounds of the rasters
+
+        :param level:
+        :return: west, east, south and north bounds, in degrees
+        """
+        _, _, rows, cols = self.levels[level].shape
+        size = self.get_cell_size(level)
+        return [
+            self.origin[1],
+            self.origin[1] + cols * size,
+            self.origin[0],
+            self.origin[0] + rows * size,
+        ]
+
+    def get_level(self, max_cells: int, bbox: tuple = None) -> int:
+        """
+        Get the finest level whose cells of a bounding box are at most
+        max_cells along each side, the coarsest level otherwise
+
+        :param max_cells:
+        :param bbox: min latitude, min longitude, max latitude and max
+            longitude, the whole rasters by default
+        :return:
+        """
+        for level in range(len(self.levels)):
+            rows, cols = self._get_slices(level, bbox)
+            if max(rows.stop - rows.start, cols.stop - cols.start) <= max_cells:
+                return level
+        return len(self.levels) - 1
+
+    def read(
+        self, bbox: tuple = None, level: int = 0, years=None, severity: str = None
+    ) -> tuple:
+        """
+        Read counts of the cells of a level overlapping a bounding box, as a
+        view of the memory mapped file, without copying it
+
+        :param bbox: min latitude, min longitude, max latitude and max
+            longitude, the whole rasters by default
+        :param level:
+        :param years: a year or the first and last years, all years by default
+        :param severity: severity to keep, all severities by default
+        :return: array of shape (years, severities, rows, columns), and its
+            west, east, south and north bounds
+        """
+        if not 0 <= level < len(self.levels):
+            raise Exception(f"Level {level} is not in 0-{len(self.levels) - 1}.")
+        if years is None:
+            years = (self.years[0], self.years[-1])
+        first, last = [int(year) for year in np.broadcast_to(years, (2,))]
+        if first > last or first < self.years[0] or last > self.years[-1]:
+            raise Exception(f"Years {years} are not in {self.years}.")
+        year_slice = slice(first - self.years[0], last - self.years[0] + 1)
+        if severity is None:
+            severity_slice = slice(None)
+        elif severity in self.severities:
+            i = self.severities.index(severity)
+            severity_slice = slice(i, i + 1)
+        else:
+            raise Exception(f"Severity {severity} is not in {self.severities}.")
+
+        rows, cols = self._get_slices(level, bbox)
+        size = self.get_cell_size(level)
+        extent = [
+            self.origin[1] + cols.start * size,
+            self.origin[1] + cols.stop * size,
+            self.origin[0] + rows.start * size,
+            self.origin[0] + rows.stop * size,
+        ]
+        return self.levels[level][year_slice, severity_slice, rows, cols], extent
+
+    def _get_slices(self, level: int, bbox: tuple = None) -> tuple:
+        """
+        Get rows and columns of the cells of a level overlapping a bounding
+        box, empty when it is out of the rasters
+
+        :param level:
+        :param bbox:
+        :return:
+        """
+        _, _, rows, cols = self.levels[level].shape
+        if bbox is None:
+            return slice(0, rows), slice(0, cols)
+        min_lat, min_lon, max_lat, max_lon = bbox
+        size = self.get_cell_size(level)
+        first_row, last_row = [
+            int(np.clip(np.floor((v - self.origin[0]) / size), 0, rows))
+            for v in (min_lat, max_lat)
+        ]
+        first_col, last_col = [
+            int(np.clip(np.floor((v - self.origin[1]) / size), 0, cols))
+            for v in (min_lon, max_lon)
+        ]
+        # slices stop after the cells holding the north and east bounds
+        last_row = min(rows, last_row + 1) if max_lat >= min_lat else first_row
+        last_col = min(cols, last_col + 1) if max_lon >= min_lon else first_col
+        if max_lat < self.origin[0] or max_lon < self.origin[1]:
+            last_row, last_col = first_row, first_col
+        return slice(first_row, last_row), slice(first_col, last_col)
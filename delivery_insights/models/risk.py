@@ -0,0 +1,260 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from delivery_insights.models.spatial import CELL_SIZE, LATITUDE, LONGITUDE, SEVERITY
+from delivery_insights.utils.fct import (
+    DAYTIME_BANDS,
+    get_band_categories,
+    get_daytime_bands,
+    get_hours,
+)
+from delivery_insights.utils.geo import DEGREE_KM, haversine_km
+from delivery_insights.utils.profiling import profiled
+
+RISK_FOLDER = "risk"
+# Weight of an accident in risk scores by severity, other severities weighing 0
+SEVERITY_WEIGHTS = {"Fatal": 10.0, "Serious": 3.0, "Slight": 1.0}
+DAYTIMES = get_band_categories(DAYTIME_BANDS["labels"])
+
+
+class RouteRiskScorer:
+    def __init__(
+        self,
+        rates: np.ndarray,
+        origin: tuple,
+        cell_size: float = CELL_SIZE,
+        severity_weights: dict = None,
+    ):
+        """
+        Accident risk of delivery routes, scored from severity weighted
+        accidents per year of a grid of cells by daytime band
+
+        :param rates: array of shape (daytimes, rows, columns) of weighted
+            accidents per year of each cell, by band of DAYTIMES
+        :param origin: latitude and longitude of the south west grid corner
+        :param cell_size: side of cells in degrees
+        :param severity_weights: weights rates were counted with
+        """
+        self.rates = rates
+        self.origin = tuple(origin)
+        self.cell_size = cell_size
+        self.severity_weights = severity_weights or SEVERITY_WEIGHTS
+
+    @classmethod
+    @profiled
+    def from_data(
+        cls,
+        data: pd.DataFrame,
+        cell_size: float = CELL_SIZE,
+        severity_weights: dict = None,
+    ):
+        """
+        Count weighted accidents per year of each cell and daytime band
+
+        :param data: accidents with Latitude, Longitude, Accident_Severity,
+            Time or Hour, and Year columns, accidents without coordinates or
+            time being left out
+        :param cell_size: side of cells in degrees
+        :param severity_weights: weight of each severity, SEVERITY_WEIGHTS by
+            default
+        :return:
+        """
+        severity_weights = severity_weights or SEVERITY_WEIGHTS
+        latitudes = data[LATITUDE].to_numpy(dtype="float64", na_value=np.nan)
+        longitudes = data[LONGITUDE].to_numpy(dtype="float64", na_value=np.nan)
+        hours = data["Hour"] if "Hour" in data.columns else get_hours(data["Time"])
+        bands = get_daytime_bands(hours).cat.codes.to_numpy()
+        weights = (
+            data[SEVERITY].map(severity_weights).astype("float64").fillna(0).to_numpy()
+        )
+
+        keep = np.isfinite(latitudes) & np.isfinite(longitudes) & hours.notna().to_numpy()
+        if not keep.any():
+            raise Exception("There is no accident with coordinates and time to score.")
+        latitudes, longitudes = latitudes[keep], longitudes[keep]
+        bands, weights = bands[keep], weights[keep]
+        # rates are per year of the kept accidents only
+        years = (
+            len(np.unique(data["Year"].to_numpy()[keep])) if "Year" in data.columns else 1
+        )
+
+        origin = (
+            np.floor(latitudes.min() / cell_size) * cell_size,
+            np.floor(longitudes.min() / cell_size) * cell_size,
+        )
+        rows = np.floor((latitudes - origin[0]) / cell_size).astype("int64")
+        cols = np.floor((longitudes - origin[1]) / cell_size).astype("int64")
+        shape = (len(DAYTIMES), int(rows.max()) + 1, int(cols.max()) + 1)
+        cells = (bands * shape[1] + rows) * shape[2] + cols
+        rates = np.bincount(cells, weights=weights, minlength=np.prod(shape))
+        return cls(
+            (rates / years).astype("float32").reshape(shape),
+            origin=origin,
+            cell_size=cell_size,
+            severity_weights=severity_weights,
+        )
+
+    @profiled
+    def score(self, routes: list, daytimes) -> list:
+        """
+        Score each segment of routes by the weighted accidents per year of the
+        cells it crosses, pro rata of the distance travelled in each cell
+
+        Segments are cut where they cross the edges of cells, each piece
+        being scored with the rate of the cell holding it, and all the
+        segments of all the routes are scored at once.
+
+        :param routes: list of arrays of shape (points, 2) of the latitudes
+            and longitudes of each route
+        :param daytimes: daytime band or hour of each route, or of all routes
+        :return: list of arrays of the score of each segment of each route
+        """
+        routes = [np.asarray(route, dtype="float64").reshape(-1, 2) for route in routes]
+        if len(routes) == 0:
+            return []
+        bands = np.broadcast_to(self._get_bands(daytimes), (len(routes),))
+        sizes = np.array([len(route) for route in routes])
+        points = np.concatenate(routes)
+
+        # segments start at every point but the last one of each route
+        starts = np.ones(len(points), dtype=bool)
+        starts[np.cumsum(sizes)[sizes > 0] - 1] = False
+        segments = np.flatnonzero(starts)
+        segment_bands = np.repeat(bands, np.maximum(sizes - 1, 0))
+        lat0, lon0 = points[segments, 0], points[segments, 1]
+        lat1, lon1 = points[segments + 1, 0], points[segments + 1, 1]
+        lengths = haversine_km(lat0, lon0, lat1, lon1)
+
+        # fractions of segments at the edges they cross, sorted by segment
+        # then fraction, are set between the 0 and 1 of their segment, so
+        # that consecutive fractions of a segment bound a piece in one cell
+        row_segments, row_fractions = self._get_crossings(
+            (lat0 - self.origin[0]) / self.cell_size,
+            (lat1 - self.origin[0]) / self.cell_size,
+        )
+        col_segments, col_fractions = self._get_crossings(
+            (lon0 - self.origin[1]) / self.cell_size,
+            (lon1 - self.origin[1]) / self.cell_size,
+        )
+        crossing_segments = np.concatenate([row_segments, col_segments])
+        crossing_fractions = np.concatenate([row_fractions, col_fractions])
+        order = np.argsort(2 * crossing_segments + crossing_fractions, kind="stable")
+        counts = np.bincount(crossing_segments, minlength=len(segments))
+        ends = np.cumsum(counts + 2) - 1
+        fractions = np.zeros(len(crossing_segments) + 2 * len(segments))
+        fractions[
+            np.arange(len(order)) + 2 * crossing_segments[order] + 1
+        ] = crossing_fractions[order]
+        fractions[ends] = 1
+        pieces = np.ones(len(fractions), dtype=bool)
+        pieces[ends] = False
+        pieces = np.flatnonzero(pieces)
+        piece_segments = np.repeat(np.arange(len(segments)), counts + 1)
+        t = (fractions[pieces] + fractions[pieces + 1]) / 2
+        latitudes = lat0[piece_segments] + t * (lat1 - lat0)[piece_segments]
+        longitudes = lon0[piece_segments] + t * (lon1 - lon0)[piece_segments]
+
+        rates = self._get_rates(latitudes, longitudes, segment_bands[piece_segments])
+        cell_km = self.cell_size * DEGREE_KM
+        scores = np.bincount(
+            piece_segments,
+            weights=rates
+            * (fractions[pieces + 1] - fractions[pieces])
+            * (lengths / cell_km)[piece_segments],
+            minlength=len(segments),
+        )
+        return np.split(scores, np.cumsum(np.maximum(sizes - 1, 0))[:-1])
+
+    def save(self, folder: str) -> str:
+        """
+        Write rates as a .npy file of folder
+
+        :param folder:
+        :return:
+        """
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, "rates.npy"), self.rates)
+        with open(os.path.join(folder, "risk.json"), "w") as f:
+            json.dump(
+                {
+                    "origin": list(self.origin),
+                    "cell_size": self.cell_size,
+                    "severity_weights": self.severity_weights,
+                },
+                f,
+            )
+        return folder
+
+    @classmethod
+    def load(cls, folder: str, mmap: bool = True):
+        """
+        Read rates written by save
+
+        :param folder:
+        :param mmap: memory map rates instead of reading them
+        :return:
+        """
+        path = os.path.join(folder, "risk.json")
+        if not os.path.exists(path):
+            raise Exception(f"Risk file {path} does not exist.")
+        with open(path) as f:
+            settings = json.load(f)
+        rates = np.load(
+            os.path.join(folder, "rates.npy"), mmap_mode="r" if mmap else None
+        )
+        return cls(rates, **settings)
+
+    def _get_bands(self, daytimes) -> np.ndarray:
+        """
+        Get codes of daytime bands, given as DAYTIMES labels or as hours
+
+        :param daytimes: scalar or array
+        :return:
+        """
+        daytimes = np.atleast_1d(np.asarray(daytimes))
+        if daytimes.dtype.kind in "iuf":
+            if np.isnan(daytimes.astype("float64")).any():
+                raise Exception("Route hours must not be missing.")
+            return get_daytime_bands(daytimes).cat.codes.to_numpy()
+        unknown = sorted(set(daytimes) - set(DAYTIMES))
+        if unknown:
+            raise Exception(f"Daytimes {unknown} are not in {DAYTIMES}.")
+        return pd.Categorical(daytimes, categories=DAYTIMES).codes
+
+    @staticmethod
+    def _get_crossings(starts: np.ndarray, stops: np.ndarray) -> tuple:
+        """
+        Get the edges of cells crossed by segments along an axis
+
+        :param starts: coordinates of the starts of segments, in cells
+        :param stops: coordinates of the stops of segments, in cells
+        :return: segment of each crossing, and its fraction of the segment
+        """
+        low = np.floor(np.minimum(starts, stops))
+        counts = (np.floor(np.maximum(starts, stops)) - low).astype("int64")
+        segments = np.repeat(np.arange(len(starts)), counts)
+        first = np.cumsum(counts) - counts
+        edges = low[segments] + 1 + np.arange(len(segments)) - first[segments]
+        # segments crossing edges are not parallel to them
+        fractions = (edges - starts[segments]) / (stops - starts)[segments]
+        return segments, fractions
+
+    def _get_rates(self, latitudes, longitudes, bands) -> np.ndarray:
+        """
+        Get rates of the cells of points, 0 out of the grid
+
+        :param latitudes:
+        :param longitudes:
+        :param bands: daytime band code of each point
+        :return:
+        """
+        _, height, width = self.rates.shape
+        rows = np.floor((latitudes - self.origin[0]) / self.cell_size).astype("int64")
+        cols = np.floor((longitudes - self.origin[1]) / self.cell_size).astype("int64")
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        rates = np.zeros(len(latitudes))
+        rates[inside] = self.rates[bands[inside], rows[inside], cols[inside]]
+        return rates
@@ -0,0 +1,668 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from delivery_insights.utils.geo import (
+    DEGREE_KM,
+    MAX_DISTANCE_KM,
+    get_bbox,
+    get_haversine,
+    get_haversine_limit,
+    haversine_km,
+)
+from delivery_insights.utils.profiling import profiled
+
+SPATIAL_FOLDER = "spatial"
+LATITUDE = "Latitude"
+LONGITUDE = "Longitude"
+SEVERITY = "Accident_Severity"
+
+# Side of grid cells in degrees, about 1.1 km of latitude
+CELL_SIZE = 0.01
+# Points, (box, row) pairs or (query, point) pairs processed at once, to bound
+# memory of batches
+BATCH_SIZE = 1_000_000
+# Offset between the sort keys of two grid rows, above any longitude span
+_ROW_STRIDE = 512.0
+
+# Degrees added around the longitudes bounds of rows within a distance, so
+# that rounding errors of the bounds do not change counts
+_WIDTH_MARGIN = 1e-7
+
+# Arrays of a saved index, i.e of the sorted points
+_ARRAYS = ["latitude", "longitude", "severity", "position", "key", "cell_offsets"]
+
+
+class GridIndex:
+    def __init__(
+        self,
+        arrays: dict,
+        origin: tuple,
+        shape: tuple,
+        cell_size: float = CELL_SIZE,
+        categories: list = None,
+    ):
+        """
+        Accident coordinates bucketed in a regular latitude/longitude grid
+
+        Points are sorted by grid row, then by longitude, so that the points
+        of a row between two longitudes are a contiguous slice found by
+        binary search on their sort keys, and the points of a cell too.
+        Longitudes are not wrapped around the antimeridian.
+
+        :param arrays: arrays of sorted points, by name of _ARRAYS: latitude,
+            longitude, severity code, position of the point in the indexed
+            data, sort key, and first point of each cell
+        :param origin: latitude and longitude of the south west grid corner
+        :param shape: rows and columns of the grid
+        :param cell_size: side of cells in degrees
+        :param categories: severities of severity codes
+        """
+        self.arrays = arrays
+        self.origin = tuple(origin)
+        self.shape = tuple(shape)
+        self.cell_size = cell_size
+        self.categories = categories or []
+        self._severity_offsets = None
+
+    @classmethod
+    @profiled
+    def from_data(cls, data: pd.DataFrame, cell_size: float = CELL_SIZE):
+        """
+        Index coordinates of accidents data, rows without coordinates being
+        left out
+
+        :param data: accidents with Latitude, Longitude and, optionally,
+            Accident_Severity columns
+        :param cell_size: side of cells in degrees
+        :return:
+        """
+        return cls.build(
+            data[LATITUDE].to_numpy(dtype="float64", na_value=np.nan),
+            data[LONGITUDE].to_numpy(dtype="float64", na_value=np.nan),
+            severities=data[SEVERITY] if SEVERITY in data.columns else None,
+            cell_size=cell_size,
+        )
+
+    @classmethod
+    def build(
+        cls,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        severities=None,
+        cell_size: float = CELL_SIZE,
+    ):
+        """
+        Index coordinates
+
+        :param latitudes:
+        :param longitudes:
+        :param severities: severity of each point
+        :param cell_size: side of cells in degrees
+        :return:
+        """
+        latitudes = np.asarray(latitudes, dtype="float64")
+        longitudes = np.asarray(longitudes, dtype="float64")
+        severities = pd.Categorical(
+            [None] * len(latitudes) if severities is None else severities
+        )
+        position = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        if len(position) == 0:
+            raise Exception("There is no point with coordinates to index.")
+        latitudes, longitudes = latitudes[position], longitudes[position]
+
+        origin = (
+            np.floor(latitudes.min() / cell_size) * cell_size,
+            np.floor(longitudes.min() / cell_size) * cell_size,
+        )
+        rows = np.floor((latitudes - origin[0]) / cell_size).astype("int64")
+        cols = np.floor((longitudes - origin[1]) / cell_size).astype("int64")
+        shape = (int(rows.max()) + 1, int(cols.max()) + 1)
+
+        order = np.lexsort((longitudes, rows))
+        rows, cols = rows[order], cols[order]
+        cells = rows * shape[1] + cols
+        arrays = {
+            "latitude": latitudes[order],
+            "longitude": longitudes[order],
+            "severity": severities.codes[position][order].astype("int8"),
+            "position": position[order],
+            "key": rows * _ROW_STRIDE + (longitudes[order] - origin[1]),
+            "cell_offsets": np.searchsorted(cells, np.arange(shape[0] * shape[1] + 1)),
+        }
+        return cls(
+            arrays,
+            origin=origin,
+            shape=shape,
+            cell_size=cell_size,
+            categories=list(severities.categories),
+        )
+
+    def __len__(self):
+        return len(self.arrays["latitude"])
+
+    @profiled
+    def count_in_bbox(
+        self, min_lat, min_lon, max_lat, max_lon, batch_size: int = BATCH_SIZE
+    ) -> np.ndarray:
+        """
+        Count points in bounding boxes, bounds included
+
+        Rows strictly inside a box are counted by binary search only, the
+        points of its first and last rows are checked against its bounds.
+
+        :param min_lat: array or scalar of bounds of each box
+        :param min_lon:
+        :param max_lat:
+        :param max_lon:
+        :param batch_size: (box, row) pairs processed at once
+        :return: number of points in each box
+        """
+        boxes = np.broadcast_arrays(
+            *[
+                np.atleast_1d(np.asarray(v, dtype="float64"))
+                for v in (min_lat, min_lon, max_lat, max_lon)
+            ]
+        )
+        counts = np.zeros(len(boxes[0]), dtype="int64")
+        for batch in self._iter_row_slices(*boxes, batch_size=batch_size):
+            box_ids, _, lo, hi, edge = batch
+            interior = ~edge
+            counts += np.bincount(
+                box_ids[interior],
+                weights=hi[interior] - lo[interior],
+                minlength=len(counts),
+            ).astype("int64")
+
+            # points of edge rows are checked against box latitudes
+            for point_box, points in _iter_gathered(
+                box_ids[edge], lo[edge], hi[edge], batch_size
+            ):
+                latitudes = self.arrays["latitude"][points]
+                inside = (latitudes >= boxes[0][point_box]) & (
+                    latitudes <= boxes[2][point_box]
+                )
+                counts += np.bincount(point_box[inside], minlength=len(counts))
+        return counts
+
+    @profiled
+    def count_within(
+        self, latitudes, longitudes, radius_km, batch_size: int = BATCH_SIZE
+    ) -> tuple:
+        """
+        Count points within a great circle distance of query points, bounds
+        included
+
+        In each grid row of a circle, the points of the longitudes close
+        enough to the query for the whole row to be within the distance are
+        counted by binary search, and the ones far enough for the whole row
+        to be out are skipped. Distances are only computed for the points in
+        between, batch_size (query, point) pairs at a time.
+
+        :param latitudes: array or scalar of query latitudes
+        :param longitudes:
+        :param radius_km: array or scalar of radius of each query
+        :param batch_size: (query, point) pairs processed at once
+        :return: number of points of each query, and array of shape
+            (queries, categories) of its number of points by severity
+        """
+        latitudes, longitudes, radius_km = np.broadcast_arrays(
+            *[
+                np.atleast_1d(np.asarray(v, dtype="float64"))
+                for v in (latitudes, longitudes, radius_km)
+            ]
+        )
+        width = max(1, len(self.categories))
+        counts = np.zeros(len(latitudes), dtype="int64")
+        by_severity = np.zeros((len(latitudes), width), dtype="int64")
+        severity_offsets = self._get_severity_offsets()
+        limits = get_haversine_limit(radius_km)
+
+        for box_ids, rows, _, _, _ in self._iter_row_slices(
+            *get_bbox(latitudes, longitudes, radius_km), batch_size=batch_size
+        ):
+            inner, outer = self._get_row_half_widths(
+                latitudes[box_ids], limits[box_ids], rows
+            )
+            center = longitudes[box_ids]
+            outer_lo, outer_hi = self._search_rows(rows, center - outer, center + outer)
+            inner_lo, inner_hi = self._search_rows(rows, center - inner, center + inner)
+            # rows without points surely within the distance have no inner slice
+            inner_lo = np.where(inner >= 0, inner_lo, outer_lo)
+            inner_hi = np.where(inner >= 0, inner_hi, outer_lo)
+
+            counts += np.bincount(
+                box_ids, weights=inner_hi - inner_lo, minlength=len(counts)
+            ).astype("int64")
+            inner_counts = severity_offsets[inner_hi] - severity_offsets[inner_lo]
+            for i in range(inner_counts.shape[1]):
+                by_severity[:, i] += np.bincount(
+                    box_ids, weights=inner_counts[:, i], minlength=len(counts)
+                ).astype("int64")
+
+            for query_ids, points in _iter_gathered(
+                np.concatenate([box_ids, box_ids]),
+                np.concatenate([outer_lo, inner_hi]),
+                np.concatenate([inner_lo, outer_hi]),
+                batch_size,
+            ):
+                near = (
+                    get_haversine(
+                        latitudes[query_ids],
+                        longitudes[query_ids],
+                        self.arrays["latitude"][points],
+                        self.arrays["longitude"][points],
+                    )
+                    <= limits[query_ids]
+                )
+                query_ids = query_ids[near]
+                codes = self.arrays["severity"][points[near]].astype("int64")
+                counts += np.bincount(query_ids, minlength=len(counts))
+                known = codes >= 0
+                by_severity.ravel()[:] += np.bincount(
+                    query_ids[known] * width + codes[known],
+                    minlength=by_severity.size,
+                )
+        return counts, by_severity[:, : len(self.categories)]
+
+    @profiled
+    def k_nearest(self, latitudes, longitudes, k: int = 1, batch_size: int = BATCH_SIZE):
+        """
+        Find the k nearest points of query points, by great circle distance
+
+        Points are searched in boxes around the queries, whose radius doubles
+        for the queries having less than k points within it.
+
+        :param latitudes: array or scalar of query latitudes
+        :param longitudes:
+        :param k:
+        :param batch_size: queries processed at once
+        :return: distances in km and positions in the indexed data of the
+            nearest points of each query, nearest first, arrays of shape
+            (queries, k)
+        """
+        latitudes, longitudes = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(latitudes, dtype="float64")),
+            np.atleast_1d(np.asarray(longitudes, dtype="float64")),
+        )
+        if k > len(self):
+            raise Exception(f"There are less than {k} indexed points.")
+        distances = np.empty((len(latitudes), k))
+        positions = np.empty((len(latitudes), k), dtype="int64")
+        radius = self._get_search_radius(latitudes, longitudes, k)
+
+        todo = np.arange(len(latitudes))
+        while len(todo) > 0:
+            found = []
+            for start in range(0, len(todo), batch_size):
+                queries = todo[start : start + batch_size]
+                query_ids, points, query_distances = [
+                    np.concatenate(arrays)
+                    for arrays in zip(
+                        *self._iter_candidates(
+                            latitudes[queries],
+                            longitudes[queries],
+                            radius[queries],
+                            batch_size=BATCH_SIZE,
+                        )
+                    )
+                ]
+                # points beyond the radius may be farther than missed ones,
+                # boxes of the largest radius holding every point
+                query_radius = radius[queries][query_ids]
+                near = (query_distances <= query_radius) | (
+                    query_radius >= MAX_DISTANCE_KM
+                )
+                query_ids, points = query_ids[near], points[near]
+                query_distances = query_distances[near]
+                done = np.bincount(query_ids, minlength=len(queries)) >= k
+
+                keep = done[query_ids]
+                order = np.lexsort((query_distances[keep], query_ids[keep]))
+                query_ids = query_ids[keep][order]
+                rank = np.arange(len(query_ids)) - np.searchsorted(query_ids, query_ids)
+                first = rank < k
+                rows = queries[query_ids[first]].reshape(-1, k)[:, 0]
+                distances[rows] = query_distances[keep][order][first].reshape(-1, k)
+                positions[rows] = self.arrays["position"][
+                    points[keep][order][first]
+                ].reshape(-1, k)
+                found.append(queries[done])
+
+            todo = np.setdiff1d(todo, np.concatenate(found))
+            radius[todo] = np.minimum(radius[todo] * 2, MAX_DISTANCE_KM)
+        return distances, positions
+
+    def get_cell_counts(self) -> pd.DataFrame:
+        """
+        Count points of each non empty cell, by severity
+
+        :return: grid row and column, latitude and longitude of the center,
+            count and one count column by severity of each cell
+        """
+        counts = np.diff(self.arrays["cell_offsets"])
+        cells = np.flatnonzero(counts)
+        # rank of the non empty cell of each sorted point
+        point_cells = np.repeat(np.arange(len(cells)), counts[cells])
+        rows, cols = np.divmod(cells, self.shape[1])
+        data = pd.DataFrame(
+            {
+                "Row": rows,
+                "Col": cols,
+                LATITUDE: self.origin[0] + (rows + 0.5) * self.cell_size,
+                LONGITUDE: self.origin[1] + (cols + 0.5) * self.cell_size,
+                "Count": counts[cells],
+            }
+        )
+        codes = self.arrays["severity"].astype("int64")
+        known = codes >= 0
+        by_severity = np.bincount(
+            point_cells[known] * len(self.categories) + codes[known],
+            minlength=len(cells) * len(self.categories),
+        ).reshape(len(cells), len(self.categories))
+        for i, category in enumerate(self.categories):
+            data[category] = by_severity[:, i]
+        return data
+
+    def get_counts_grid(self, factor: int = 1) -> np.ndarray:
+        """
+        Count points of each cell, as a grid whose first row is the southern
+        one
+
+        :param factor: cells merged along each side, i.e to draw a coarser map
+        :return:
+        """
+        counts = np.diff(self.arrays["cell_offsets"]).reshape(self.shape)
+        if factor > 1:
+            rows, cols = [-(-size // factor) * factor for size in self.shape]
+            padded = np.zeros((rows, cols), dtype=counts.dtype)
+            padded[: self.shape[0], : self.shape[1]] = counts
+            counts = padded.reshape(rows // factor, factor, cols // factor, factor)
+            counts = counts.sum(axis=(1, 3))
+        return counts
+
+    def get_extent(self) -> list:
+        """
+        Get bounds of the grid
+
+        :return: west, east, south and north bounds, in degrees
+        """
+        return [
+            self.origin[1],
+            self.origin[1] + self.shape[1] * self.cell_size,
+            self.origin[0],
+            self.origin[0] + self.shape[0] * self.cell_size,
+        ]
+
+    def save(self, folder: str) -> str:
+        """
+        Write arrays of the index as .npy files of folder
+
+        :param folder:
+        :return:
+        """
+        os.makedirs(folder, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(folder, f"{name}.npy"), self.arrays[name])
+        with open(os.path.join(folder, "grid.json"), "w") as f:
+            json.dump(
+                {
+                    "origin": list(self.origin),
+                    "shape": list(self.shape),
+                    "cell_size": self.cell_size,
+                    "categories": self.categories,
+                },
+                f,
+            )
+        return folder
+
+    @classmethod
+    def load(cls, folder: str, mmap: bool = True):
+        """
+        Read an index written by save, without building it again
+
+        :param folder:
+        :param mmap: memory map arrays instead of reading them
+        :return:
+        """
+        path = os.path.join(folder, "grid.json")
+        if not os.path.exists(path):
+            raise Exception(f"Grid file {path} does not exist.")
+        with open(path) as f:
+            grid = json.load(f)
+        arrays = {
+            name: np.load(
+                os.path.join(folder, f"{name}.npy"), mmap_mode="r" if mmap else None
+            )
+            for name in _ARRAYS
+        }
+        return cls(arrays, **grid)
+
+    def _get_rows(self, latitudes: np.ndarray) -> np.ndarray:
+        """
+        Get grid rows of latitudes, like for indexed points
+
+        :param latitudes:
+        :return:
+        """
+        return np.floor((latitudes - self.origin[0]) / self.cell_size).astype("int64")
+
+    def _iter_row_slices(self, min_lat, min_lon, max_lat, max_lon, batch_size: int):
+        """
+        Find the slices of sorted points of each grid row of boxes, between
+        the box longitudes
+
+        :param min_lat: arrays of bounds of each box
+        :param min_lon:
+        :param max_lat:
+        :param max_lon:
+        :param batch_size: (box, row) pairs of each batch
+        :return: generator of box and row of each pair, slice bounds and
+            whether the row is the first or last of the box
+        """
+        west, east, south, north = self.get_extent()
+        valid = (
+            (min_lat <= max_lat)
+            & (min_lon <= max_lon)
+            & (max_lat >= south)
+            & (min_lat <= north)
+            & (max_lon >= west)
+            & (min_lon <= east)
+        )
+        first = np.clip(self._get_rows(min_lat), 0, self.shape[0] - 1)
+        last = np.clip(self._get_rows(max_lat), 0, self.shape[0] - 1)
+        sizes = np.where(valid, last - first + 1, 0)
+
+        ends = np.cumsum(sizes)
+        start = 0
+        while start < len(sizes):
+            stop = max(
+                start + 1,
+                np.searchsorted(ends, ends[start] - sizes[start] + batch_size, "right"),
+            )
+            box_ids = np.repeat(np.arange(start, stop), sizes[start:stop])
+            rows = first[box_ids] + (
+                np.arange(len(box_ids)) - np.searchsorted(box_ids, box_ids)
+            )
+            lo, hi = self._search_rows(rows, min_lon[box_ids], max_lon[box_ids])
+            edge = (rows == first[box_ids]) | (rows == last[box_ids])
+            yield box_ids, rows, lo, hi, edge
+            start = stop
+
+    def _search_rows(self, rows, min_lon, max_lon) -> tuple:
+        """
+        Find the slices of sorted points of grid rows between longitudes,
+        bounds included
+
+        :param rows:
+        :param min_lon: array of west bounds of each row
+        :param max_lon:
+        :return: slice starts and stops
+        """
+        west, east, _, _ = self.get_extent()
+        # longitudes are clipped to the grid, keys of a row staying in the row
+        lo = np.searchsorted(
+            self.arrays["key"],
+            rows * _ROW_STRIDE + np.clip(min_lon - west, 0, east - west),
+            "left",
+        )
+        hi = np.searchsorted(
+            self.arrays["key"],
+            rows * _ROW_STRIDE + np.clip(max_lon - west, 0, east - west),
+            "right",
+        )
+        return lo, hi
+
+    def _get_row_half_widths(self, latitudes, limits, rows) -> tuple:
+        """
+        Bound the longitudes of grid rows within a distance of queries
+
+        The haversine of the distance to a point of a row is at most the one
+        of the farthest latitude of the row, with the cosine of its latitude
+        closest to the equator, and at least the one of its nearest latitude,
+        with the cosine of its latitude farthest from the equator.
+
+        :param latitudes: query of each row
+        :param limits: haversine of the distance of each row, see
+            get_haversine_limit
+        :param rows:
+        :return: half widths in degrees around the query longitudes whose
+            points are all within the distance, negative when there is none,
+            and out of which they all are beyond it
+        """
+        south = self.origin[0] + rows * self.cell_size
+        north = south + self.cell_size
+        near = np.abs(np.clip(latitudes, south, north) - latitudes)
+        far = np.maximum(np.abs(south - latitudes), np.abs(north - latitudes))
+        cos_query = np.cos(np.radians(latitudes))
+        cos_max = np.cos(np.radians(np.clip(0.0, south, north)))
+        cos_min = np.cos(np.radians(np.maximum(np.abs(south), np.abs(north))))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inner = (limits - np.sin(np.radians(far) / 2) ** 2) / (cos_query * cos_max)
+            outer = (limits - np.sin(np.radians(near) / 2) ** 2) / (cos_query * cos_min)
+        # margins keep points on the bounds for the exact distance check
+        return (
+            _get_half_width(inner) - _WIDTH_MARGIN,
+            _get_half_width(outer) + _WIDTH_MARGIN,
+        )
+
+    def _get_severity_offsets(self) -> np.ndarray:
+        """
+        Count points of each severity before each sorted point, so that the
+        points of a slice are counted by severity by a difference
+
+        :return: array of shape (points + 1, categories)
+        """
+        if self._severity_offsets is None:
+            codes = self.arrays["severity"]
+            offsets = np.zeros((len(codes) + 1, len(self.categories)), dtype="int64")
+            for i in range(len(self.categories)):
+                np.cumsum(codes == i, out=offsets[1:, i])
+            self._severity_offsets = offsets
+        return self._severity_offsets
+
+    def _get_search_radius(self, latitudes, longitudes, k: int) -> np.ndarray:
+        """
+        Estimate radius holding k points around queries from the density of
+        their cell, a cell side for queries in empty cells or out of the grid
+
+        :param latitudes:
+        :param longitudes:
+        :param k:
+        :return: radius in km of each query
+        """
+        rows = self._get_rows(latitudes)
+        cols = np.floor((longitudes - self.origin[1]) / self.cell_size).astype("int64")
+        inside = (
+            (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        )
+        counts = np.zeros(len(latitudes), dtype="int64")
+        cells = rows[inside] * self.shape[1] + cols[inside]
+        offsets = self.arrays["cell_offsets"]
+        counts[inside] = offsets[cells + 1] - offsets[cells]
+
+        side = self.cell_size * DEGREE_KM
+        cell_area = side**2 * np.cos(np.radians(np.clip(latitudes, -89.9, 89.9)))
+        # circle expected to hold k points, widened as density is not uniform
+        radius = 1.5 * np.sqrt(k * cell_area / (np.pi * np.maximum(counts, 1)))
+        return np.where(counts > 0, np.maximum(radius, side / 16), side)
+
+    def _iter_candidates(
+        self, latitudes, longitudes, radius_km, batch_size: int = BATCH_SIZE
+    ):
+        """
+        Find the points of the boxes holding circles around queries, with
+        their distance to the query
+
+        :param latitudes:
+        :param longitudes:
+        :param radius_km: radius of each query
+        :param batch_size: (query, candidate) pairs of each batch
+        :return: generator of query of each candidate, its sorted point and
+            its distance in km
+        """
+        for box_ids, _, lo, hi, _ in self._iter_row_slices(
+            *get_bbox(latitudes, longitudes, radius_km), batch_size=batch_size
+        ):
+            for query_ids, points in _iter_gathered(box_ids, lo, hi, batch_size):
+                distances = haversine_km(
+                    latitudes[query_ids],
+                    longitudes[query_ids],
+                    self.arrays["latitude"][points],
+                    self.arrays["longitude"][points],
+                )
+                yield query_ids, points, distances
+
+
+def _get_half_width(ratio: np.ndarray) -> np.ndarray:
+    """
+    Get longitude half widths from bounds of the squared sine of their half,
+    every longitude when it reaches one
+
+    :param ratio: bound of sin(half width / 2) ** 2, negative when there is no
+        such longitude
+    :return: half widths in degrees, -1 when there is none
+    """
+    with np.errstate(invalid="ignore"):
+        width = np.degrees(2 * np.arcsin(np.sqrt(np.clip(ratio, 0.0, 1.0))))
+    width = np.where(ratio >= 1, 360.0, width)
+    return np.where(ratio >= 0, width, -1.0)
+
+
+def _iter_gathered(ids: np.ndarray, lo: np.ndarray, hi: np.ndarray, batch_size: int):
+    """
+    Expand slices into the indices they hold, at most batch_size indices at a
+    time, a single empty batch being yielded when there are none
+
+    :param ids: id of each slice, i.e of its box
+    :param lo: slice starts
+    :param hi: slice stops
+    :param batch_size:
+    :return: generator of id of the slice of each index, and indices
+    """
+    lengths = np.maximum(hi - lo, 0)
+    # slices longer than a batch are split
+    parts = np.maximum(-(-lengths // batch_size), 1)
+    if (parts > 1).any():
+        slice_ids = np.repeat(np.arange(len(lengths)), parts)
+        part = np.arange(len(slice_ids)) - np.searchsorted(slice_ids, slice_ids)
+        ids, lo = ids[slice_ids], lo[slice_ids] + part * batch_size
+        hi = np.minimum(lo + batch_size, hi[slice_ids])
+        lengths = np.maximum(hi - lo, 0)
+
+    ends = np.cumsum(lengths)
+    start = 0
+    while True:
+        offset = ends[start - 1] if start > 0 else 0
+        stop = max(start + 1, np.searchsorted(ends, offset + batch_size, "right"))
+        stop = min(stop, len(lengths))
+        slice_ids = np.repeat(np.arange(start, stop), lengths[start:stop])
+        flat = np.arange(len(slice_ids)) + offset
+        indices = lo[slice_ids] + flat - (ends - lengths)[slice_ids]
+        yield ids[slice_ids], indices
+        start = stop
+        if start >= len(lengths):
+            break
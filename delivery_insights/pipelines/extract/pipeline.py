@@ -1,42 +1,39 @@
 import os
 import sys
-from pathlib import Path
-import argparse
 from delivery_insights.loader.kaggle import kaggle
-import shutil
+from delivery_insights.utils.config import get_extract_parser
+from delivery_insights.utils.profiling import profiled
 
 
-def extract(repo: str, files_list: list, output_folder: str):
+@profiled
+def extract(repo: str, files_list: list, output_folder: str, keep_zip: bool = False):
     """
 
     :param repo:
     :param files_list:
     :param output_folder:
+    :param keep_zip: keep zip archives, csv files being read out of them
     :return:
     """
     kg = kaggle(
         repo=repo,
         files_list=files_list,
+        output_folder=output_folder,
+        keep_zip=keep_zip,
     )
+    # files are decompressed straight into output folder
     kg.load_files()
 
-    for f in files_list:
-        shutil.move(
-            os.path.join(os.getcwd(), f),
-            os.path.join(output_folder, f),
-        )
-
 
-def extract_pipeline():
+def extract_pipeline(args=None):
     """
 
+    :param args: parsed get_extract_parser arguments, parsed from command line
+        when None
     :return:
     """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--repo", help="repo name", type=str)
-    parser.add_argument("--files-list", nargs="*", help="files list", type=str)
-    parser.add_argument("--output-folder", help="Output folder", type=str)
-    args = parser.parse_args()
+    if args is None:
+        args = get_extract_parser().parse_args()
     output_folder = args.output_folder
     repo = args.repo
     files_list = args.files_list
@@ -45,8 +42,13 @@ def extract_pipeline():
         if not os.path.exists(output_folder):
             os.mkdir(output_folder)
 
-        extract(repo=repo, files_list=files_list, output_folder=output_folder)
+        extract(
+            repo=repo,
+            files_list=files_list,
+            output_folder=output_folder,
+            keep_zip=args.keep_zip,
+        )
 
     except Exception as e:
         print(f"Error: {e}")
-        sys.exit()
+        sys.exit(1)
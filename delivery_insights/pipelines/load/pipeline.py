@@ -2,58 +2,237 @@ import os
 import sys
 import pandas as pd
 from delivery_insights.loader.db import Database
-import argparse
+from delivery_insights.loader.archive import source_exists
+from delivery_insights.loader.cache import read_source
+from delivery_insights.loader.formats import has_schema, iter_frame
+from delivery_insights.models.areas import AreaAggregates
+from delivery_insights.utils.config import get_load_parser
+from delivery_insights.utils.profiling import profiled
 
 
-def load(data: pd.DataFrame, db_config_file: str):
+# columns of the accidents table, one row per vehicle of an accident
+TABLE_COLUMNS = [
+    "accident_index",
+    "vehicle_reference",
+    "year",
+    "age_band_of_driver",
+    "age_of_vehicle",
+    "driver_home_area_type",
+    "journey_purpose_of_driver",
+    "accident_severity",
+    "accident_date",
+    "day_of_week",
+]
+TABLE_KEYS = ["accident_index", "vehicle_reference"]
+# table of the accidents counts of areas, see AreaAggregates
+AREA_TABLE = "area_accidents"
+
+
+@profiled
+def load(
+    data: pd.DataFrame,
+    db_config_file: str,
+    chunksize: int = 100_000,
+    copy_format: str = "csv",
+    db: Database = None,
+    upsert: bool = False,
+):
     """
 
     :param data:
     :param db_config_file:
+    :param chunksize: rows sent per COPY statement
+    :param copy_format: "csv" or "binary"
+    :param db: open database to reuse its connection pool, a new one is created
+        from db_config_file and closed when None
+    :param upsert: replace the table rows of the years of data instead of
+        appending data
+    :return:
+    """
+    if db is None:
+        with Database(db_config_file) as db:
+            return load(
+                data, db_config_file, chunksize, copy_format, db=db, upsert=upsert
+            )
+
+    create_accidents_table(db)
+
+    data = data.rename(columns=str.lower)[TABLE_COLUMNS]
+    if upsert:
+        print("Upsert data into database")
+        db.upsert_df_into_table(
+            data,
+            "accidents",
+            keys=TABLE_KEYS,
+            chunksize=chunksize,
+            copy_format=copy_format,
+            scope="year",
+        )
+    else:
+        print("Insert data into database")
+        db.insert_df_into_table(
+            data, "accidents", chunksize=chunksize, copy_format=copy_format
+        )
+    print(f"Database stats: {db.get_stats()}")
+
+
+@profiled
+def load_frame(
+    path: str,
+    db_config_file: str,
+    chunksize: int = 100_000,
+    copy_format: str = "csv",
+    replace: bool = False,
+):
+    """
+    Load a file written by the pipelines a batch at a time, only the table
+    columns of memory mapped feather files being read
+
+    :param path: file with a schema sidecar
+    :param db_config_file:
+    :param chunksize: rows sent per COPY statement
+    :param copy_format: "csv" or "binary"
+    :param replace: empty the table before loading the file
+    :return:
+    """
+    with Database(db_config_file) as db:
+        if replace:
+            create_accidents_table(db)
+            db.execute_query("TRUNCATE accidents")
+        for data in iter_frame(path, columns=TABLE_COLUMNS):
+            load(
+                data=data,
+                db_config_file=db_config_file,
+                chunksize=chunksize,
+                copy_format=copy_format,
+                db=db,
+            )
+
+
+@profiled
+def load_areas(
+    folder: str,
+    db_config_file: str,
+    chunksize: int = 100_000,
+    copy_format: str = "csv",
+):
+    """
+    Replace the rows of the area accidents table by the tables of area
+    aggregates
+
+    :param folder: folder of AreaAggregates
+    :param db_config_file:
+    :param chunksize: rows sent per COPY statement
+    :param copy_format: "csv" or "binary"
+    :return:
+    """
+    aggregates = AreaAggregates.load(folder)
+    with Database(db_config_file) as db:
+        create_area_table(db)
+        db.execute_query(f"TRUNCATE {AREA_TABLE}")
+        for name in aggregates.tables.keys():
+            db.insert_df_into_table(
+                aggregates.to_frame(name).rename(columns=str.lower),
+                AREA_TABLE,
+                chunksize=chunksize,
+                copy_format=copy_format,
+            )
+        print(f"Database stats: {db.get_stats()}")
+
+
+def create_area_table(db: Database) -> None:
+    """
+    Create area accidents table and its indexes when they do not exist
+
+    The primary key answers the counts of an area, and the ranking index the
+    areas with the most accidents of a dimension value.
+
+    :param db:
+    :return:
+    """
+    create_table_query = f"""
+                CREATE TABLE IF NOT EXISTS {AREA_TABLE} (
+                    area_type TEXT,
+                    area TEXT,
+                    dimension TEXT,
+                    value TEXT,
+                    count INT,
+                    PRIMARY KEY (area_type, area, dimension, value)
+                )"""
+
+    db.execute_query(query=create_table_query)
+    db.execute_query(
+        query=f"CREATE INDEX IF NOT EXISTS {AREA_TABLE}_ranking "
+        f"ON {AREA_TABLE} (area_type, dimension, value, count DESC)"
+    )
+
+
+def create_accidents_table(db: Database) -> None:
+    """
+    Create accidents table when it does not exist
+
+    :param db:
     :return:
     """
-    db = Database(db_config_file)
     create_table_query = """
                 CREATE TABLE IF NOT EXISTS accidents (
-                    accident_index TEXT PRIMARY KEY,
+                    accident_index TEXT,
+                    vehicle_reference INT,
                     year INT,
-                    age_band_of_briver TEXT,
+                    age_band_of_driver TEXT,
                     age_of_vehicle INT,
                     driver_home_area_type TEXT,
                     journey_purpose_of_driver TEXT,
-                    accident_Severity TEXT,
+                    accident_severity TEXT,
                     accident_date DATE,
-                    day_of_Week TEXT
+                    day_of_week TEXT,
+                    PRIMARY KEY (accident_index, vehicle_reference)
                 )"""
 
     db.execute_query(query=create_table_query)
 
-    print("Insert data into database")
-    db.insert_df_into_table(data.head(5), "accidents")
-
 
-def load_pipeline():
+def load_pipeline(args=None):
     """
 
+    :param args: parsed get_load_parser arguments, parsed from command line
+        when None
     :return:
     """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input-folder", help="input folder", type=str)
-    parser.add_argument("--filename", help="filename", type=str)
-    parser.add_argument("--db-config-file", help="Path to db config file", type=str)
-    args = parser.parse_args()
+    if args is None:
+        args = get_load_parser().parse_args()
     input_folder = args.input_folder
     filename = args.filename
     db_config_file = args.db_config_file
 
     try:
-        if not os.path.exists(os.path.join(input_folder, filename)):
+        if args.areas_folder is None and not source_exists(input_folder, filename):
             raise Exception(f"{filename} does not exist.")
         if not os.path.exists(db_config_file):
             raise Exception("Wrong path for database.ini file")
-        data = pd.read_csv(os.path.join(input_folder, filename))
-        load(data=data, db_config_file=db_config_file)
+        if args.areas_folder:
+            load_areas(
+                args.areas_folder,
+                db_config_file=db_config_file,
+                chunksize=args.chunksize,
+                copy_format=args.copy_format,
+            )
+        elif has_schema(os.path.join(input_folder, filename)):
+            load_frame(
+                os.path.join(input_folder, filename),
+                db_config_file=db_config_file,
+                chunksize=args.chunksize,
+                copy_format=args.copy_format,
+            )
+        else:
+            data = read_source(input_folder, filename)
+            load(
+                data=data,
+                db_config_file=db_config_file,
+                chunksize=args.chunksize,
+                copy_format=args.copy_format,
+            )
 
     except Exception as e:
         print(f"Error: {e}")
-        sys.exit()
+        sys.exit(1)
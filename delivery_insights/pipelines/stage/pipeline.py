@@ -0,0 +1,48 @@
+import os
+import sys
+from delivery_insights.loader.archive import source_exists
+from delivery_insights.loader.cache import is_cached, stage_file
+from delivery_insights.utils.config import get_stage_parser
+from delivery_insights.utils.profiling import profiled
+
+
+@profiled
+def stage(input_folder: str, files_list: list):
+    """
+    Convert extracted csv files, or their zip archives, into year partitioned
+    parquet files, once per csv content
+
+    :param input_folder:
+    :param files_list:
+    :return:
+    """
+    for f in files_list:
+        if is_cached(input_folder, f):
+            print(f"{f} is already staged.")
+        else:
+            print(f"Staging file : {f}")
+            stage_file(input_folder, f)
+
+
+def stage_pipeline(args=None):
+    """
+
+    :param args: parsed get_stage_parser arguments, parsed from command line
+        when None
+    :return:
+    """
+    if args is None:
+        args = get_stage_parser().parse_args()
+    input_folder = args.input_folder
+    files_list = args.files_list
+
+    try:
+        for f in files_list:
+            if not source_exists(input_folder, f):
+                raise Exception(f"{f} does not exist.")
+
+        stage(input_folder=input_folder, files_list=files_list)
+
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -1,56 +1,262 @@
 import pandas as pd
+import multiprocessing
 import os
-import argparse
+import shutil
 import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from delivery_insights.loader.archive import source_exists
+from delivery_insights.loader.cache import PARTITION_COLUMN, read_source
+from delivery_insights.loader.formats import (
+    append_part,
+    get_format_path,
+    open_frame,
+    read_schema,
+    remove_frame,
+    update_schema,
+    write_frame,
+)
+from delivery_insights.loader.ipc import IPC_SUFFIX, write_ipc, read_ipc
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.backends import get_backend
+from delivery_insights.models.cube import AccidentsCube
+from delivery_insights.utils import profiling
+from delivery_insights.utils.config import get_transform_parser
+from delivery_insights.utils.profiling import profiled
 
 
-def transform_pipeline():
+def transform_pipeline(args=None):
     """
 
+    :param args: parsed get_transform_parser arguments, parsed from command line
+        when None
     :return:
     """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input-folder", help="Input folder", type=str)
-    parser.add_argument("--filename", help="file to transform", type=str)
-    parser.add_argument("--output-folder", help="Output folder", type=str)
-    parser.add_argument("--columns", nargs="*", help="columns to keep", type=str)
-    args = parser.parse_args()
+    if args is None:
+        args = get_transform_parser().parse_args()
     input_folder = args.input_folder
     output_folder = args.output_folder
     columns = args.columns
     filename = args.filename
+    file_format = args.output_format
 
     try:
         if not os.path.exists(output_folder):
             os.mkdir(output_folder)
-        if not os.path.exists(os.path.join(input_folder, filename)):
+        if args.backend:
+            backend = get_backend(
+                args.backend, input_folder, memory_limit=args.memory_limit
+            )
+            if args.workers > 1:
+                for _ in transform_partitions(
+                    backend.iter_merged(),
+                    output_folder,
+                    columns,
+                    args.workers,
+                    file_format=file_format,
+                ):
+                    pass
+                return
+            # transformed chunks are appended to the transformed file
+            for i, data in enumerate(backend.iter_transformed()):
+                transform(
+                    data=data,
+                    output_folder=output_folder,
+                    columns=columns,
+                    append=i > 0,
+                    file_format=file_format,
+                )
+            return
+        if not source_exists(input_folder, filename):
             raise Exception(f"{filename} does not exist.")
-        sample = pd.read_csv(os.path.join(input_folder, filename), nrows=1)
-        wrong_cols = [c for c in columns if c not in list(sample.colums)]
-        if len(wrong_cols) > 0:
-            raise Exception(f"Columns {wrong_cols} are not in dataframe.")
-        data = pd.read_csv(os.path.join(input_folder, filename))
-        transform(data=data, output_folder=output_folder, columns=columns)
+        if args.workers > 1:
+            # partitions are split by Year, read even when it is not kept
+            read_columns = list(dict.fromkeys([*columns, PARTITION_COLUMN]))
+            data = read_source(input_folder, filename, columns=read_columns)
+            for _ in transform_partitions(
+                [data],
+                output_folder,
+                columns,
+                args.workers,
+                file_format=file_format,
+                transform_accidents=False,
+            ):
+                pass
+            return
+        # only requested columns are read, unknown ones raise
+        data = read_source(input_folder, filename, columns=columns)
+        transform(
+            data=data,
+            output_folder=output_folder,
+            columns=columns,
+            file_format=file_format,
+        )
 
     except Exception as e:
         print(f"Error: {e}")
-        sys.exit()
+        sys.exit(1)
 
 
-def transform(data: pd.DataFrame, output_folder: str, columns: list):
+TRANSFORMED_FILE = "transformed_data.csv"
+
+
+@profiled
+def transform(
+    data: pd.DataFrame,
+    output_folder: str,
+    columns: list,
+    append: bool = False,
+    filename: str = TRANSFORMED_FILE,
+    file_format: str = "csv",
+    header: bool = None,
+):
     """
 
     :param data:
     :param output_folder:
     :param columns:
+    :param append: append data to the transformed file, i.e for chunks
+    :param filename: path of the transformed file in output_folder, its suffix
+        being the one of file_format
+    :param file_format: one of formats.FORMATS, described by a schema sidecar
+        file that readers use
+    :param header: write csv header, when the file is not appended by default
     :return:
     """
     new_data = data[columns]
 
     new_data.columns = [c.lower() for c in new_data.columns]
 
-    new_data.to_csv(
-        os.path.join(output_folder, "transformed_data.csv"), index=False, sep=";"
+    path = os.path.join(output_folder, get_format_path(filename, file_format))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    schema = write_frame(
+        new_data, path, file_format=file_format, append=append, header=header
     )
+    update_schema(path, file_format, schema, append=append)
 
     return new_data
+
+
+def transform_partitions(
+    chunks,
+    output_folder: str,
+    columns: list,
+    workers: int,
+    append: bool = False,
+    filename: str = TRANSFORMED_FILE,
+    file_format: str = "csv",
+    transform_accidents: bool = True,
+):
+    """
+    Transform chunks one Year partition per task in a pool of processes
+
+    Partitions are handed to the processes as Arrow IPC files instead of
+    pickled frames. Each process writes the columns of its partitions to a
+    part file. Parts are appended to the transformed file in order of chunks
+    and years while the next chunks are read, at most 2 partitions per process
+    being spilled and not collected, so that the spill folder does not grow
+    with the data.
+
+    :param chunks: iterable of merged data chunks, with a Year column
+    :param output_folder:
+    :param columns:
+    :param workers: number of processes
+    :param append: append parts to the transformed file
+    :param filename: path of the transformed file in output_folder
+    :param file_format: one of formats.FORMATS
+    :param transform_accidents: run Accidents.transform before keeping columns
+    :return: generator of the accidents cube of each partition, None when
+        accidents are not transformed
+    """
+    path = os.path.join(output_folder, get_format_path(filename, file_format))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open_frame(path, file_format, [c.lower() for c in columns], append=append)
+    spill_folder = tempfile.mkdtemp(prefix="transform-", dir=output_folder)
+    try:
+        # spawned rather than forked, other stages of run_dag holding locks
+        # on their threads meanwhile
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=profiling.init_process,
+            initargs=(profiling.get_settings(),),
+        ) as executor:
+            futures = deque()
+            for i, chunk in enumerate(chunks):
+                for year, partition in chunk.groupby(PARTITION_COLUMN):
+                    while len(futures) >= 2 * workers:
+                        yield collect_partition(futures.popleft().result(), path)
+                    partition_path = os.path.join(
+                        spill_folder, f"part-{i:05d}-{year}{IPC_SUFFIX}"
+                    )
+                    write_ipc(partition, partition_path)
+                    futures.append(
+                        executor.submit(
+                            transform_partition,
+                            partition_path,
+                            columns,
+                            file_format,
+                            transform_accidents,
+                        )
+                    )
+                del chunk
+                while len(futures) > 0 and futures[0].done():
+                    yield collect_partition(futures.popleft().result(), path)
+            while len(futures) > 0:
+                yield collect_partition(futures.popleft().result(), path)
+    finally:
+        shutil.rmtree(spill_folder, ignore_errors=True)
+
+
+def transform_partition(
+    partition_path: str,
+    columns: list,
+    file_format: str = "csv",
+    transform_accidents: bool = True,
+) -> tuple:
+    """
+    Transform a partition written as Arrow IPC, in a pool process
+
+    :param partition_path:
+    :param columns:
+    :param file_format: format of the part file
+    :param transform_accidents: run Accidents.transform before keeping columns
+    :return: part file, its schema and accidents cube of the partition
+    """
+    data = read_ipc(partition_path)
+    os.remove(partition_path)
+    cube = None
+    if transform_accidents:
+        data = Accidents.transform(data)
+        cube = AccidentsCube.from_data(data)
+
+    folder, name = os.path.split(partition_path[: -len(IPC_SUFFIX)])
+    # parts are appended to a file having its csv header already
+    transform(
+        data=data,
+        output_folder=folder,
+        columns=columns,
+        filename=name,
+        file_format=file_format,
+        header=False,
+    )
+    part_path = os.path.join(folder, get_format_path(name, file_format))
+    return part_path, read_schema(part_path), cube
+
+
+def collect_partition(result: tuple, path: str) -> AccidentsCube:
+    """
+    Append the part file of a transformed partition to the transformed file
+
+    :param result: transform_partition result
+    :param path: transformed file
+    :return: accidents cube of the partition, None when accidents are not
+        transformed
+    """
+    part_path, schema, cube = result
+    append_part(part_path, path, schema["format"])
+    update_schema(path, schema["format"], schema, append=True)
+    # the part being appended, only its schema is left
+    remove_frame(part_path)
+    return cube
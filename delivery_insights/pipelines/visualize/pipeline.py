@@ -1,60 +1,169 @@
 import pandas as pd
-import argparse
 import os
 import sys
+from delivery_insights.loader.archive import source_exists
+from delivery_insights.loader.cache import read_source
+from delivery_insights.loader.formats import has_schema, iter_frame, read_schema
 from delivery_insights.models.accidents import Accidents
-from delivery_insights.analysis.charts import Chart
+from delivery_insights.models.backends import get_backend
+from delivery_insights.models.cube import CUBE_FOLDER, DIMENSIONS, AccidentsCube
+from delivery_insights.models.filters import Filter
+from delivery_insights.models.spatial import GridIndex
+from delivery_insights.analysis.scheduler import render_jobs
+from delivery_insights.utils.config import get_visualize_parser
+from delivery_insights.utils.profiling import profiled
 
+# Files of the charts of get_chart_jobs
+CHART_FILENAMES = [
+    "Accidents_severity_share.png",
+    "Accidents_weather_conditions_share.png",
+    "Accidents_per_months.png",
+    "accidents_by_age_and_sex.png",
+    "accidents_per_year.png",
+    "vehicules_age_bands_accidents_by_drivers_age.png",
+    "accidents_by_drivers_age_and_vehicles_age.png",
+    "accidents_per_Hour.png",
+    "accidents_per_daytime.png",
+    "daytime_accidents_by_severity.png",
+    "accidents_per_weekday_and_year.png",
+    "accidents_by_journey_purpose.png",
+    "accidents_by_manoeuver.png",
+    "accidents_by_home_area.png",
+    "fatalities_over_weeks.png",
+]
+# File of the map of get_hotspot_job, drawn when a spatial index is given
+HOTSPOT_FILENAME = "accidents_hotspots.png"
+# File of the map of get_heatmap_job, drawn when raster tiles are given
+HEATMAP_FILENAME = "fatal_and_serious_accidents_heatmap.png"
+# Cells along the longest side of the hotspot map, grid cells being merged
+# above it
+HOTSPOT_MAX_CELLS = 600
 
-def visualize_pipeline():
+
+def visualize_pipeline(args=None):
     """
 
+    :param args: parsed get_visualize_parser arguments, parsed from command line
+        when None
     :return:
     """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input-folder", help="input folder", type=str)
-    parser.add_argument("--filename", help="filename", type=str)
-    parser.add_argument("--output-folder", help="Output folder", type=str)
-    args = parser.parse_args()
+    if args is None:
+        args = get_visualize_parser().parse_args()
     input_folder = args.input_folder
     filename = args.filename
     output_folder = args.output_folder
 
     try:
-        if not os.path.exists(os.path.join(input_folder, filename)):
-            raise Exception(f"{filename} does not exist.")
         if not os.path.exists(output_folder):
             os.mkdir(output_folder)
 
-        data = pd.read_csv(os.path.join(input_folder, filename))
-        visualize(data=data, output_folder=output_folder)
+        if args.cube_folder:
+            cube = AccidentsCube.load(args.cube_folder)
+        elif args.backend:
+            backend = get_backend(
+                args.backend, input_folder, memory_limit=args.memory_limit
+            )
+            cube = backend.count()
+            cube.save(os.path.join(output_folder, CUBE_FOLDER))
+        else:
+            if not source_exists(input_folder, filename):
+                raise Exception(f"{filename} does not exist.")
+            path = os.path.join(input_folder, filename)
+            if has_schema(path):
+                cube = count_frame(path)
+            else:
+                cube = AccidentsCube.from_data(read_source(input_folder, filename))
+            cube.save(os.path.join(output_folder, CUBE_FOLDER))
+        grid = GridIndex.load(args.grid_folder) if args.grid_folder else None
+        visualize(
+            data=cube,
+            output_folder=output_folder,
+            workers=args.workers,
+            grid=grid,
+            raster_folder=args.raster_folder,
+        )
 
     except Exception as e:
         print(f"Error: {e}")
-        sys.exit()
+        sys.exit(1)
+
+
+@profiled
+def count_frame(path: str) -> AccidentsCube:
+    """
+    Count accidents of a file written by the pipelines a batch at a time,
+    only the columns of the cube dimensions being read
+
+    :param path:
+    :return:
+    """
+    # transformed files have lowercase columns
+    names = {column.lower(): column for column in read_schema(path)["columns"]}
+    missing = [column for column in DIMENSIONS if column.lower() not in names]
+    if len(missing) > 0:
+        raise Exception(f"Columns {missing} are not in {os.path.basename(path)}.")
+
+    columns = [names[column.lower()] for column in DIMENSIONS]
+    return AccidentsCube.concat(
+        AccidentsCube.from_data(data.set_axis(DIMENSIONS, axis=1))
+        for data in iter_frame(path, columns=columns)
+    )
 
 
-def visualize(data: pd.DataFrame, output_folder: str):
+@profiled
+def visualize(
+    data,
+    output_folder: str,
+    workers: int = 1,
+    grid: GridIndex = None,
+    raster_folder: str = None,
+):
     """
 
-    :param data:
+    :param data: transformed accidents DataFrame or its AccidentsCube
     :param output_folder:
+    :param workers: number of chart rendering processes
+    :param grid: spatial index of accidents to draw the hotspot map from
+    :param raster_folder: folder of raster tiles to draw the heatmap of fatal
+        and serious accidents from
     :return:
     """
+    cube = data if isinstance(data, AccidentsCube) else AccidentsCube.from_data(data)
+    jobs = get_chart_jobs(cube=cube)
+    if grid is not None:
+        jobs.append(get_hotspot_job(grid))
+    if raster_folder is not None:
+        jobs.append(get_heatmap_job(raster_folder))
+    render_jobs(jobs=jobs, output_folder=output_folder, workers=workers)
+
+
+def get_chart_jobs(cube: AccidentsCube) -> list:
+    """
+    Aggregate data of each chart by marginalizing the accidents cube
+
+    :param cube:
+    :return: list of (Chart method name, method kwargs)
+    """
     accidents = Accidents()
-    chart = Chart(output_folder=output_folder)
+    jobs = []
+
     # draw accidents values by severity
     (
         list_accidents_values_by_severity,
         severity_order_list,
     ) = accidents.get_list_accidents_values_by_column(
-        data=data, column="Accident_Severity"
+        data=cube, column="Accident_Severity"
     )
-    chart.pie_share_chart(
-        data_list=list_accidents_values_by_severity,
-        names_list=[f"{val} Accidents" for val in severity_order_list],
-        chart_title="Accident Severity: Share in % (2005-2017)",
-        filename="Accidents_severity_share.png",
+    jobs.append(
+        (
+            "pie_share_chart",
+            dict(
+                data_list=list_accidents_values_by_severity,
+                names_list=[f"{val} Accidents" for val in severity_order_list],
+                chart_title="Accident Severity: Share in % (2005-2017)",
+                filename="Accidents_severity_share.png",
+            ),
+        )
     )
 
     # draw accidents values by weather conditions
@@ -62,31 +171,42 @@ def visualize(data: pd.DataFrame, output_folder: str):
         list_accidents_values_by_weather,
         weather_order_list,
     ) = accidents.get_list_accidents_values_by_column(
-        data=data,
+        data=cube,
         column="Weather_Conditions",
         filter_conditions=["Unknown", "Data missing or out of range"],
     )
-    chart.pie_share_chart(
-        data_list=list_accidents_values_by_weather,
-        names_list=[f"{val} weather" for val in weather_order_list],
-        chart_title="Accidents weather conditions: Share in % (2005-2017)",
-        filename="Accidents_weather_conditions_share.png",
+    jobs.append(
+        (
+            "pie_share_chart",
+            dict(
+                data_list=list_accidents_values_by_weather,
+                names_list=[f"{val} weather" for val in weather_order_list],
+                chart_title="Accidents weather conditions: Share in % (2005-2017)",
+                filename="Accidents_weather_conditions_share.png",
+            ),
+        )
     )
 
     # draw total count per date line chart
-    chart.total_count_per_date_line_chart(
-        data=data,
-        index_date_column="Accident_date",
-        title="Accidents per Month",
-        line_legend_title="Total per Month",
-        xlabel_title="Date per Month",
-        filename="Accidents_per_months.png",
-        rule="M",
+    monthly_count = accidents.get_accidents_per_period(
+        data=cube, date_column="Accident_date", rule="M"
+    )
+    jobs.append(
+        (
+            "count_line_chart",
+            dict(
+                data=monthly_count,
+                title="Accidents per Month",
+                line_legend_title="Total per Month",
+                xlabel_title="Date per Month",
+                filename="Accidents_per_months.png",
+            ),
+        )
     )
 
     # draw accidents by age and sex
     accidents_by_age_and_sex = accidents.get_accidents_counts_using_two_columns(
-        data=data,
+        data=cube,
         cols=["Age_Band_of_Driver", "Sex_of_Driver"],
         filter_conditions={
             "Age_Band_of_Driver": ["Data missing or out of range"],
@@ -95,52 +215,67 @@ def visualize(data: pd.DataFrame, output_folder: str):
         new_cols_name=["Age_Band_of_Driver", "Sex_of_Driver", "Total"],
     )
 
-    chart.grouped_bar_char(
-        data=accidents_by_age_and_sex,
-        yaxis_variable="Age_Band_of_Driver",
-        xaxis_variable="Total",
-        hue_variable="Sex_of_Driver",
-        chart_title="Accidents by drivers age and sex",
-        xlabel="Total",
-        ylabel="Age Band of Driver",
-        filename="accidents_by_age_and_sex.png",
-        data_labels_params={"fmt": ".0f", "round_number": 0},
+    jobs.append(
+        (
+            "grouped_bar_char",
+            dict(
+                data=accidents_by_age_and_sex,
+                yaxis_variable="Age_Band_of_Driver",
+                xaxis_variable="Total",
+                hue_variable="Sex_of_Driver",
+                chart_title="Accidents by drivers age and sex",
+                xlabel="Total",
+                ylabel="Age Band of Driver",
+                filename="accidents_by_age_and_sex.png",
+                data_labels_params={"fmt": ".0f", "round_number": 0},
+            ),
+        )
     )
 
     # draw accidents per year
-    yearly_count = accidents.get_accidents_per_year(data)
-    chart.bar_chart(
-        data=yearly_count,
-        graph_title="Accidents per Year",
-        ylabel="Total values",
-        filename="accidents_per_year.png",
+    yearly_count = accidents.get_accidents_per_year(cube)
+    jobs.append(
+        (
+            "bar_chart",
+            dict(
+                data=yearly_count,
+                graph_title="Accidents per Year",
+                ylabel="Total values",
+                filename="accidents_per_year.png",
+            ),
+        )
     )
 
     # draw vehicules age band accidents by drivers age
     vehicule_age = [">=15", "10-14", "5-9", "0-4"]
 
     accidents_share = accidents.get_accidents_share_count(
-        data=data,
+        data=cube,
         cols=["Age_band_of_vehicule", "Age_Band_of_Driver"],
         filter_conditions={
             "Age_band_of_vehicule": ["Data missing"],
             "Age_Band_of_Driver": ["Data missing or out of range"],
         },
     )
-    chart.stacked_bar_chart(
-        data=accidents_share,
-        yaxis_values=vehicule_age,
-        chart_title="Vehicule's age bands accidents by Driver's age",
-        xlabel="Percentage",
-        ylabel="Vehicule's age bands",
-        legend_title="Driver's age bands",
-        filename="vehicules_age_bands_accidents_by_drivers_age.png",
+    jobs.append(
+        (
+            "stacked_bar_chart",
+            dict(
+                data=accidents_share,
+                yaxis_values=vehicule_age,
+                chart_title="Vehicule's age bands accidents by Driver's age",
+                xlabel="Percentage",
+                ylabel="Vehicule's age bands",
+                legend_title="Driver's age bands",
+                filename="vehicules_age_bands_accidents_by_drivers_age.png",
+            ),
+        )
     )
 
     # draw accidents by drivers age and vehicle age
     accidents_by_drivers_age_and_vehicules_age = (
         accidents.get_accidents_counts_using_two_columns(
-            data=data,
+            data=cube,
             cols=["Age_Band_of_Driver", "Age_band_of_vehicule"],
             filter_conditions={
                 "Age_Band_of_Driver": ["Data missing or out of range"],
@@ -154,20 +289,25 @@ def visualize(data: pd.DataFrame, output_folder: str):
         / accidents_by_drivers_age_and_vehicules_age["Count"].sum()
     )
 
-    chart.grouped_bar_char(
-        data=accidents_by_drivers_age_and_vehicules_age,
-        yaxis_variable="Age_Band_of_Driver",
-        xaxis_variable="Percentage",
-        hue_variable="Age_band_of_vehicule",
-        chart_title="Accidents by driver's age and vehicle's age",
-        xlabel="Percentage",
-        ylabel="Age Band of Driver",
-        filename="accidents_by_drivers_age_and_vehicles_age.png",
-        data_labels_params={
-            "fmt": "0.3f",
-            "round_number": 3,
-            "is_percentage": True,
-        },
+    jobs.append(
+        (
+            "grouped_bar_char",
+            dict(
+                data=accidents_by_drivers_age_and_vehicules_age,
+                yaxis_variable="Age_Band_of_Driver",
+                xaxis_variable="Percentage",
+                hue_variable="Age_band_of_vehicule",
+                chart_title="Accidents by driver's age and vehicle's age",
+                xlabel="Percentage",
+                ylabel="Age Band of Driver",
+                filename="accidents_by_drivers_age_and_vehicles_age.png",
+                data_labels_params={
+                    "fmt": "0.3f",
+                    "round_number": 3,
+                    "is_percentage": True,
+                },
+            ),
+        )
     )
 
     # draw accidents per weekday and year
@@ -181,41 +321,64 @@ def visualize(data: pd.DataFrame, output_folder: str):
         "Monday",
     ]
     accidents_per_weekday_and_year = accidents.get_accidents_per_weekday_and_year(
-        data=data, days=days
+        data=cube, days=days
     )
-    chart.heatmap_chart(
-        data=accidents_per_weekday_and_year,
-        graph_title="Accidents by weekdays and years",
-        filename="accidents_per_weekday_and_year.png",
+    jobs.append(
+        (
+            "heatmap_chart",
+            dict(
+                data=accidents_per_weekday_and_year,
+                graph_title="Accidents by weekdays and years",
+                filename="accidents_per_weekday_and_year.png",
+            ),
+        )
     )
 
     # draw fatalities over weeks
-    fatalities = data[data["Accident_Severity"] == "Fatal"]
-    chart.total_count_per_date_line_chart(
-        data=fatalities,
-        index_date_column="Accident_date",
-        title="Fatalities",
-        line_legend_title="Total fatalities per week",
-        filename="fatalities_over_weeks.png",
+    weekly_fatalities = accidents.get_accidents_per_period(
+        data=cube,
+        date_column="Accident_date",
         rule="W",
+        row_filter=Filter().keep("Accident_Severity", ["Fatal"]),
+    )
+    jobs.append(
+        (
+            "count_line_chart",
+            dict(
+                data=weekly_fatalities,
+                title="Fatalities",
+                line_legend_title="Total fatalities per week",
+                filename="fatalities_over_weeks.png",
+            ),
+        )
     )
 
     # draw accidents by hours
-    hourly_count = accidents.get_accidents_per_hour(data)
-    chart.bar_chart(
-        data=hourly_count,
-        graph_title="Accidents per Hour",
-        ylabel="Total values",
-        filename="accidents_per_Hour.png",
+    hourly_count = accidents.get_accidents_per_hour(cube)
+    jobs.append(
+        (
+            "bar_chart",
+            dict(
+                data=hourly_count,
+                graph_title="Accidents per Hour",
+                ylabel="Total values",
+                filename="accidents_per_Hour.png",
+            ),
+        )
     )
 
     # draw accidents by daytime
-    daytime_count = accidents.get_accidents_per_daytime(data)
-    chart.bar_chart(
-        data=daytime_count,
-        graph_title="Accidents per daytime",
-        ylabel="Total values",
-        filename="accidents_per_daytime.png",
+    daytime_count = accidents.get_accidents_per_daytime(cube)
+    jobs.append(
+        (
+            "bar_chart",
+            dict(
+                data=daytime_count,
+                graph_title="Accidents per daytime",
+                ylabel="Total values",
+                filename="accidents_per_daytime.png",
+            ),
+        )
     )
 
     # draw severity by daytime
@@ -228,16 +391,21 @@ def visualize(data: pd.DataFrame, output_folder: str):
     ]
 
     severity_daytime_share = accidents.get_accidents_share_count(
-        data=data, cols=["Daytime", "Accident_Severity"]
+        data=cube, cols=["Daytime", "Accident_Severity"]
     )
-    chart.stacked_bar_chart(
-        data=severity_daytime_share,
-        yaxis_values=daytime,
-        chart_title="Daytime accidents by severity",
-        xlabel="Percentage",
-        ylabel="Vehicule's age bands",
-        legend_title="Driver's age bands",
-        filename="daytime_accidents_by_severity.png",
+    jobs.append(
+        (
+            "stacked_bar_chart",
+            dict(
+                data=severity_daytime_share,
+                yaxis_values=daytime,
+                chart_title="Daytime accidents by severity",
+                xlabel="Percentage",
+                ylabel="Vehicule's age bands",
+                legend_title="Driver's age bands",
+                filename="daytime_accidents_by_severity.png",
+            ),
+        )
     )
 
     # draw accidents by home area
@@ -245,12 +413,17 @@ def visualize(data: pd.DataFrame, output_folder: str):
         accidents_by_home_area,
         accidents_by_home_area_labels,
         accidents_by_home_area_sizes,
-    ) = accidents.get_accidents_count_by_column(data=data, column="Driver_Home_Area_Type")
-    chart.treemap_chart(
-        labels=accidents_by_home_area_labels,
-        sizes=accidents_by_home_area_sizes,
-        filename="accidents_by_home_area.png",
-        title="Treemap of accidents by drivers home area",
+    ) = accidents.get_accidents_count_by_column(data=cube, column="Driver_Home_Area_Type")
+    jobs.append(
+        (
+            "treemap_chart",
+            dict(
+                labels=accidents_by_home_area_labels,
+                sizes=accidents_by_home_area_sizes,
+                filename="accidents_by_home_area.png",
+                title="Treemap of accidents by drivers home area",
+            ),
+        )
     )
 
     # draw accidents by journey purpose
@@ -259,13 +432,18 @@ def visualize(data: pd.DataFrame, output_folder: str):
         accidents_by_journey_purpose_labels,
         accidents_by_journey_purpose_sizes,
     ) = accidents.get_accidents_count_by_column(
-        data=data, column="Journey_Purpose_of_Driver", min_value=30000
+        data=cube, column="Journey_Purpose_of_Driver", min_value=30000
     )
-    chart.treemap_chart(
-        labels=accidents_by_journey_purpose_labels,
-        sizes=accidents_by_journey_purpose_sizes,
-        filename="accidents_by_journey_purpose.png",
-        title="Treemap of accidents by journey purpose of driver",
+    jobs.append(
+        (
+            "treemap_chart",
+            dict(
+                labels=accidents_by_journey_purpose_labels,
+                sizes=accidents_by_journey_purpose_sizes,
+                filename="accidents_by_journey_purpose.png",
+                title="Treemap of accidents by journey purpose of driver",
+            ),
+        )
     )
 
     # draw accidents by manoeuver
@@ -274,11 +452,66 @@ def visualize(data: pd.DataFrame, output_folder: str):
         accidents_by_manoeuver_labels,
         accidents_by_manoeuver_sizes,
     ) = accidents.get_accidents_count_by_column(
-        data=data, column="Vehicle_Manoeuvre", min_value=80000
+        data=cube, column="Vehicle_Manoeuvre", min_value=80000
     )
-    chart.treemap_chart(
-        labels=accidents_by_manoeuver_labels,
-        sizes=accidents_by_manoeuver_sizes,
-        filename="accidents_by_manoeuver.png",
-        title="Treemap of accidents by vehicule manoeuver",
+    jobs.append(
+        (
+            "treemap_chart",
+            dict(
+                labels=accidents_by_manoeuver_labels,
+                sizes=accidents_by_manoeuver_sizes,
+                filename="accidents_by_manoeuver.png",
+                title="Treemap of accidents by vehicule manoeuver",
+            ),
+        )
+    )
+
+    return jobs
+
+
+def get_hotspot_job(grid: GridIndex) -> tuple:
+    """
+    Get the hotspot map of the cell counts of a spatial index, cells being
+    merged so that the map has at most HOTSPOT_MAX_CELLS along each side
+
+    :param grid:
+    :return: (Chart method name, method kwargs)
+    """
+    factor = -(-max(grid.shape) // HOTSPOT_MAX_CELLS)
+    counts = grid.get_counts_grid(factor=factor)
+    west, _, south, _ = grid.get_extent()
+    size = grid.cell_size * factor
+    return (
+        "hotspot_map",
+        dict(
+            counts=counts,
+            extent=[
+                west,
+                west + counts.shape[1] * size,
+                south,
+                south + counts.shape[0] * size,
+            ],
+            chart_title="Accident hotspots (2005-2017)",
+            filename=HOTSPOT_FILENAME,
+        ),
+    )
+
+
+def get_heatmap_job(raster_folder: str) -> tuple:
+    """
+    Get the heatmap of fatal and serious accidents, read from raster tiles by
+    the rendering process
+
+    :param raster_folder:
+    :return: (Chart method name, method kwargs)
+    """
+    return (
+        "tile_heatmap",
+        dict(
+            folder=raster_folder,
+            chart_title="Fatal and serious accidents (2005-2017)",
+            filename=HEATMAP_FILENAME,
+            max_cells=HOTSPOT_MAX_CELLS,
+            severities=["Fatal", "Serious"],
+        ),
     )
@@ -0,0 +1,34 @@
+import os
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from delivery_insights.analysis.scheduler import render_jobs
+
+
+def test_render_jobs(tmp_path):
+    """
+    Test jobs rendered in processes are saved like in process and leave no
+    figure open
+
+    :return:
+    """
+    jobs = [
+        (
+            "bar_chart",
+            dict(
+                data=pd.Series([3, 5, 1], index=["a", "b", "c"]),
+                graph_title="Bars",
+                ylabel="Total values",
+                filename=f"bar_{i}.png",
+            ),
+        )
+        for i in range(3)
+    ]
+
+    paths = render_jobs(jobs, output_folder=str(tmp_path), workers=2)
+    assert paths == [os.path.join(str(tmp_path), f"bar_{i}.png") for i in range(3)]
+    assert all(os.path.getsize(path) > 0 for path in paths)
+
+    render_jobs(jobs[:1], output_folder=str(tmp_path), workers=1)
+    assert plt.get_fignums() == []
@@ -0,0 +1,139 @@
+import os
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import pandas as pd
+import pyarrow as pa
+from pandas.testing import assert_frame_equal
+
+from delivery_insights.loader.archive import (
+    get_member_name,
+    get_source_path,
+    iter_record_batches,
+    split_archive,
+)
+from delivery_insights.loader.cache import is_cached, read_source, stage_file
+from delivery_insights.loader.schema import read_csv
+
+ACCIDENTS = "Accident_Information.csv"
+
+
+def write_accidents(folder) -> pd.DataFrame:
+    """
+    Write a small Accident_Information file and its zip archive, then remove
+    the csv file
+
+    :param folder:
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Accident_Index": ["A1", "A2", "A3"],
+            "Year": [2005, 2006, 2006],
+            "Date": ["2005-01-04", "2006-03-01", "2006-05-10"],
+            "Time": ["17:42", None, "08:00"],
+            "Day_of_Week": ["Tuesday", "Wednesday", "Wednesday"],
+            "Accident_Severity": ["Slight", "Fatal", "Serious"],
+            "Weather_Conditions": ["Fine no high winds"] * 3,
+            "Latitude": [51.5, 53.48, 55.95],
+            "Longitude": [-0.12, -2.24, -3.19],
+            "Local_Authority_(District)": [
+                "Westminster",
+                "Manchester",
+                "Edinburgh, City of",
+            ],
+            "Local_Authority_(Highway)": [
+                "Westminster",
+                "Manchester",
+                "Edinburgh, City of",
+            ],
+            "LSOA_of_Accident_Location": ["E01004736", "E01005131", None],
+        }
+    )
+    path = os.path.join(folder, ACCIDENTS)
+    data.to_csv(path, index=False)
+    with ZipFile(f"{path}.zip", "w", compression=ZIP_DEFLATED) as zf:
+        zf.write(path, ACCIDENTS)
+    return data
+
+
+def test_split_archive():
+    """
+    Test sources are split into archive and member
+
+    :return:
+    """
+    member = os.path.join("data", "all.zip", ACCIDENTS)
+
+    assert split_archive(os.path.join("data", ACCIDENTS)) == (None, None)
+    assert split_archive(os.path.join("data", f"{ACCIDENTS}.zip")) == (
+        os.path.join("data", f"{ACCIDENTS}.zip"),
+        None,
+    )
+    assert split_archive(member) == (os.path.join("data", "all.zip"), ACCIDENTS)
+    assert get_member_name(f"{ACCIDENTS}.zip") == ACCIDENTS
+    assert get_member_name(member) == ACCIDENTS
+
+
+def test_read_csv_archive(tmp_path):
+    """
+    Test csv files read out of zip archives like extracted ones
+
+    :return:
+    """
+    write_accidents(tmp_path)
+    expected = read_csv(os.path.join(tmp_path, ACCIDENTS))
+    os.remove(os.path.join(tmp_path, ACCIDENTS))
+
+    path = get_source_path(str(tmp_path), ACCIDENTS)
+    assert path.endswith(".zip")
+    assert_frame_equal(expected, read_csv(path))
+    chunks = list(read_csv(path, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+
+    # a member of an archive holding several files
+    with ZipFile(os.path.join(tmp_path, "all.zip"), "w") as zf:
+        zf.write(path, "other.zip")
+        zf.writestr(ACCIDENTS, expected.to_csv(index=False))
+    assert_frame_equal(expected, read_csv(os.path.join(tmp_path, "all.zip", ACCIDENTS)))
+
+
+def test_iter_record_batches(tmp_path):
+    """
+    Test zip members read as arrow record batches
+
+    :return:
+    """
+    data = write_accidents(tmp_path)
+
+    batches = list(
+        iter_record_batches(
+            os.path.join(tmp_path, f"{ACCIDENTS}.zip"),
+            columns=["Accident_Index", "Year"],
+            block_size=300,
+        )
+    )
+
+    table = pa.Table.from_batches(batches)
+    assert len(batches) > 1
+    assert table.column_names == ["Accident_Index", "Year"]
+    assert table.column("Accident_Index").to_pylist() == data["Accident_Index"].tolist()
+
+
+def test_stage_file_archive(tmp_path):
+    """
+    Test staging a zip archive gives the cache of its csv file
+
+    :return:
+    """
+    write_accidents(tmp_path)
+    expected = read_source(str(tmp_path), ACCIDENTS)
+    os.remove(os.path.join(tmp_path, ACCIDENTS))
+
+    stage_file(str(tmp_path), ACCIDENTS)
+
+    assert is_cached(str(tmp_path), ACCIDENTS)
+    result = read_source(str(tmp_path), ACCIDENTS)
+    assert_frame_equal(
+        expected,
+        result[expected.columns].sort_values("Accident_Index").reset_index(drop=True),
+    )
@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from delivery_insights.loader.cache import (
+    add_fingerprint,
+    is_cached,
+    read_source,
+    stage_file,
+)
+
+
+def write_accidents(folder, years):
+    """
+    Write a small Accident_Information.csv file
+
+    :param folder:
+    :param years:
+    :return:
+    """
+    pd.DataFrame(
+        {
+            "Accident_Index": [f"A{i}" for i in range(len(years))],
+            "Year": years,
+            "Date": [f"{y}-01-04" for y in years],
+            "Time": ["17:42"] * len(years),
+            "Day_of_Week": ["Tuesday"] * len(years),
+            "Accident_Severity": ["Slight", "Fatal", "Serious"][: len(years)],
+            "Weather_Conditions": ["Fine no high winds"] * len(years),
+            "Latitude": [51.5] * len(years),
+            "Longitude": [-0.12] * len(years),
+            "Local_Authority_(District)": ["Westminster"] * len(years),
+            "Local_Authority_(Highway)": ["Westminster"] * len(years),
+            "LSOA_of_Accident_Location": ["E01004736"] * len(years),
+            "Speed_limit": [30] * len(years),
+        }
+    ).to_csv(os.path.join(folder, "Accident_Information.csv"), index=False)
+
+
+def test_stage_file(tmp_path):
+    """
+    Test staged partitions read like the csv file
+
+    :return:
+    """
+    write_accidents(tmp_path, [2005, 2006, 2006])
+    expected = read_source(str(tmp_path), "Accident_Information.csv")
+
+    stage_file(str(tmp_path), "Accident_Information.csv", chunksize=2)
+
+    assert is_cached(str(tmp_path), "Accident_Information.csv")
+    result = read_source(str(tmp_path), "Accident_Information.csv")
+    assert_frame_equal(
+        expected,
+        result[expected.columns].sort_values("Accident_Index").reset_index(drop=True),
+    )
+    result = read_source(
+        str(tmp_path), "Accident_Information.csv", columns=["Year"], years=[2006]
+    )
+    assert result["Year"].tolist() == [2006, 2006]
+
+
+def test_is_cached(tmp_path):
+    """
+    Test cache invalidation when csv content changes
+
+    :return:
+    """
+    write_accidents(tmp_path, [2005, 2006])
+    stage_file(str(tmp_path), "Accident_Information.csv")
+
+    assert not is_cached(str(tmp_path), "Accident_Information.csv", ["Speed_limit"])
+
+    write_accidents(tmp_path, [2005, 2007])
+    assert not is_cached(str(tmp_path), "Accident_Information.csv")
+
+
+def test_add_fingerprint(tmp_path):
+    """
+    Test fingerprints do not depend on the order and chunking of rows
+
+    :return:
+    """
+    write_accidents(tmp_path, [2005, 2006, 2006])
+    data = read_source(str(tmp_path), "Accident_Information.csv")
+
+    fingerprint = add_fingerprint(None, data)
+    chunked = add_fingerprint(add_fingerprint(None, data.iloc[2:]), data.iloc[:2])
+
+    assert fingerprint == chunked
+    assert fingerprint[0] == 3
+    changed = data.assign(Latitude=[51.5, 51.5, 52.0])
+    assert add_fingerprint(None, changed) != fingerprint
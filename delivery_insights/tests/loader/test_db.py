@@ -0,0 +1,91 @@
+import struct
+
+import pandas as pd
+import pytest
+
+from delivery_insights.loader.db import (
+    BINARY_HEADER,
+    BINARY_TRAILER,
+    Database,
+    encode_binary_copy,
+)
+from delivery_insights.pipelines.load.pipeline import load
+
+
+def test_encode_binary_copy():
+    """
+    Test binary COPY encoding of numbers, texts, categoricals, dates and nulls
+    """
+    df = pd.DataFrame(
+        {
+            "accident_index": ["a1", "a2"],
+            "year": pd.Series([2005, None], dtype="Int16"),
+            "accident_severity": pd.Categorical(["Slight", None]),
+            "accident_date": pd.to_datetime(["2000-01-02", "1999-12-31"]),
+        }
+    )
+
+    encoded = encode_binary_copy(df, ["text", "integer", "text", "date"])
+
+    row = struct.pack("!h", 4)
+    expected = (
+        BINARY_HEADER
+        + row
+        + struct.pack("!i", 2)
+        + b"a1"
+        + struct.pack("!ii", 4, 2005)
+        + struct.pack("!i", 6)
+        + b"Slight"
+        + struct.pack("!ii", 4, 1)
+        + row
+        + struct.pack("!i", 2)
+        + b"a2"
+        + struct.pack("!i", -1)
+        + struct.pack("!i", -1)
+        + struct.pack("!ii", 4, -1)
+        + BINARY_TRAILER
+    )
+    assert encoded == expected
+
+
+def test_database_stats(tmp_path):
+    """
+    Test ini file is parsed once and stats before any connection
+    """
+    config_file = tmp_path / "database.ini"
+    config_file.write_text("[postgresql]\nhost=localhost\ndatabase=postgres\n")
+
+    with Database(str(config_file), maxconn=2) as db:
+        assert db.credentials == {"host": "localhost", "database": "postgres"}
+        config_file.write_text("")
+        assert db.credentials == {"host": "localhost", "database": "postgres"}
+        db._record(0.5)
+        db._record(1.5)
+        stats = db.get_stats()
+
+    assert stats["statements"] == 2
+    assert stats["mean_statement_ms"] == 1000.0
+    assert stats["maxconn"] == 2
+    assert stats["open_connections"] == 0
+
+
+def test_write_errors_raise(tmp_path):
+    """
+    Test writes to an unreachable database raise instead of being reported
+    as done, so that callers do not record them
+    """
+    config_file = tmp_path / "database.ini"
+    config_file.write_text(
+        f"[postgresql]\nhost={tmp_path / 'missing'}\ndatabase=postgres\n"
+    )
+    df = pd.DataFrame({"accident_index": ["a1"], "year": [2005]})
+
+    with Database(str(config_file)) as db:
+        with pytest.raises(Exception):
+            db.execute_query("DELETE FROM accidents WHERE year = 2005")
+        with pytest.raises(Exception):
+            db.insert_df_into_table(df, "accidents")
+        with pytest.raises(Exception):
+            db.upsert_df_into_table(df, "accidents", keys=["accident_index"])
+    with pytest.raises(Exception):
+        load(df, str(config_file), upsert=True)
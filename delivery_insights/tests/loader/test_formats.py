@@ -0,0 +1,189 @@
+import gzip
+import os
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from delivery_insights.loader import formats
+from delivery_insights.loader.cache import read_source
+from delivery_insights.loader.formats import (
+    FORMATS,
+    append_part,
+    get_format_path,
+    iter_frame,
+    open_frame,
+    read_frame,
+    read_schema,
+    update_schema,
+    write_frame,
+)
+from delivery_insights.loader.schema import concat_frames
+
+
+def get_chunks() -> list:
+    """
+    Create transformed data chunks with differing categories and missing
+    values
+
+    :return:
+    """
+    return [
+        pd.DataFrame(
+            {
+                "accident_index": ["A1", "A2", "A3"],
+                "year": pd.Series([2005, 2005, 2006], dtype="int16"),
+                "age_of_vehicle": pd.Series([3, None, 12], dtype="Int16"),
+                "accident_date": pd.to_datetime(
+                    ["2005-01-04", "2005-03-01", "2006-05-10"]
+                ),
+                "daytime": pd.Categorical(
+                    ["evening (19-23)", "night (23-5)", "evening (19-23)"],
+                    categories=["night (23-5)", "evening (19-23)"],
+                ),
+                "accident_severity": pd.Categorical(["Slight", "Fatal", "Slight"]),
+            }
+        ),
+        pd.DataFrame(
+            {
+                "accident_index": ["A4", "A5"],
+                "year": pd.Series([2007, 2007], dtype="int16"),
+                "age_of_vehicle": pd.Series([None, 1], dtype="Int16"),
+                "accident_date": pd.to_datetime(["2007-12-31", "2007-12-31"]),
+                "daytime": pd.Categorical(
+                    ["night (23-5)", "night (23-5)"],
+                    categories=["night (23-5)", "evening (19-23)"],
+                ),
+                "accident_severity": pd.Categorical(["Serious", None]),
+            }
+        ),
+    ]
+
+
+@pytest.mark.parametrize("file_format", list(FORMATS))
+def test_write_and_read_frame(tmp_path, monkeypatch, file_format):
+    """
+    Test appended chunks are read back with their dtypes, whatever the format
+    and the number of written blocks
+
+    :return:
+    """
+    monkeypatch.setattr(formats, "WRITE_ROWS", 2)
+    path = os.path.join(tmp_path, get_format_path("transformed_data", file_format))
+    chunks = get_chunks()
+
+    for i, chunk in enumerate(chunks):
+        schema = write_frame(chunk, path, file_format=file_format, append=i > 0)
+        update_schema(path, file_format, schema, append=i > 0)
+
+    expected = concat_frames(chunks).reset_index(drop=True)
+    assert read_schema(path)["rows"] == 5
+    assert_frame_equal(read_frame(path), expected)
+    assert_frame_equal(
+        read_frame(path, columns=["daytime", "year"]), expected[["daytime", "year"]]
+    )
+    assert list(read_frame(path)["daytime"].cat.categories) == [
+        "night (23-5)",
+        "evening (19-23)",
+    ]
+
+
+@pytest.mark.parametrize("file_format", list(FORMATS))
+def test_append_part(tmp_path, file_format):
+    """
+    Test parts written without header are appended to an opened file
+
+    :return:
+    """
+    path = os.path.join(tmp_path, get_format_path("transformed_data", file_format))
+    chunks = get_chunks()
+
+    open_frame(path, file_format, list(chunks[0].columns))
+    for i, chunk in enumerate(chunks):
+        part_path = os.path.join(tmp_path, get_format_path(f"part-{i}", file_format))
+        schema = write_frame(chunk, part_path, file_format=file_format, header=False)
+        append_part(part_path, path, file_format)
+        update_schema(path, file_format, schema, append=True)
+
+    assert_frame_equal(read_frame(path), concat_frames(chunks).reset_index(drop=True))
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(path), f"{os.path.basename(path)}.schema.json"]
+    )
+
+
+def test_write_frame_gzip_members(tmp_path, monkeypatch):
+    """
+    Test compressed csv blocks are gzip members of a readable file
+
+    :return:
+    """
+    monkeypatch.setattr(formats, "WRITE_ROWS", 1)
+    path = os.path.join(tmp_path, "data.csv.gz")
+
+    write_frame(get_chunks()[0], path, file_format="csv.gz", workers=2)
+
+    with gzip.open(path, "rt") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == (
+        "accident_index;year;age_of_vehicle;accident_date;daytime;accident_severity"
+    )
+    assert lines[1:] == [
+        "A1;2005;3;2005-01-04;evening (19-23);Slight",
+        "A2;2005;;2005-03-01;night (23-5);Fatal",
+        "A3;2006;12;2006-05-10;evening (19-23);Slight",
+    ]
+
+
+def test_read_source_schema(tmp_path):
+    """
+    Test read_source reads files with a schema sidecar with their separator
+    and dtypes
+
+    :return:
+    """
+    chunk = get_chunks()[0]
+    path = os.path.join(tmp_path, "transformed_data.csv")
+    update_schema(path, "csv", write_frame(chunk, path))
+
+    assert_frame_equal(read_source(str(tmp_path), "transformed_data.csv"), chunk)
+    assert_frame_equal(
+        read_source(str(tmp_path), "transformed_data.csv", years=[2006]),
+        chunk[chunk["year"] == 2006],
+    )
+
+
+def test_get_format_path():
+    """
+    Test format suffixes replace each other
+
+    :return:
+    """
+    assert get_format_path("transformed_data.csv", "parquet") == (
+        "transformed_data.parquet"
+    )
+    assert get_format_path("Year=2005.csv.gz", "csv") == "Year=2005.csv"
+    assert get_format_path("data", "feather") == "data.feather"
+    with pytest.raises(Exception, match="is not one of"):
+        get_format_path("data", "xlsx")
+
+
+@pytest.mark.parametrize("file_format", list(FORMATS))
+def test_iter_frame(tmp_path, monkeypatch, file_format):
+    """
+    Test batches of a file are the rows read by read_frame
+
+    :return:
+    """
+    monkeypatch.setattr(formats, "WRITE_ROWS", 3)
+    path = os.path.join(tmp_path, get_format_path("transformed_data", file_format))
+    for i, chunk in enumerate(get_chunks()):
+        schema = write_frame(chunk, path, file_format=file_format, append=i > 0)
+        update_schema(path, file_format, schema, append=i > 0)
+
+    batches = list(iter_frame(path, columns=["daytime", "year"], batch_rows=2))
+
+    assert max(len(batch) for batch in batches) == 2
+    assert_frame_equal(
+        concat_frames(batches).reset_index(drop=True),
+        read_frame(path, columns=["daytime", "year"]),
+    )
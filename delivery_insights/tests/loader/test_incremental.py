@@ -0,0 +1,33 @@
+from delivery_insights.loader.incremental import (
+    get_changed_years,
+    read_run_manifest,
+    write_run_manifest,
+)
+
+
+def test_run_manifest(tmp_path):
+    """
+    Test year fingerprints are read back as written
+
+    :return:
+    """
+    assert read_run_manifest(str(tmp_path)) == {}
+
+    fingerprints = {2005: "2-00ff/3-0a0b", 2006: "1-0001/"}
+    write_run_manifest(str(tmp_path), fingerprints)
+
+    assert read_run_manifest(str(tmp_path)) == fingerprints
+
+
+def test_get_changed_years():
+    """
+    Test new and modified years are changed and missing years removed
+
+    :return:
+    """
+    previous = {2005: "a", 2006: "b", 2007: "c"}
+    current = {2005: "a", 2006: "x", 2008: "d"}
+
+    assert get_changed_years(previous, current) == ([2006, 2008], [2007])
+    assert get_changed_years({}, current) == ([2005, 2006, 2008], [])
+    assert get_changed_years(current, current) == ([], [])
@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from delivery_insights.loader.ipc import read_ipc, write_ipc
+
+
+def test_write_and_read_ipc(tmp_path):
+    """
+    Test frames keep their dtypes through Arrow IPC files
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Accident_Index": ["A1", "A2", "A3"],
+            "Year": pd.Series([2005, 2005, 2006], dtype="int16"),
+            "Accident_date": pd.to_datetime(["2005-01-04", "2005-03-01", "2006-05-10"]),
+            "Age_of_Vehicle": pd.Series([3, None, 12], dtype="Int16"),
+            "Accident_Severity": pd.Categorical(["Slight", "Fatal", "Slight"]),
+        }
+    ).set_axis([3, 5, 8])
+    path = write_ipc(data, os.path.join(tmp_path, "data.arrow"))
+
+    assert_frame_equal(read_ipc(path), data.reset_index(drop=True))
+    assert_frame_equal(
+        read_ipc(path, columns=["Year", "Accident_Severity"]),
+        data[["Year", "Accident_Severity"]].reset_index(drop=True),
+    )
+    assert os.listdir(tmp_path) == ["data.arrow"]
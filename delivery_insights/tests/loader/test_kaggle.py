@@ -0,0 +1,162 @@
+import os
+from types import SimpleNamespace
+from zipfile import ZipFile
+
+import pytest
+
+from delivery_insights.loader.kaggle import DOWNLOAD_FOLDER, kaggle
+
+FILES = {
+    "Accident_Information.csv": b"Accident_Index,Year\nA1,2005\nA2,2006\n",
+    "Vehicle_Information.csv": b"Accident_Index,Year,Vehicle_Reference\nA1,2005,1\n",
+}
+
+
+class FakeKaggleApi:
+    def __init__(self, files: dict, failures: int = 0):
+        """
+        Kaggle API serving files zipped from memory
+
+        :param files: content by file name
+        :param failures: number of failing downloads of each file
+        """
+        self.files = files
+        self.failures = dict.fromkeys(files, failures)
+        self.downloads = []
+
+    def dataset_list_files(self, dataset: str):
+        return SimpleNamespace(
+            files=[
+                SimpleNamespace(name=name, totalBytes=len(content))
+                for name, content in self.files.items()
+            ]
+        )
+
+    def dataset_download_file(
+        self, dataset, file_name, path=None, force=False, quiet=True
+    ):
+        self.downloads.append(file_name)
+        zip_path = os.path.join(path, f"{file_name}.zip")
+        if self.failures[file_name] > 0:
+            self.failures[file_name] -= 1
+            # an interrupted download leaves a truncated zip
+            with open(zip_path, "wb") as f:
+                f.write(b"PK\x03\x04")
+            raise ConnectionError("Connection reset by peer")
+        with ZipFile(zip_path, "w") as zf:
+            zf.writestr(file_name, self.files[file_name])
+        return True
+
+
+def load(folder: str, api: FakeKaggleApi, retries: int = 3, keep_zip=False) -> list:
+    """
+    Load FILES with the fake api
+
+    :param folder:
+    :param api:
+    :param retries:
+    :param keep_zip:
+    :return:
+    """
+    loader = kaggle(
+        repo="owner/dataset",
+        files_list=list(FILES),
+        output_folder=folder,
+        retries=retries,
+        backoff=0,
+        keep_zip=keep_zip,
+        api=api,
+    )
+    return loader.load_files()
+
+
+def test_load_files(tmp_path):
+    """
+    Test files are decompressed into output folder and loaded only once
+
+    :return:
+    """
+    api = FakeKaggleApi(FILES)
+
+    paths = load(str(tmp_path), api)
+
+    assert [os.path.basename(p) for p in paths] == list(FILES)
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read() == FILES[os.path.basename(path)]
+    assert not os.path.exists(os.path.join(tmp_path, DOWNLOAD_FOLDER))
+
+    load(str(tmp_path), api)
+    assert sorted(api.downloads) == sorted(FILES)
+
+
+def test_load_files_checksum(tmp_path):
+    """
+    Test modified or truncated files are loaded again
+
+    :return:
+    """
+    api = FakeKaggleApi(FILES)
+    paths = load(str(tmp_path), api)
+
+    with open(paths[0], "r+b") as f:
+        f.write(b"X")
+    with open(paths[1], "ab") as f:
+        f.truncate(5)
+    load(str(tmp_path), api)
+
+    assert sorted(api.downloads) == sorted(list(FILES) * 2)
+    with open(paths[0], "rb") as f:
+        assert f.read() == FILES[os.path.basename(paths[0])]
+
+
+def test_load_files_retries(tmp_path):
+    """
+    Test failed downloads are retried, and reported once retries are spent
+
+    :return:
+    """
+    api = FakeKaggleApi(FILES, failures=2)
+    load(str(tmp_path), api)
+    assert len(api.downloads) == 6
+
+    api = FakeKaggleApi(FILES, failures=2)
+    with pytest.raises(Exception, match="Failed to load"):
+        load(str(tmp_path / "failing"), api, retries=2)
+
+
+def test_load_files_resume(tmp_path):
+    """
+    Test a complete zip left by an interrupted run is not downloaded again
+
+    :return:
+    """
+    download_folder = os.path.join(tmp_path, DOWNLOAD_FOLDER)
+    os.makedirs(download_folder)
+    name = "Accident_Information.csv"
+    with ZipFile(os.path.join(download_folder, f"{name}.zip"), "w") as zf:
+        zf.writestr(name, FILES[name])
+    api = FakeKaggleApi(FILES)
+
+    load(str(tmp_path), api)
+
+    assert api.downloads == ["Vehicle_Information.csv"]
+
+
+def test_load_files_keep_zip(tmp_path):
+    """
+    Test zip archives are stored as downloaded when they are kept
+
+    :return:
+    """
+    api = FakeKaggleApi(FILES)
+
+    paths = load(str(tmp_path), api, keep_zip=True)
+
+    assert [os.path.basename(p) for p in paths] == [f"{f}.zip" for f in FILES]
+    assert not any(os.path.exists(os.path.join(tmp_path, f)) for f in FILES)
+    with ZipFile(paths[0]) as zf:
+        assert zf.read(list(FILES)[0]) == list(FILES.values())[0]
+
+    load(str(tmp_path), api, keep_zip=True)
+    assert sorted(api.downloads) == sorted(FILES)
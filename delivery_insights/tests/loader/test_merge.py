@@ -0,0 +1,87 @@
+import os
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from delivery_insights.loader.cache import read_source
+from delivery_insights.loader.merge import iter_merged, merge_sources
+from delivery_insights.loader.schema import concat_frames
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """
+    Folder with small Accident_Information and Vehicle_Information files
+
+    :return:
+    """
+    pd.DataFrame(
+        {
+            "Accident_Index": ["A1", "A2", "A3", "A4"],
+            "Year": [2005, 2005, 2006, 2007],
+            "Date": ["2005-01-04", "2005-03-01", "2006-05-10", "2007-12-31"],
+            "Time": ["17:42", "08:00", "23:10", None],
+            "Day_of_Week": ["Tuesday", "Tuesday", "Wednesday", "Monday"],
+            "Accident_Severity": ["Slight", "Fatal", "Serious", "Slight"],
+            "Weather_Conditions": ["Fine no high winds"] * 4,
+            "Latitude": [51.5, 51.51, 53.48, 55.95],
+            "Longitude": [-0.12, -0.13, -2.24, -3.19],
+            "Local_Authority_(District)": ["Westminster", "Westminster"]
+            + ["Manchester", "Edinburgh, City of"],
+            "Local_Authority_(Highway)": ["Westminster", "Westminster"]
+            + ["Manchester", "Edinburgh, City of"],
+            "LSOA_of_Accident_Location": ["E01004736", "E01004763", "E01005131", None],
+        }
+    ).to_csv(os.path.join(tmp_path, "Accident_Information.csv"), index=False)
+    pd.DataFrame(
+        {
+            "Accident_Index": ["A1", "A1", "A2", "A3", "A5"],
+            "Year": [2005, 2005, 2005, 2006, 2008],
+            "Age_Band_of_Driver": ["26 - 35", "16 - 20", "Over 75", "26 - 35", "0 - 5"],
+            "Sex_of_Driver": ["Male", "Female", "Male", "Not known", "Male"],
+            "Age_of_Vehicle": [3, None, 12, 1, 2],
+            "Driver_Home_Area_Type": ["Rural"] * 5,
+            "Journey_Purpose_of_Driver": ["Other"] * 5,
+            "Vehicle_Manoeuvre": ["Parked", "Reversing", "Parked", "U-turn", "Parked"],
+            "Vehicle_Reference": [1, 2, 1, 1, 1],
+        }
+    ).to_csv(os.path.join(tmp_path, "Vehicle_Information.csv"), index=False)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("join_mode", ["year", "hash"])
+def test_iter_merged(folder, join_mode):
+    """
+    Test partitioned merges give the in memory merge
+
+    :return:
+    """
+    expected = merge_sources(
+        read_source(folder, "Accident_Information.csv"),
+        read_source(folder, "Vehicle_Information.csv"),
+    )
+
+    chunks = list(iter_merged(folder, join_mode=join_mode, partitions=3))
+    result = concat_frames(chunks)
+
+    assert len(chunks) > 1
+    assert_frame_equal(
+        expected.sort_values(["Accident_Index", "Sex_of_Driver"]).reset_index(drop=True),
+        result[expected.columns]
+        .sort_values(["Accident_Index", "Sex_of_Driver"])
+        .reset_index(drop=True),
+    )
+    assert not any(f.startswith("merge-") for f in os.listdir(folder))
+
+
+def test_iter_merged_years(folder):
+    """
+    Test year merges are restricted to the given years
+
+    :return:
+    """
+    chunks = list(iter_merged(folder, join_mode="year", years=[2006, 2009]))
+
+    assert [chunk["Year"].unique().tolist() for chunk in chunks] == [[2006]]
+    assert chunks[0]["Accident_Index"].tolist() == ["A3"]
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from delivery_insights.loader.schema import read_csv
+
+
+def test_read_csv(tmp_path):
+    """
+    Test schema read_csv function
+
+    :return:
+    """
+    path = tmp_path / "Vehicle_Information.csv"
+    pd.DataFrame(
+        {
+            "Accident_Index": ["A1", "A1", "A2"],
+            "Year": [2005, 2005, 2006],
+            "Age_Band_of_Driver": ["26 - 35", "16 - 20", "26 - 35"],
+            "Sex_of_Driver": ["Male", "Female", "Male"],
+            "Age_of_Vehicle": [3.0, None, 12.0],
+            "Driver_Home_Area_Type": ["Rural", "Urban area", "Rural"],
+            "Journey_Purpose_of_Driver": ["Other", "Other", "Not known"],
+            "Vehicle_Manoeuvre": ["Parked", "Reversing", "Parked"],
+            "Vehicle_Reference": [1, 2, 1],
+            "make": ["FORD", "FORD", "VAUXHALL"],
+        }
+    ).to_csv(path, index=False)
+
+    result = read_csv(str(path))
+
+    assert "make" not in result.columns
+    assert result["Year"].dtype == "int16"
+    assert result["Age_of_Vehicle"].dtype == "Int16"
+    assert result["Age_of_Vehicle"].isna().tolist() == [False, True, False]
+    assert result["Sex_of_Driver"].dtype == "category"
+    assert list(result["Age_Band_of_Driver"].cat.categories) == ["16 - 20", "26 - 35"]
+
+
+def test_read_csv_dates_and_wrong_columns(tmp_path):
+    """
+    Test schema read_csv function with dates and unknown columns
+
+    :return:
+    """
+    path = tmp_path / "data.csv"
+    pd.DataFrame(
+        {"Date": ["2005-01-04", "2017-12-31"], "Time": ["17:42", "08:00"]}
+    ).to_csv(path, index=False)
+
+    result = read_csv(str(path))
+
+    assert result["Date"].dtype == "datetime64[ns]"
+    assert result["Time"].dtype == "category"
+    with pytest.raises(Exception, match="are not in data.csv"):
+        read_csv(str(path), columns=["Date", "Hour"])
@@ -2,6 +2,7 @@ import pandas as pd
 from pandas.testing import assert_frame_equal
 
 from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.spatial import GridIndex
 
 
 def test_transform():
@@ -38,6 +39,7 @@ def test_transform():
         expected.sort_values(by="Accident_date"),
         result.sort_values(by="Accident_date"),
         check_dtype=False,
+        check_categorical=False,
     )
     assert res is None
 
@@ -63,6 +65,8 @@ def test_filter_data():
 
     result = accidents.filter_data(data, column="Time", filter_conditions="17:00")
 
+    # data is left unchanged
+    assert len(data) == 2
     res = assert_frame_equal(
         expected.sort_values(by="Accident_date").reset_index(drop=True),
         result.sort_values(by="Accident_date").reset_index(drop=True),
@@ -180,6 +184,28 @@ def test_get_accidents_per_year():
     assert expected.equals(result.reset_index(drop=True))
 
 
+def test_get_accidents_per_period():
+    """
+    Test Accidents get_accidents_per_period function
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Accident_date": ["2020-01-11", "2020-01-30", "2020-03-10"],
+            "Time": ["17:00", "10:00", "08:00"],
+            "Age_of_Vehicle": [1, 6, 3],
+        }
+    )
+    accidents = Accidents()
+
+    expected = pd.Series([2, 0, 1])
+    transformed_data = accidents.transform(data)
+    result = accidents.get_accidents_per_period(data=transformed_data, rule="M")
+
+    assert expected.equals(result.reset_index(drop=True))
+
+
 def test_get_accidents_per_hour():
     """
     Test Accidents get_accidents_per_hour function
@@ -278,3 +304,40 @@ def test_get_accidents_count_by_column():
     assert res is None
     assert expected_labels.equals(result_labels)
     assert sorted(expected_sizes) == sorted(result_sizes)
+
+
+def test_get_accidents_within_radius():
+    """
+    Test accidents are counted by severity around each query point, from
+    accidents data or from their spatial index
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Latitude": [51.5, 51.501, 51.6, 53.48, None],
+            "Longitude": [-0.12, -0.121, -0.12, -2.24, -0.12],
+            "Accident_Severity": ["Slight", "Fatal", "Slight", "Serious", "Fatal"],
+        }
+    )
+    expected = pd.DataFrame(
+        {
+            "Latitude": [51.5, 53.48, 40.0],
+            "Longitude": [-0.12, -2.24, 0.0],
+            "Radius_km": [1.0, 1.0, 1.0],
+            "Count": [2, 1, 0],
+            "Fatal": [1, 0, 0],
+            "Serious": [0, 1, 0],
+            "Slight": [1, 0, 0],
+        }
+    )
+
+    result = Accidents.get_accidents_within_radius(
+        data, [51.5, 53.48, 40.0], [-0.12, -2.24, 0.0], 1.0
+    )
+
+    assert_frame_equal(expected, result)
+    result = Accidents.get_accidents_within_radius(
+        GridIndex.from_data(data), [51.5, 53.48, 40.0], [-0.12, -2.24, 0.0], 1.0
+    )
+    assert_frame_equal(expected, result)
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.areas import AREAS, AreaAggregates
+
+
+def get_data(rows: int = 2000) -> pd.DataFrame:
+    """
+    Create accidents of a few local authorities and LSOAs, some of their
+    areas, weathers and times missing
+
+    :param rows:
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    districts = rng.choice(
+        ["Westminster", "Leeds", "Camden", "York"], rows, p=[0.4, 0.3, 0.2, 0.1]
+    )
+    data = pd.DataFrame(
+        {
+            "Local_Authority_(District)": districts,
+            "Local_Authority_(Highway)": districts,
+            "LSOA_of_Accident_Location": pd.Index(
+                rng.integers(0, 60, rows).astype(str)
+            ).str.zfill(8),
+            "Year": rng.choice([2005, 2006, 2007], rows),
+            "Accident_Severity": rng.choice(["Fatal", "Serious", "Slight"], rows),
+            "Weather_Conditions": rng.choice(["Fine no high winds", "Fog"], rows),
+            "Time": pd.Index(rng.integers(0, 24, rows).astype(str)).str.zfill(2) + ":30",
+        }
+    )
+    data.loc[::17, "Local_Authority_(District)"] = None
+    data.loc[::23, "LSOA_of_Accident_Location"] = None
+    data.loc[::29, "Weather_Conditions"] = None
+    data.loc[::31, "Time"] = None
+    return data.astype(
+        {
+            column: "category"
+            for column in [*AREAS.values(), "Accident_Severity", "Weather_Conditions"]
+        }
+    )
+
+
+def test_from_data():
+    """
+    Test tables count the accidents of each area by dimension value like a
+    groupby, sorted by area
+
+    :return:
+    """
+    data = get_data()
+
+    aggregates = AreaAggregates.from_data(data)
+
+    table = aggregates.tables["district"]
+    assert table["Area"].cat.codes.is_monotonic_increasing
+    assert list(table["Area"].cat.categories) == [
+        "Camden",
+        "Leeds",
+        "Westminster",
+        "York",
+    ]
+    counts = table.set_index(["Area", "Dimension", "Value"])["Count"]
+    column = "Local_Authority_(District)"
+    assert counts.xs("Total", level="Dimension").droplevel("Value").to_dict() == (
+        data.groupby(column, observed=True).size().to_dict()
+    )
+    expected = data.groupby([column, "Weather_Conditions"], observed=True).size()
+    assert counts.xs("Weather_Conditions", level="Dimension").to_dict() == (
+        expected.to_dict()
+    )
+    lsoa = aggregates.tables["lsoa"]
+    assert lsoa.loc[lsoa["Dimension"] == "Total", "Count"].sum() == (
+        data["LSOA_of_Accident_Location"].notna().sum()
+    )
+
+
+def test_get_area():
+    """
+    Test counts of an area are the ones of its rows
+
+    :return:
+    """
+    data = get_data()
+    aggregates = AreaAggregates.from_data(data)
+
+    result = aggregates.get_area("district", "Leeds", dimension="Year")
+    counts = aggregates.get_area("highway", "York")
+
+    leeds = data[data["Local_Authority_(District)"] == "Leeds"]
+    assert result.to_dict() == {
+        str(year): count for year, count in leeds.groupby("Year").size().items()
+    }
+    york = data[data["Local_Authority_(Highway)"] == "York"]
+    assert counts[("Total", "All")] == len(york)
+    assert counts["Daytime"].sum() == york["Time"].notna().sum()
+    assert counts[("Weather_Conditions", "Fog")] == (
+        (york["Weather_Conditions"] == "Fog").sum()
+    )
+    with pytest.raises(Exception):
+        aggregates.get_area("district", "Oxford")
+    with pytest.raises(Exception):
+        aggregates.get_area("district", "Leeds", dimension="Speed_limit")
+    with pytest.raises(Exception):
+        aggregates.get_area("county", "Leeds")
+
+
+def test_from_data_missing_time():
+    """
+    Test accidents without time are left out of daytime counts only
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Local_Authority_(District)": ["York", "York"],
+            "Local_Authority_(Highway)": ["York", "York"],
+            "LSOA_of_Accident_Location": ["E0000001", "E0000001"],
+            "Year": [2005, 2005],
+            "Accident_Severity": ["Slight", "Slight"],
+            "Weather_Conditions": ["Fog", "Fog"],
+            "Time": ["08:30", None],
+        }
+    )
+
+    counts = AreaAggregates.from_data(data).get_area("district", "York")
+
+    assert counts[("Total", "All")] == 2
+    assert counts[("Year", "2005")] == 2
+    assert counts["Daytime"].to_dict() == {"morning rush (5-10)": 1}
+
+
+def test_get_top_areas():
+    """
+    Test rankings are the largest counts of a groupby, ties in order of areas
+
+    :return:
+    """
+    data = get_data()
+    aggregates = AreaAggregates.from_data(data)
+
+    result = aggregates.get_top_areas("lsoa", k=5, dimension="Year", value=2006)
+
+    expected = (
+        data[data["Year"] == 2006]
+        .groupby("LSOA_of_Accident_Location", observed=True)
+        .size()
+        .sort_index()
+        .sort_values(ascending=False, kind="stable")
+    )
+    assert result.to_dict() == expected.iloc[:5].to_dict()
+    assert list(result.index) == list(expected.index[:5])
+    assert list(aggregates.get_top_areas("district", k=2).index) == [
+        "Westminster",
+        "Leeds",
+    ]
+    assert len(aggregates.get_top_areas("district", k=10)) == 4
+    assert aggregates.get_top_areas("district", dimension="Year", value=2010).empty
+    assert Accidents.get_top_areas(data, "highway", k=1).to_dict() == (
+        aggregates.get_top_areas("highway", k=1).to_dict()
+    )
+
+
+def test_save_load(tmp_path):
+    """
+    Test loaded tables answer like the saved ones
+
+    :return:
+    """
+    aggregates = AreaAggregates.from_data(get_data())
+    aggregates.save(str(tmp_path))
+
+    loaded = AreaAggregates.load(str(tmp_path))
+
+    for name, table in aggregates.tables.items():
+        pd.testing.assert_frame_equal(loaded.tables[name], table)
+    assert loaded.get_top_areas(
+        "lsoa", k=3, dimension="Accident_Severity", value="Fatal"
+    ).equals(
+        aggregates.get_top_areas(
+            "lsoa", k=3, dimension="Accident_Severity", value="Fatal"
+        )
+    )
+    frame = loaded.to_frame("district")
+    assert list(frame.columns) == ["Area_type", "Area", "Dimension", "Value", "Count"]
+    assert (frame["Area_type"] == "district").all()
+    with pytest.raises(Exception):
+        AreaAggregates.load(str(tmp_path / "missing"))
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_series_equal
+
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.cube import AccidentsCube, count_by
+from delivery_insights.models.filters import Filter
+
+
+def get_data():
+    """
+    Create transformed accidents data
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Accident_date": ["2020-10-11", "2019-09-10", "2019-09-10", "2020-01-02"],
+            "Time": ["17:00", "10:00", "23:30", "17:10"],
+            "Age_of_Vehicle": [1, 6, None, 12],
+            "Accident_Severity": ["Slight", "Fatal", "Slight", "Slight"],
+            "Weather_Conditions": ["Fine no high winds", np.nan, "Fog or mist", "Fog"],
+            "Age_Band_of_Driver": ["26 - 35", "16 - 20", "26 - 35", "26 - 35"],
+            "Sex_of_Driver": ["Male", "Female", np.nan, "Male"],
+            "Driver_Home_Area_Type": ["Rural", "Urban area", "Rural", "Rural"],
+            "Journey_Purpose_of_Driver": ["Other", "Other", "Not known", "Other"],
+            "Vehicle_Manoeuvre": ["Parked", "U-turn", "Parked", "Parked"],
+        }
+    )
+    data = data.astype({c: "category" for c in data.columns[3:]})
+    return Accidents().transform(data)
+
+
+def test_count():
+    """
+    Test cube counts are the row level counts, missing values included in
+    other columns of a cuboid
+
+    :return:
+    """
+    data = get_data()
+    cube = AccidentsCube.from_data(data)
+
+    for cols, row_filter in [
+        (["Accident_Severity"], None),
+        (["Age_Band_of_Driver", "Age_band_of_vehicule"], None),
+        (["Sex_of_Driver"], None),
+        (["Daytime", "Accident_Severity"], None),
+        (["Accident_date"], Filter().keep("Accident_Severity", "Slight")),
+    ]:
+        assert_series_equal(
+            count_by(data, cols, row_filter=row_filter),
+            count_by(cube, cols, row_filter=row_filter),
+            check_names=False,
+        )
+
+
+def test_concat_save_and_load(tmp_path):
+    """
+    Test cubes of chunks sum to the cube of the data, and saved cubes are
+    read back
+
+    :return:
+    """
+    data = get_data()
+    cube = AccidentsCube.from_data(data)
+    chunks = AccidentsCube.concat(
+        [AccidentsCube.from_data(data.iloc[:2]), AccidentsCube.from_data(data.iloc[2:])]
+    )
+    loaded = AccidentsCube.load(cube.save(str(tmp_path)))
+
+    for other in [chunks, loaded]:
+        for cols in [["Weather_Conditions"], ["Daytime"], ["Accident_date"]]:
+            assert_series_equal(cube.count(cols), other.count(cols))
+
+
+def test_empty(tmp_path):
+    """
+    Test a cube without accidents counts nothing, and is saved and read back
+
+    :return:
+    """
+    cube = AccidentsCube.empty()
+
+    loaded = AccidentsCube.load(cube.save(str(tmp_path)))
+
+    for other in [cube, loaded]:
+        assert other.count(["Accident_Severity"]).empty
+        assert other.count(["Age_Band_of_Driver", "Sex_of_Driver"]).empty
+    assert count_by(
+        AccidentsCube.concat([cube, AccidentsCube.from_data(get_data())]),
+        ["Accident_Severity"],
+    ).to_dict() == {"Fatal": 1, "Slight": 3}
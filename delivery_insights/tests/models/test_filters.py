@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from delivery_insights.models.filters import Filter
+
+
+def test_mask():
+    """
+    Test composed conditions on categorical and other columns
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Weather_Conditions": pd.Categorical(
+                ["Fine", "Unknown", np.nan, "Fog", "Fine"]
+            ),
+            "Accident_Severity": ["Slight", "Fatal", "Fatal", "Fatal", "Fatal"],
+        }
+    )
+    row_filter = (
+        Filter()
+        .drop("Weather_Conditions", ["Unknown", "Snow"])
+        .keep("Accident_Severity", "Fatal")
+    )
+
+    assert row_filter.columns == ["Weather_Conditions", "Accident_Severity"]
+    assert row_filter.mask(data).tolist() == [False, False, True, True, True]
+    assert row_filter.indices(data).tolist() == [2, 3, 4]
+    assert row_filter.restrict(["Accident_Severity"]).indices(data).tolist() == [
+        1,
+        2,
+        3,
+        4,
+    ]
+
+
+def test_apply():
+    """
+    Test filtered data is a selection of rows leaving data unchanged
+
+    :return:
+    """
+    data = pd.DataFrame({"Time": ["17:00", "10:00", "17:00"], "Hour": [17, 10, 17]})
+
+    result = Filter.from_conditions({"Time": ["17:00"]}).apply(data)
+
+    assert result["Hour"].tolist() == [10]
+    assert len(data) == 3
+    assert Filter.from_conditions(None).apply(data) is data
@@ -0,0 +1,171 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from delivery_insights.models.raster import RasterTiles
+
+
+def get_data(rows: int = 3000) -> pd.DataFrame:
+    """
+    Create accidents of several years with coordinates, some of them missing
+
+    :param rows:
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            "Latitude": rng.uniform(50, 53, rows),
+            "Longitude": rng.uniform(-3, 1, rows),
+            "Accident_Severity": pd.Categorical(
+                rng.choice(["Fatal", "Serious", "Slight"], rows, p=[0.1, 0.3, 0.6])
+            ),
+            "Year": rng.choice([2005, 2006, 2008], rows),
+        }
+    )
+    data.loc[::41, "Latitude"] = np.nan
+    return data.astype({"Latitude": "float32", "Longitude": "float32"})
+
+
+def test_build(tmp_path):
+    """
+    Test cells of every level count the accidents a scan finds, by year and
+    severity, years without accidents being counted as empty
+
+    :return:
+    """
+    data = get_data()
+    tiles = RasterTiles.build(data, str(tmp_path), cell_size=0.1, levels=3)
+
+    data = data.dropna(subset=["Latitude"])
+    assert tiles.years == [2005, 2006, 2007, 2008]
+    assert tiles.severities == ["Fatal", "Serious", "Slight"]
+    assert len(tiles.levels) == 3
+    for level, array in enumerate(tiles.levels):
+        assert isinstance(array, np.memmap)
+        assert array.sum() == len(data)
+        assert array[2].sum() == 0
+        assert (
+            array[1, 0].sum()
+            == ((data["Year"] == 2006) & (data["Accident_Severity"] == "Fatal")).sum()
+        )
+    size = tiles.get_cell_size(1)
+    rows = np.floor((data["Latitude"] - tiles.origin[0]) / size).astype(int)
+    cols = np.floor((data["Longitude"] - tiles.origin[1]) / size).astype(int)
+    expected = ((rows == 10) & (cols == 5) & (data["Year"] == 2008)).sum()
+    assert tiles.levels[1][3, :, 10, 5].sum() == expected
+    assert tiles.levels[2].dtype.itemsize >= tiles.levels[0].dtype.itemsize
+
+
+def test_build_dtypes(tmp_path):
+    """
+    Test levels have the smallest dtype of their largest count of a year,
+    smaller than the one of the counts of all years
+
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "Latitude": [51.05] * 300 + [51.95],
+            "Longitude": [0.05] * 300 + [0.95],
+            "Accident_Severity": pd.Categorical(["Slight"] * 301),
+            "Year": [2005, 2006] * 150 + [2006],
+        }
+    )
+
+    tiles = RasterTiles.build(data, str(tmp_path), cell_size=0.1, levels=2)
+
+    assert [array.dtype for array in tiles.levels] == [np.uint8, np.uint8]
+    assert tiles.levels[0][:, 0].max() == 150
+    assert tiles.levels[1].sum() == 301
+    assert sorted(os.listdir(tmp_path)) == [
+        "level=0.npy",
+        "level=1.npy",
+        "raster.json",
+    ]
+
+
+def test_read(tmp_path):
+    """
+    Test reading a bounding box, years and a severity gives a view of the
+    memory mapped level, and the extent of its cells
+
+    :return:
+    """
+    data = get_data()
+    tiles = RasterTiles.build(data, str(tmp_path), cell_size=0.1, levels=3)
+
+    view, extent = tiles.read(
+        (51.0, -1.0, 51.5, 0.0), level=0, years=(2005, 2006), severity="Serious"
+    )
+
+    assert view.shape == (2, 1, 6, 11)
+    assert np.shares_memory(view, tiles.levels[0])
+    west, east, south, north = extent
+    assert west <= -1.0 < east and south <= 51.0 < north
+    assert np.allclose([east - west, north - south], [1.1, 0.6])
+    assert view.sum() <= (data["Accident_Severity"] == "Serious").sum()
+    whole, extent = tiles.read(level=2, years=2008)
+    assert whole.shape[:2] == (1, 3)
+    assert extent == tiles.get_extent(2)
+    empty, _ = tiles.read((60.0, 5.0, 61.0, 6.0))
+    assert empty.size == 0
+
+
+def test_read_errors(tmp_path):
+    """
+    Test reading missing levels, years or severities fails
+
+    :return:
+    """
+    tiles = RasterTiles.build(get_data(), str(tmp_path), levels=2)
+
+    with pytest.raises(Exception):
+        tiles.read(level=2)
+    with pytest.raises(Exception):
+        tiles.read(years=(2004, 2006))
+    with pytest.raises(Exception):
+        tiles.read(years=(2008, 2006))
+    with pytest.raises(Exception):
+        tiles.read(severity="Unknown")
+
+
+def test_get_level(tmp_path):
+    """
+    Test the finest level fitting a number of cells is chosen, smaller boxes
+    fitting finer levels
+
+    :return:
+    """
+    tiles = RasterTiles.build(get_data(), str(tmp_path), cell_size=0.01, levels=4)
+
+    assert tiles.get_level(max_cells=100) == 3
+    assert tiles.get_level(max_cells=110) == 2
+    assert tiles.get_level(max_cells=100, bbox=(51.0, -1.0, 51.5, -0.5)) == 0
+    assert tiles.get_level(max_cells=30, bbox=(51.0, -1.0, 51.5, -0.5)) == 1
+
+
+def test_load(tmp_path):
+    """
+    Test loaded rasters are the built ones, and rebuilding with fewer levels
+    leaves no coarser level
+
+    :return:
+    """
+    data = get_data()
+    tiles = RasterTiles.build(data, str(tmp_path), cell_size=0.1, levels=3)
+
+    loaded = RasterTiles.load(str(tmp_path))
+
+    assert loaded.origin == tiles.origin
+    assert loaded.years == tiles.years
+    assert np.array_equal(loaded.levels[1], tiles.levels[1])
+    RasterTiles.build(data, str(tmp_path), cell_size=0.1, levels=2)
+    assert len(RasterTiles.load(str(tmp_path)).levels) == 2
+    assert not os.path.exists(tmp_path / "level=2.npy")
+    with pytest.raises(Exception):
+        RasterTiles.load(str(tmp_path / "missing"))
+    with pytest.raises(Exception):
+        RasterTiles.build(data.iloc[:0], str(tmp_path))
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from delivery_insights.models.risk import DAYTIMES, RouteRiskScorer
+from delivery_insights.utils.geo import DEGREE_KM, haversine_km
+
+
+def get_data() -> pd.DataFrame:
+    """
+    Create accidents of two years in two cells of 0.1 degree
+
+    :return:
+    """
+    return pd.DataFrame(
+        {
+            "Latitude": [51.05, 51.05, 51.05, 51.15, 51.15, None],
+            "Longitude": [0.05, 0.05, 0.05, 0.05, 0.05, 0.05],
+            "Accident_Severity": [
+                "Fatal",
+                "Slight",
+                "Serious",
+                "Slight",
+                "Slight",
+                "Fatal",
+            ],
+            "Time": ["08:10", "09:00", "20:00", "08:30", None, "08:00"],
+            "Year": [2005, 2006, 2006, 2005, 2006, 2006],
+        }
+    )
+
+
+def test_from_data():
+    """
+    Test rates are weighted accidents per year of each cell and daytime,
+    accidents without coordinates or time being left out
+
+    :return:
+    """
+    scorer = RouteRiskScorer.from_data(get_data(), cell_size=0.1)
+
+    morning = DAYTIMES.index("morning rush (5-10)")
+    evening = DAYTIMES.index("evening (19-23)")
+    assert scorer.rates.shape == (len(DAYTIMES), 2, 1)
+    assert scorer.rates[morning, :, 0].tolist() == [5.5, 0.5]
+    assert scorer.rates[evening, :, 0].tolist() == [1.5, 0.0]
+    assert scorer.rates.sum() == 7.5
+    # years of left out accidents are not counted in the rates
+    data = get_data()
+    data.loc[len(data)] = [None, 0.05, "Fatal", "08:00", 2007]
+    data.loc[len(data)] = [51.05, 0.05, "Fatal", None, 2008]
+    assert np.array_equal(
+        RouteRiskScorer.from_data(data, cell_size=0.1).rates, scorer.rates
+    )
+
+
+def test_score():
+    """
+    Test segments are scored by the rates of the cells they cross, pro rata
+    of their length, at the daytime of their route
+
+    :return:
+    """
+    scorer = RouteRiskScorer.from_data(get_data(), cell_size=0.1)
+    # 0.8 cell height, crossing the two cells from south to north
+    north = [[51.02, 0.05], [51.18, 0.05]]
+    inside = [[51.01, 0.02], [51.01, 0.08], [51.09, 0.08]]
+
+    result = scorer.score([north, inside, [[40.0, 0.0], [40.1, 0.0]], []], 8)
+
+    assert len(result) == 4
+    assert np.allclose(result[0], [(5.5 + 0.5) * 0.8])
+    lengths = [0.06 * np.cos(np.radians(51.01)), 0.08]
+    assert np.allclose(
+        result[1], [5.5 * lengths[0] / 0.1, 5.5 * lengths[1] / 0.1], rtol=1e-3
+    )
+    assert result[2].tolist() == [0.0]
+    assert len(result[3]) == 0
+    # a cell long route, and one cut unevenly by the edge between cells
+    result = scorer.score(
+        [[[51.05, 0.05], [51.15, 0.05]], [[51.03, 0.05], [51.16, 0.05]]], 8
+    )
+    assert np.allclose(result[0], [(5.5 + 0.5) * 0.5])
+    assert np.allclose(result[1], [5.5 * 0.7 + 0.5 * 0.6])
+    # 7 / 13 of the route is in the southern cell, then 1 / 13 in the northern
+    # one before leaving the grid at its eastern edge
+    diagonal = [[51.03, 0.02], [51.16, 0.15]]
+    length = haversine_km(*diagonal[0], *diagonal[1]) / (0.1 * DEGREE_KM)
+    assert np.allclose(scorer.score([diagonal], 8), [[length * (5.5 * 7 + 0.5) / 13]])
+
+    assert np.allclose(scorer.score([north], "evening (19-23)"), [[1.5 * 0.8]])
+    assert np.allclose(scorer.score([north, north], [20, 3]), [[1.5 * 0.8], [0.0]])
+    with pytest.raises(Exception):
+        scorer.score([north], "lunch")
+
+
+def test_save_load(tmp_path):
+    """
+    Test loaded rates score like the saved ones
+
+    :return:
+    """
+    scorer = RouteRiskScorer.from_data(get_data(), cell_size=0.1)
+    scorer.save(str(tmp_path))
+
+    loaded = RouteRiskScorer.load(str(tmp_path))
+
+    route = [[51.02, 0.05], [51.18, 0.05]]
+    assert loaded.cell_size == 0.1
+    assert np.allclose(loaded.score([route], 8)[0], scorer.score([route], 8)[0])
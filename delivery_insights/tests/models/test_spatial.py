@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from delivery_insights.models.spatial import GridIndex
+from delivery_insights.utils.geo import haversine_km
+
+
+def get_data(rows: int = 2000) -> pd.DataFrame:
+    """
+    Create accidents with clustered coordinates, some of them missing
+
+    :param rows:
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            "Latitude": np.concatenate(
+                [rng.normal(51.5, 0.05, rows // 2), rng.uniform(50, 55, rows // 2)]
+            ),
+            "Longitude": np.concatenate(
+                [rng.normal(-0.12, 0.05, rows // 2), rng.uniform(-5, 1, rows // 2)]
+            ),
+            "Accident_Severity": pd.Categorical(
+                rng.choice(["Fatal", "Serious", "Slight"], rows)
+            ),
+        }
+    )
+    data.loc[::37, "Latitude"] = np.nan
+    data.loc[::53, "Longitude"] = np.nan
+    return data.astype({"Latitude": "float32", "Longitude": "float32"})
+
+
+def test_count_in_bbox():
+    """
+    Test boxes count the points a scan finds, for boxes inside, across and
+    out of the grid, on cell edges and empty ones
+
+    :return:
+    """
+    data = get_data()
+    grid = GridIndex.from_data(data, cell_size=0.05)
+    rng = np.random.default_rng(1)
+    min_lat = np.concatenate([rng.uniform(49.5, 55.5, 200), [51.5, 40, 52, 51.45]])
+    min_lon = np.concatenate([rng.uniform(-5.5, 1.5, 200), [-0.15, 10, 0, -0.2]])
+    max_lat = min_lat + np.concatenate([rng.uniform(0, 1.5, 200), [0.05, 1, -1, 0.1]])
+    max_lon = min_lon + np.concatenate([rng.uniform(0, 1.5, 200), [0.05, 1, 1, 0.2]])
+
+    result = grid.count_in_bbox(min_lat, min_lon, max_lat, max_lon, batch_size=64)
+
+    latitudes = data["Latitude"].to_numpy("float64")[:, None]
+    longitudes = data["Longitude"].to_numpy("float64")[:, None]
+    expected = (
+        (latitudes >= min_lat)
+        & (latitudes <= max_lat)
+        & (longitudes >= min_lon)
+        & (longitudes <= max_lon)
+    ).sum(axis=0)
+    assert result.tolist() == expected.tolist()
+    assert grid.count_in_bbox(-90, -180, 90, 180).tolist() == [len(grid)]
+
+
+def test_k_nearest():
+    """
+    Test nearest points are the ones a scan finds, for queries in dense, sparse
+    and out of grid areas
+
+    :return:
+    """
+    data = get_data()
+    grid = GridIndex.from_data(data, cell_size=0.05)
+    latitudes = np.array([51.5, 51.6, 53.2, 54.9, 48.0, 60.0])
+    longitudes = np.array([-0.12, 0.0, -3.0, 0.9, -2.0, -10.0])
+
+    distances, positions = grid.k_nearest(latitudes, longitudes, k=5, batch_size=4)
+
+    expected = haversine_km(
+        latitudes[:, None],
+        longitudes[:, None],
+        data["Latitude"].to_numpy("float64"),
+        data["Longitude"].to_numpy("float64"),
+    )
+    expected = np.where(np.isnan(expected), np.inf, expected)
+    assert np.allclose(distances, np.sort(expected, axis=1)[:, :5])
+    assert np.allclose(np.take_along_axis(expected, positions, axis=1), distances)
+    with pytest.raises(Exception):
+        grid.k_nearest(51.5, -0.12, k=len(data))
+
+
+def test_get_cell_counts():
+    """
+    Test cells count their points by severity, points without coordinates
+    being left out
+
+    :return:
+    """
+    data = get_data()
+    grid = GridIndex.from_data(data, cell_size=0.1)
+
+    result = grid.get_cell_counts()
+
+    data = data.dropna(subset=["Latitude", "Longitude"])
+    assert len(grid) == len(data)
+    assert result["Count"].sum() == len(data)
+    assert (result[["Fatal", "Serious", "Slight"]].sum(axis=1) == result["Count"]).all()
+    assert result["Fatal"].sum() == (data["Accident_Severity"] == "Fatal").sum()
+    densest = result.loc[result["Count"].idxmax()]
+    assert abs(densest["Latitude"] - 51.5) < 0.1
+    assert abs(densest["Longitude"] + 0.12) < 0.1
+    assert grid.get_counts_grid(factor=3).sum() == len(data)
+
+
+def test_save_load(tmp_path):
+    """
+    Test a loaded index answers like the saved one
+
+    :return:
+    """
+    grid = GridIndex.from_data(get_data())
+    grid.save(str(tmp_path))
+
+    loaded = GridIndex.load(str(tmp_path))
+
+    assert loaded.shape == grid.shape
+    assert loaded.categories == ["Fatal", "Serious", "Slight"]
+    assert loaded.count_in_bbox(51, -1, 52, 0) == grid.count_in_bbox(51, -1, 52, 0)
+    with pytest.raises(Exception):
+        GridIndex.load(str(tmp_path / "missing"))
+
+
+def test_build_without_points():
+    """
+    Test indexing data without coordinates fails
+
+    :return:
+    """
+    with pytest.raises(Exception):
+        GridIndex.build(np.array([np.nan]), np.array([1.0]))
+
+
+def test_count_within():
+    """
+    Test circles count the points and severities a scan finds, in batches
+    smaller than the candidates of a query
+
+    :return:
+    """
+    data = get_data()
+    grid = GridIndex.from_data(data, cell_size=0.05)
+    rng = np.random.default_rng(2)
+    latitudes = np.concatenate([rng.uniform(50, 55, 50), [51.5, 70.0]])
+    longitudes = np.concatenate([rng.uniform(-5, 1, 50), [-0.12, 0.0]])
+    radius_km = np.concatenate([rng.uniform(0, 60, 50), [3.0, 500.0]])
+
+    counts, by_severity = grid.count_within(
+        latitudes, longitudes, radius_km, batch_size=100
+    )
+
+    near = (
+        haversine_km(
+            latitudes[:, None],
+            longitudes[:, None],
+            data["Latitude"].to_numpy("float64"),
+            data["Longitude"].to_numpy("float64"),
+        )
+        <= radius_km[:, None]
+    )
+    assert counts.tolist() == near.sum(axis=1).tolist()
+    assert counts[-1] == 0
+    for i, category in enumerate(grid.categories):
+        expected = (near & (data["Accident_Severity"] == category).to_numpy()).sum(1)
+        assert by_severity[:, i].tolist() == expected.tolist()
@@ -0,0 +1,129 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from delivery_insights.loader.formats import get_format_path, read_frame
+from delivery_insights.loader.ipc import IPC_SUFFIX
+from delivery_insights.loader.schema import concat_frames
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.cube import CUBOIDS, AccidentsCube
+from delivery_insights.pipelines.transform.pipeline import (
+    transform,
+    transform_partitions,
+)
+
+COLUMNS = ["Accident_Index", "Year", "Accident_date", "Hour", "Age_band_of_vehicule"]
+
+
+def get_chunks() -> list:
+    """
+    Create merged data chunks holding several years
+
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    chunks = []
+    for i in range(2):
+        rows = 50
+        data = pd.DataFrame(
+            {
+                "Accident_Index": [f"A{i}-{r}" for r in range(rows)],
+                "Year": rng.integers(2005, 2008, rows).astype("int16"),
+                "Accident_date": pd.Timestamp("2005-01-01")
+                + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D"),
+                "Time": [f"{h:02d}:00" for h in rng.integers(0, 24, rows)],
+                "Age_of_Vehicle": pd.array(rng.integers(0, 20, rows), dtype="Int16"),
+                "Accident_Severity": pd.Categorical(
+                    rng.choice(["Fatal", "Serious", "Slight"], rows)
+                ),
+                **{
+                    column: pd.Categorical(rng.choice(["a", "b", None], rows))
+                    for column in [
+                        "Weather_Conditions",
+                        "Age_Band_of_Driver",
+                        "Sex_of_Driver",
+                        "Driver_Home_Area_Type",
+                        "Journey_Purpose_of_Driver",
+                        "Vehicle_Manoeuvre",
+                    ]
+                },
+            }
+        )
+        data.loc[::7, "Time"] = None
+        data.loc[::5, "Age_of_Vehicle"] = pd.NA
+        chunks.append(data)
+    return chunks
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_transform_partitions(tmp_path, file_format):
+    """
+    Test partitions transformed by a pool of processes give the rows and
+    counts of a sequential transform, in a single transformed file
+
+    :return:
+    """
+    sequential = os.path.join(tmp_path, "sequential")
+    parallel = os.path.join(tmp_path, "parallel")
+    expected = []
+    for i, chunk in enumerate(get_chunks()):
+        data = Accidents.transform(chunk.copy())
+        transform(data, sequential, COLUMNS, append=i > 0, file_format=file_format)
+        expected.append(data)
+
+    cubes = list(
+        transform_partitions(get_chunks(), parallel, COLUMNS, 2, file_format=file_format)
+    )
+
+    assert len(cubes) == 6
+    expected_cube = AccidentsCube.from_data(concat_frames(expected))
+    cube = AccidentsCube.concat(cubes)
+    for dims in CUBOIDS.values():
+        assert list(cube.count(dims).items()) == list(expected_cube.count(dims).items())
+
+    keys = ["accident_index"]
+    filename = get_format_path("transformed_data", file_format)
+    read = [
+        read_frame(os.path.join(folder, filename)) for folder in [sequential, parallel]
+    ]
+    assert_frame_equal(
+        read[1].sort_values(keys).reset_index(drop=True),
+        read[0].sort_values(keys).reset_index(drop=True),
+        check_categorical=False,
+    )
+    # partitions are appended in order of chunks, then years
+    assert list(read[1]["accident_index"]) == [
+        index
+        for data in expected
+        for index in data.sort_values("Year", kind="stable")["Accident_Index"]
+    ]
+    assert sorted(os.listdir(parallel)) == [filename, f"{filename}.schema.json"]
+
+
+def test_transform_partitions_spill(tmp_path):
+    """
+    Test partitions waiting for a process are at most 2 per process, however
+    many chunks are read ahead
+
+    :return:
+    """
+    spilled = []
+
+    def iter_chunks():
+        for _ in range(3):
+            for chunk in get_chunks():
+                spilled.append(
+                    len(
+                        glob.glob(os.path.join(tmp_path, "transform-*", f"*{IPC_SUFFIX}"))
+                    )
+                )
+                yield chunk
+
+    cubes = list(transform_partitions(iter_chunks(), str(tmp_path), COLUMNS, 2))
+
+    assert len(cubes) == 18
+    assert max(spilled) <= 4
@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from delivery_insights.analysis.scheduler import render_jobs
+from delivery_insights.loader.formats import FORMATS, get_format_path
+from delivery_insights.loader.schema import concat_frames
+from delivery_insights.models.accidents import Accidents
+from delivery_insights.models.cube import CUBOIDS, DIMENSIONS, AccidentsCube
+from delivery_insights.models.raster import RasterTiles
+from delivery_insights.models.spatial import GridIndex
+from delivery_insights.pipelines.transform.pipeline import transform
+from delivery_insights.pipelines.visualize.pipeline import (
+    CHART_FILENAMES,
+    HEATMAP_FILENAME,
+    HOTSPOT_MAX_CELLS,
+    count_frame,
+    get_chart_jobs,
+    get_heatmap_job,
+    get_hotspot_job,
+)
+from delivery_insights.tests.pipelines.test_transform import get_chunks
+
+
+@pytest.mark.parametrize("file_format", list(FORMATS))
+def test_count_frame(tmp_path, monkeypatch, file_format):
+    """
+    Test transformed files are counted batch by batch like the transformed
+    data
+
+    :return:
+    """
+    monkeypatch.setattr("delivery_insights.loader.formats.WRITE_ROWS", 30)
+    chunks = [Accidents.transform(chunk) for chunk in get_chunks()]
+    for i, data in enumerate(chunks):
+        transform(data, str(tmp_path), DIMENSIONS, append=i > 0, file_format=file_format)
+    expected = AccidentsCube.from_data(concat_frames(chunks))
+
+    cube = count_frame(
+        os.path.join(tmp_path, get_format_path("transformed_data", file_format))
+    )
+
+    for dims in CUBOIDS.values():
+        assert list(cube.count(dims).items()) == list(expected.count(dims).items())
+
+
+def test_count_frame_missing_dimensions(tmp_path):
+    """
+    Test files without the cube dimensions raise
+
+    :return:
+    """
+    data = Accidents.transform(get_chunks()[0])
+    transform(data, str(tmp_path), ["Accident_Index", "Year"])
+
+    with pytest.raises(Exception, match="are not in transformed_data.csv"):
+        count_frame(os.path.join(tmp_path, "transformed_data.csv"))
+
+
+def test_chart_filenames():
+    """
+    Test CHART_FILENAMES are the files of the chart jobs
+
+    :return:
+    """
+    cube = AccidentsCube.from_data(Accidents.transform(get_chunks()[0]))
+
+    jobs = get_chart_jobs(cube)
+
+    assert sorted(kwargs["filename"] for _, kwargs in jobs) == sorted(CHART_FILENAMES)
+
+
+def test_get_hotspot_job():
+    """
+    Test the hotspot map merges cells of large grids, keeping every accident
+    within its extent
+
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    latitudes, longitudes = rng.uniform(50, 58, 1000), rng.uniform(-5, 1, 1000)
+    grid = GridIndex.build(latitudes, longitudes)
+
+    method, kwargs = get_hotspot_job(grid)
+
+    assert method == "hotspot_map"
+    assert max(kwargs["counts"].shape) <= HOTSPOT_MAX_CELLS
+    assert kwargs["counts"].sum() == 1000
+    west, east, south, north = kwargs["extent"]
+    assert west <= longitudes.min() and east >= longitudes.max()
+    assert south <= latitudes.min() and north >= latitudes.max()
+
+
+def test_get_heatmap_job(tmp_path):
+    """
+    Test the heatmap is drawn from the raster folder the job holds
+
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            "Latitude": rng.uniform(50, 58, 1000),
+            "Longitude": rng.uniform(-5, 1, 1000),
+            "Accident_Severity": rng.choice(["Fatal", "Serious", "Slight"], 1000),
+            "Year": rng.choice([2005, 2006], 1000),
+        }
+    )
+    raster_folder = str(tmp_path / "raster")
+    RasterTiles.build(data, raster_folder)
+
+    job = get_heatmap_job(raster_folder)
+    render_jobs([job], output_folder=str(tmp_path))
+
+    assert job[0] == "tile_heatmap"
+    assert os.path.exists(tmp_path / HEATMAP_FILENAME)
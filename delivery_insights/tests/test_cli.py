@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pytest
+
+from delivery_insights.cli import COMMANDS
+from delivery_insights.loader.formats import FORMATS
+from delivery_insights.models.backends import BACKENDS
+from delivery_insights.utils.config import BACKEND_NAMES, FORMAT_NAMES
+
+# Modules commands must not import to parse their arguments
+HEAVY_MODULES = ["pandas", "pyarrow", "matplotlib", "seaborn", "psycopg2", "kaggle"]
+
+
+def get_imported_modules(command: str, *args) -> list:
+    """
+    Run a command in a new interpreter and list the modules it imports
+
+    :param command: one of COMMANDS
+    :param args: command arguments
+    :return:
+    """
+    code = (
+        f"import sys; sys.argv = {[command, *args]!r}; "
+        f"from delivery_insights.cli import COMMANDS; COMMANDS[{command!r}]()"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return [
+        line.split("|")[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    ]
+
+
+@pytest.mark.parametrize("command", list(COMMANDS))
+def test_help_does_not_import_pipelines(command):
+    """
+    Test --help answers before heavy dependencies are imported
+
+    :return:
+    """
+    modules = get_imported_modules(command, "--help")
+
+    imported = [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+    assert imported == []
+
+
+def test_choices():
+    """
+    Test choices of the parsers are the backends and formats of the package
+
+    :return:
+    """
+    assert BACKEND_NAMES == list(BACKENDS)
+    assert FORMAT_NAMES == list(FORMATS)
@@ -0,0 +1,193 @@
+import os
+import threading
+
+import pytest
+
+from delivery_insights.utils.dag import Stage, check_dag, run_dag
+
+
+def write(path: str, text: str) -> None:
+    """
+    Write text to a file
+
+    :param path:
+    :param text:
+    :return:
+    """
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def get_stages(folder: str, calls: list) -> list:
+    """
+    Stages copying an input file, then deriving two files from the copy
+
+    :param folder:
+    :param calls: names of the run stages
+    :return:
+    """
+    source, copy, upper, size = [
+        os.path.join(folder, name) for name in ["source", "copy", "upper", "size"]
+    ]
+
+    def copy_source():
+        calls.append("copy")
+        with open(source) as f:
+            write(copy, f.read())
+
+    def derive(name: str, path: str, fct):
+        def run():
+            calls.append(name)
+            with open(copy) as f:
+                write(path, fct(f.read()))
+
+        return run
+
+    return [
+        Stage("copy", copy_source, inputs=[source], outputs=[copy]),
+        Stage(
+            "upper", derive("upper", upper, str.upper), after=["copy"], outputs=[upper]
+        ),
+        Stage(
+            "size",
+            derive("size", size, lambda text: str(len(text))),
+            after=["copy"],
+            inputs=[copy],
+            outputs=[size],
+        ),
+    ]
+
+
+def test_run_dag(tmp_path):
+    """
+    Test stages run after their upstream stages, and are skipped while their
+    inputs and outputs are unchanged
+
+    :return:
+    """
+    manifest = os.path.join(tmp_path, "_dag_manifest.json")
+    write(os.path.join(tmp_path, "source"), "abc")
+    calls = []
+
+    report = run_dag(get_stages(str(tmp_path), calls), manifest)
+
+    assert calls[0] == "copy" and sorted(calls[1:]) == ["size", "upper"]
+    assert {name: entry["status"] for name, entry in report.items()} == {
+        "copy": "ok",
+        "upper": "ok",
+        "size": "ok",
+    }
+    with open(os.path.join(tmp_path, "upper")) as f:
+        assert f.read() == "ABC"
+
+    calls.clear()
+    report = run_dag(get_stages(str(tmp_path), calls), manifest)
+    assert calls == []
+    assert {entry["status"] for entry in report.values()} == {"cached"}
+
+    # a changed input reruns the stage and the stages reading its outputs
+    write(os.path.join(tmp_path, "source"), "abcd")
+    run_dag(get_stages(str(tmp_path), calls), manifest)
+    assert calls == ["copy", "size"]
+
+    # a removed output reruns its stage
+    calls.clear()
+    os.remove(os.path.join(tmp_path, "upper"))
+    run_dag(get_stages(str(tmp_path), calls), manifest)
+    assert calls == ["upper"]
+
+    calls.clear()
+    run_dag(get_stages(str(tmp_path), calls), manifest, force=True)
+    assert sorted(calls) == ["copy", "size", "upper"]
+
+
+def test_run_dag_parallel_branches(tmp_path):
+    """
+    Test independent stages run at the same time
+
+    :return:
+    """
+    # each branch waits for the other one, a sequential run would time out
+    barrier = threading.Barrier(2, timeout=5)
+    stages = [
+        Stage("first", barrier.wait, cache=False),
+        Stage("second", barrier.wait, cache=False),
+    ]
+
+    report = run_dag(stages, os.path.join(tmp_path, "_dag_manifest.json"))
+
+    assert [entry["status"] for entry in report.values()] == ["ok", "ok"]
+
+
+def test_run_dag_failure(tmp_path):
+    """
+    Test a failed stage skips the stages after it, but not the independent
+    ones, and is raised with its error
+
+    :return:
+    """
+    calls = []
+
+    def fail():
+        raise Exception("no connection")
+
+    stages = [
+        Stage("load", fail),
+        Stage("index", lambda: calls.append("index"), after=["load"]),
+        Stage("visualize", lambda: calls.append("visualize")),
+    ]
+
+    with pytest.raises(Exception, match=r"load \(Exception: no connection\)"):
+        run_dag(stages, os.path.join(tmp_path, "_dag_manifest.json"))
+    assert calls == ["visualize"]
+
+
+def test_run_dag_check_failure(tmp_path):
+    """
+    Test a stage whose check fails is run again, its error being the one of
+    the stage, while the other stages still run
+
+    :return:
+    """
+    manifest = os.path.join(tmp_path, "_dag_manifest.json")
+    calls = []
+    connected = [True]
+
+    def check():
+        if not connected[0]:
+            raise Exception("no connection")
+        return True
+
+    def load():
+        calls.append("load")
+        if not connected[0]:
+            raise Exception("no connection")
+
+    stages = [
+        Stage("load", load, check=check),
+        Stage("visualize", lambda: calls.append("visualize")),
+    ]
+    run_dag(stages, manifest)
+    connected[0] = False
+
+    with pytest.raises(Exception, match=r"load \(Exception: no connection\)"):
+        run_dag(stages, manifest)
+    assert calls == ["load", "visualize", "load"]
+
+
+def test_check_dag():
+    """
+    Test cycles and unknown stages raise
+
+    :return:
+    """
+    with pytest.raises(Exception, match="depend on each other"):
+        check_dag(
+            [
+                Stage("a", print, after=["c"]),
+                Stage("b", print, after=["a"]),
+                Stage("c", print, after=["b"]),
+            ]
+        )
+    with pytest.raises(Exception, match="unknown stages"):
+        check_dag([Stage("a", print, after=["b"])])
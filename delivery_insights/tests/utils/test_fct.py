@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from delivery_insights.utils.fct import (
+    get_daytime_bands,
+    get_hours,
+    get_vehicule_age_bands,
+    set_daytime_bands,
+    set_vehicule_age_bands,
+)
+
+
+def test_get_hours():
+    """
+    Test hours parsing from times
+
+    :return:
+    """
+    times = pd.Series(["17:00", "10:30", None, "17:45"])
+
+    result = get_hours(times)
+
+    assert result.iloc[[0, 1, 3]].tolist() == [17, 10, 17]
+    assert np.isnan(result.iloc[2])
+
+
+def test_get_daytime_bands():
+    """
+    Test vectorized daytime bands against set_daytime_bands
+
+    :return:
+    """
+    hours = pd.Series(range(24))
+
+    result = get_daytime_bands(hours)
+
+    assert result.dtype == "category"
+    assert result.tolist() == hours.apply(set_daytime_bands).tolist()
+    assert result[23] == result[4] == "night (23-5)"
+
+
+def test_get_vehicule_age_bands():
+    """
+    Test vectorized vehicle age bands against set_vehicule_age_bands
+
+    :return:
+    """
+    ages = pd.Series([-1, 0, 4, 5, 9.5, 10, 14, 15, 40, np.nan])
+
+    result = get_vehicule_age_bands(ages)
+
+    assert result.dtype == "category"
+    assert result.tolist() == ages.apply(set_vehicule_age_bands).tolist()
+    assert result.iloc[-1] == "Data missing"
@@ -0,0 +1,104 @@
+import json
+import os
+import pstats
+
+import pandas as pd
+import pytest
+
+from delivery_insights.utils import profiling
+
+
+@pytest.fixture
+def metrics_file(tmp_path):
+    """
+    Record stages in a temporary metrics file and profile folder
+
+    :return:
+    """
+    metrics_file = os.path.join(tmp_path, "metrics.jsonl")
+    profiling.configure(
+        metrics_file=metrics_file, profile_folder=os.path.join(tmp_path, "profile")
+    )
+    yield metrics_file
+    profiling.configure()
+
+
+@profiling.profiled
+def double_rows(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stage of the tests
+
+    :param data:
+    :return:
+    """
+    with profiling.stage("concat"):
+        return pd.concat([data, data])
+
+
+def read_records(metrics_file: str) -> list:
+    """
+    Read stage records of a metrics file
+
+    :param metrics_file:
+    :return:
+    """
+    with open(metrics_file) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_profiled(metrics_file):
+    """
+    Test nested stages are recorded with their rows and outermost stages
+    profiled
+
+    :return:
+    """
+    double_rows(pd.DataFrame({"a": [1, 2, 3]}))
+    double_rows(pd.DataFrame({"a": [1]}))
+
+    records = read_records(metrics_file)
+    assert [(r["stage"], r["parent"]) for r in records] == [
+        ("concat", "double_rows"),
+        ("double_rows", None),
+    ] * 2
+    assert (records[1]["input_rows"], records[1]["rows"]) == (3, 6)
+    assert records[1]["status"] == "ok"
+    assert records[1]["wall_s"] >= records[0]["wall_s"]
+    assert {"cpu_s", "peak_rss_delta_mb", "peak_rss_mb"}.issubset(records[1])
+
+    profile_folder = os.path.join(os.path.dirname(metrics_file), "profile")
+    assert os.listdir(profile_folder) == ["double_rows.pstats"]
+    stats = pstats.Stats(os.path.join(profile_folder, "double_rows.pstats"))
+    assert stats.total_calls > 0
+
+
+def test_profiled_iter(metrics_file):
+    """
+    Test each chunk of a generator is recorded and failures are marked
+
+    :return:
+    """
+    chunks = (pd.DataFrame({"a": range(n)}) for n in [2, 5])
+
+    assert [len(c) for c in profiling.profiled_iter("merge", chunks)] == [2, 5]
+    with pytest.raises(ZeroDivisionError):
+        with profiling.stage("failing"):
+            1 / 0
+
+    records = read_records(metrics_file)
+    assert [r.get("rows") for r in records if r["stage"] == "merge"] == [2, 5, None]
+    assert records[-1]["status"] == "error"
+
+
+def test_disabled(tmp_path):
+    """
+    Test nothing is recorded without settings
+
+    :return:
+    """
+    assert not profiling.is_enabled()
+
+    result = double_rows(pd.DataFrame({"a": [1]}))
+
+    assert len(result) == 2
+    assert os.listdir(tmp_path) == []
@@ -1,20 +1,93 @@
 import argparse
-import os.path
+import os
 import sys
 
+# Names of models.backends.BACKENDS and loader.formats.FORMATS, repeated so
+# that parsing arguments does not import pandas
+BACKEND_NAMES = ["memory", "year", "hash", "duckdb"]
+FORMAT_NAMES = ["csv", "csv.gz", "parquet", "feather"]
 
-def parse_arguments():
+
+def get_main_parser() -> argparse.ArgumentParser:
     """
-    Parse arguments from command line
+    Get parser of the arguments of main
 
     :return:
     """
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(prog="delivery_insights")
     parser.add_argument(
         "--output-folder", help="Path to output folder where to store charts", type=str
     )
     parser.add_argument("--db-config-file", help="Path to database.ini file", type=str)
-    args = parser.parse_args()
+    parser.add_argument(
+        "--join-mode",
+        help="memory: merge full files, year/hash: merge partition by partition, "
+        "duckdb: merge with DuckDB spilling to disk, read back in batches",
+        choices=BACKEND_NAMES,
+        default="memory",
+        type=str,
+    )
+    parser.add_argument(
+        "--partitions",
+        help="Number of partitions of hash join mode",
+        default=16,
+        type=int,
+    )
+    parser.add_argument(
+        "--memory-limit",
+        help="Memory DuckDB uses before spilling to disk in duckdb join mode, i.e 4GB",
+        type=str,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of processes transforming Year partitions and rendering charts",
+        default=os.cpu_count(),
+        type=int,
+    )
+    parser.add_argument(
+        "--incremental",
+        help="Only process years whose data changed since the last incremental run",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--keep-zip",
+        help="Keep Kaggle zip archives and read csv files out of them",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--output-format",
+        help="Format of transformed files, described by a schema sidecar file",
+        choices=FORMAT_NAMES,
+        default="csv",
+        type=str,
+    )
+    parser.add_argument(
+        "--force",
+        help="Run every stage, even those whose inputs did not change since their "
+        "last run",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="JSON lines file of stage timings, OUTPUT_FOLDER/metrics.jsonl by default",
+        type=str,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Dump cProfile stats of each stage in OUTPUT_FOLDER/profile",
+        action="store_true",
+    )
+    return parser
+
+
+def parse_arguments(argv: list = None) -> dict:
+    """
+    Parse arguments from command line
+
+    :param argv: arguments, sys.argv ones when None
+    :return:
+    """
+    args = get_main_parser().parse_args(argv)
     output_folder = args.output_folder
     db_config_file = args.db_config_file
 
@@ -27,7 +100,167 @@ def parse_arguments():
                 raise Exception("Please set a correct path to database ini file")
             else:
                 db_config_file = os.path.join(os.getcwd(), "../../conf/database.ini")
-        return {"output_folder": output_folder, "db_config_file": db_config_file}
+        return {
+            "output_folder": output_folder,
+            "db_config_file": db_config_file,
+            "join_mode": args.join_mode,
+            "partitions": args.partitions,
+            "memory_limit": args.memory_limit,
+            "workers": args.workers,
+            "incremental": args.incremental,
+            "keep_zip": args.keep_zip,
+            "output_format": args.output_format,
+            "force": args.force,
+            "metrics_file": args.metrics_file
+            or os.path.join(output_folder, "metrics.jsonl"),
+            "profile_folder": os.path.join(output_folder, "profile")
+            if args.profile
+            else None,
+        }
     except Exception as e:
         print(f"Error: {e}")
-        sys.exit()
+        sys.exit(1)
+
+
+def get_extract_parser() -> argparse.ArgumentParser:
+    """
+    Get parser of the arguments of extract_pipeline
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="extract_pipeline")
+    parser.add_argument("--repo", help="repo name", type=str)
+    parser.add_argument("--files-list", nargs="*", help="files list", type=str)
+    parser.add_argument("--output-folder", help="Output folder", type=str)
+    parser.add_argument(
+        "--keep-zip",
+        help="Keep Kaggle zip archives instead of decompressing them",
+        action="store_true",
+    )
+    return parser
+
+
+def get_stage_parser() -> argparse.ArgumentParser:
+    """
+    Get parser of the arguments of stage_pipeline
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="stage_pipeline")
+    parser.add_argument("--input-folder", help="input folder", type=str)
+    parser.add_argument("--files-list", nargs="*", help="files list", type=str)
+    return parser
+
+
+def get_transform_parser() -> argparse.ArgumentParser:
+    """
+    Get parser of the arguments of transform_pipeline
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="transform_pipeline")
+    parser.add_argument("--input-folder", help="Input folder", type=str)
+    parser.add_argument("--filename", help="file to transform", type=str)
+    parser.add_argument("--output-folder", help="Output folder", type=str)
+    parser.add_argument("--columns", nargs="*", help="columns to keep", type=str)
+    parser.add_argument(
+        "--backend",
+        help="Merge and transform accidents and vehicles files of input folder with "
+        "this backend instead of reading a file",
+        choices=BACKEND_NAMES,
+        type=str,
+    )
+    parser.add_argument(
+        "--memory-limit",
+        help="Memory DuckDB uses before spilling to disk with the duckdb backend",
+        type=str,
+    )
+    parser.add_argument(
+        "--output-format",
+        help="Format of the transformed file, described by a schema sidecar file",
+        choices=FORMAT_NAMES,
+        default="csv",
+        type=str,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of processes transforming Year partitions",
+        default=1,
+        type=int,
+    )
+    return parser
+
+
+def get_load_parser() -> argparse.ArgumentParser:
+    """
+    Get parser of the arguments of load_pipeline
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="load_pipeline")
+    parser.add_argument("--input-folder", help="input folder", type=str)
+    parser.add_argument("--filename", help="filename", type=str)
+    parser.add_argument(
+        "--areas-folder",
+        help="Folder of saved area aggregates to load instead of a file",
+        type=str,
+    )
+    parser.add_argument("--db-config-file", help="Path to db config file", type=str)
+    parser.add_argument(
+        "--chunksize", help="Rows sent per COPY statement", default=100_000, type=int
+    )
+    parser.add_argument(
+        "--copy-format",
+        help="COPY format",
+        choices=["csv", "binary"],
+        default="csv",
+        type=str,
+    )
+    return parser
+
+
+def get_visualize_parser() -> argparse.ArgumentParser:
+    """
+    Get parser of the arguments of visualize_pipeline
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="visualize_pipeline")
+    parser.add_argument("--input-folder", help="input folder", type=str)
+    parser.add_argument("--filename", help="filename", type=str)
+    parser.add_argument("--output-folder", help="Output folder", type=str)
+    parser.add_argument(
+        "--cube-folder",
+        help="Folder of a saved accidents cube to draw charts from instead of a file",
+        type=str,
+    )
+    parser.add_argument(
+        "--grid-folder",
+        help="Folder of a saved spatial index to draw the accident hotspot map from",
+        type=str,
+    )
+    parser.add_argument(
+        "--raster-folder",
+        help="Folder of raster tiles to draw the fatal and serious accidents "
+        "heatmap from",
+        type=str,
+    )
+    parser.add_argument(
+        "--backend",
+        help="Count accidents and vehicles files of input folder with this backend "
+        "instead of reading a transformed file",
+        choices=BACKEND_NAMES,
+        type=str,
+    )
+    parser.add_argument(
+        "--memory-limit",
+        help="Memory DuckDB uses before spilling to disk with the duckdb backend",
+        type=str,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of chart rendering processes",
+        default=os.cpu_count(),
+        type=int,
+    )
+    return parser
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DAG_MANIFEST = "_dag_manifest.json"
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        func,
+        after: list = None,
+        inputs: list = None,
+        outputs: list = None,
+        params: dict = None,
+        check=None,
+        cache: bool = True,
+    ):
+        """
+        Stage of a DAG, run once the stages it comes after succeeded
+
+        A cached stage is skipped when its inputs and params are those of its
+        last successful run, and its outputs were not changed since.
+
+        :param name:
+        :param func: function run without arguments
+        :param after: names of the stages it depends on
+        :param inputs: files or folders read by func
+        :param outputs: files or folders written by func
+        :param params: settings changing what func writes
+        :param check: function telling whether outputs out of files are still
+            there, i.e rows of a table, when the stage would be skipped
+        :param cache: skip the stage when nothing changed
+        """
+        self.name = name
+        self.func = func
+        self.after = after or []
+        self.inputs = inputs or []
+        self.outputs = outputs or []
+        self.params = params or {}
+        self.check = check
+        self.cache = cache
+
+    def get_fingerprint(self) -> str:
+        """
+        Get fingerprint of the inputs and params of the stage
+
+        :return:
+        """
+        return _hash({"params": self.params, "inputs": _stat_paths(self.inputs)})
+
+    def get_outputs_fingerprint(self) -> str:
+        """
+        Get fingerprint of the outputs of the stage
+
+        :return:
+        """
+        return _hash(_stat_paths(self.outputs))
+
+    def is_up_to_date(self, entry: dict) -> bool:
+        """
+        Check the stage can be skipped
+
+        :param entry: manifest entry of the last successful run
+        :return:
+        """
+        if not self.cache or entry is None:
+            return False
+        if any(not os.path.exists(path) for path in self.outputs):
+            return False
+        if entry["inputs"] != self.get_fingerprint():
+            return False
+        if entry["outputs"] != self.get_outputs_fingerprint():
+            return False
+        if self.check is None:
+            return True
+        # a check failing, i.e on an unreachable database, makes the stage run
+        # and report the error instead of stopping the other stages
+        try:
+            return bool(self.check())
+        except Exception as e:
+            print(f"Stage {self.name} check failed: {type(e).__name__}: {e}")
+            return False
+
+
+def run_dag(stages: list, manifest_path: str, force: bool = False) -> dict:
+    """
+    Run stages in order of their dependencies, independent stages being run
+    at the same time by threads
+
+    A failed stage does not stop the stages that do not depend on it, the
+    ones depending on it are skipped. Every stage is reported once all are
+    done, and failures are raised.
+
+    :param stages: list of Stage
+    :param manifest_path: JSON file of the fingerprints of successful runs
+    :param force: run every stage, even the up to date ones
+    :return: report of each stage: status ("ok", "cached", "failed" or
+        "skipped"), wall time and error
+    """
+    stages = {stage.name: stage for stage in stages}
+    check_dag(list(stages.values()))
+    manifest = read_dag_manifest(manifest_path)
+    report = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(stages))) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(upstream not in report for upstream in stage.after):
+                    continue
+                del pending[name]
+                if any(
+                    report[upstream]["status"] in ["failed", "skipped"]
+                    for upstream in stage.after
+                ):
+                    report[name] = {
+                        "status": "skipped",
+                        "wall_s": 0.0,
+                        "error": "an upstream stage failed",
+                    }
+                elif not force and stage.is_up_to_date(manifest.get(name)):
+                    print(f"Stage {name} is up to date.")
+                    report[name] = {"status": "cached", "wall_s": 0.0}
+                else:
+                    print(f"Running stage {name}")
+                    running[executor.submit(_run_stage, stage)] = name
+            if not running:
+                continue
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                report[name] = future.result()
+                if report[name]["status"] == "ok":
+                    stage = stages[name]
+                    manifest[name] = {
+                        "inputs": stage.get_fingerprint(),
+                        "outputs": stage.get_outputs_fingerprint(),
+                    }
+                else:
+                    manifest.pop(name, None)
+                write_dag_manifest(manifest_path, manifest)
+
+    report = {name: report[name] for name in stages}
+    print_report(report)
+    failed = [name for name, entry in report.items() if entry["status"] == "failed"]
+    if failed:
+        raise Exception(
+            "Stages failed: "
+            + ", ".join(f"{name} ({report[name]['error']})" for name in failed)
+        )
+    return report
+
+
+def check_dag(stages: list) -> None:
+    """
+    Check stage names are unique, stages depend on known stages and there is
+    no cycle
+
+    :param stages: list of Stage
+    :return:
+    """
+    names = [stage.name for stage in stages]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise Exception(f"Stages {duplicates} are defined several times.")
+    for stage in stages:
+        unknown = [upstream for upstream in stage.after if upstream not in names]
+        if unknown:
+            raise Exception(f"Stage {stage.name} comes after unknown stages {unknown}.")
+
+    # stages are removed once all their upstream stages are removed
+    remaining = {stage.name: set(stage.after) for stage in stages}
+    while remaining:
+        ready = [name for name, after in remaining.items() if not after & set(remaining)]
+        if not ready:
+            raise Exception(f"Stages {sorted(remaining)} depend on each other.")
+        for name in ready:
+            del remaining[name]
+
+
+def read_dag_manifest(path: str) -> dict:
+    """
+    Read fingerprints of the last successful run of each stage, empty when
+    there was no run
+
+    :param path:
+    :return:
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_dag_manifest(path: str, manifest: dict) -> None:
+    """
+    Write fingerprints of successful runs, under a temporary name renamed once
+    complete
+
+    :param path:
+    :param manifest:
+    :return:
+    """
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def print_report(report: dict) -> None:
+    """
+    Print status, wall time and error of each stage
+
+    :param report: run_dag report
+    :return:
+    """
+    for name, entry in report.items():
+        line = f"{name}: {entry['status']} ({entry['wall_s']:.1f}s)"
+        if entry.get("error"):
+            line += f" {entry['error']}"
+        print(line)
+
+
+def _run_stage(stage: Stage) -> dict:
+    """
+    Run a stage in a thread, catching its error
+
+    :param stage:
+    :return: status, wall time and error of the stage
+    """
+    start = time.perf_counter()
+    try:
+        stage.func()
+        return {"status": "ok", "wall_s": time.perf_counter() - start}
+    except Exception as e:
+        print(f"Stage {stage.name} failed:")
+        traceback.print_exc()
+        return {
+            "status": "failed",
+            "wall_s": time.perf_counter() - start,
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def _stat_paths(paths: list) -> dict:
+    """
+    Get size and modification time of files, and of the files of folders
+
+    :param paths:
+    :return: stats by path, None for missing paths
+    """
+    stats = {}
+    for path in paths:
+        if os.path.isdir(path):
+            stats[path] = sorted(
+                [os.path.relpath(os.path.join(root, name), path), *_stat(root, name)]
+                for root, _, names in os.walk(path)
+                for name in names
+            )
+        elif os.path.exists(path):
+            stats[path] = _stat(os.path.dirname(path), os.path.basename(path))
+        else:
+            stats[path] = None
+    return stats
+
+
+def _stat(folder: str, name: str) -> list:
+    """
+    Get size and modification time of a file
+
+    :param folder:
+    :param name:
+    :return:
+    """
+    stat = os.stat(os.path.join(folder, name))
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _hash(value) -> str:
+    """
+    Hash a JSON serializable value
+
+    :param value:
+    :return:
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
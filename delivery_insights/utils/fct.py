@@ -1,3 +1,28 @@
+import numpy as np
+import pandas as pd
+
+# Bands are described by their left-closed bin edges and one label per bin,
+# the first label covering values below the first edge and the last label
+# values above the last edge. A label can be repeated to wrap around.
+DAYTIME_BANDS = {
+    "edges": [5, 10, 15, 19, 23],
+    "labels": [
+        "night (23-5)",
+        "morning rush (5-10)",
+        "office hours (10-15)",
+        "afternoon rush (15-19)",
+        "evening (19-23)",
+        "night (23-5)",
+    ],
+}
+
+VEHICULE_AGE_BANDS = {
+    "edges": [5, 10, 15],
+    "labels": ["0-4", "5-9", "10-14", ">=15"],
+    "missing_label": "Data missing",
+}
+
+
 def set_daytime_bands(hour: int) -> str:
     """
     Set daytime depending on hours
@@ -32,3 +57,83 @@ def set_vehicule_age_bands(age: int) -> str:
         return ">=15"
     else:
         return "Data missing"
+
+
+def cut_bands(
+    values: pd.Series, edges: list, labels: list, missing_label: str = None
+) -> pd.Series:
+    """
+    Vectorized banding of numeric values into a categorical series
+
+    Missing values get missing_label when it is set, otherwise they fall in
+    the last band like in the scalar set_* functions.
+
+    :param values:
+    :param edges:
+    :param labels:
+    :param missing_label:
+    :return:
+    """
+    if len(labels) != len(edges) + 1:
+        raise Exception("Bands need exactly one label more than edges.")
+
+    values = pd.Series(values)
+    numbers = values.to_numpy(dtype="float64", na_value=np.nan)
+
+    categories = get_band_categories(labels, missing_label)
+    bin_codes = np.array([categories.index(label) for label in labels], dtype="int8")
+    codes = bin_codes[np.searchsorted(edges, numbers, side="right")]
+
+    if missing_label is not None:
+        codes[np.isnan(numbers)] = categories.index(missing_label)
+
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def get_band_categories(labels: list, missing_label: str = None) -> list:
+    """
+    Get categories of banded values, in order of bands
+
+    :param labels:
+    :param missing_label:
+    :return:
+    """
+    categories = list(dict.fromkeys(labels))
+    if missing_label is not None and missing_label not in categories:
+        categories.append(missing_label)
+    return categories
+
+
+def get_hours(times: pd.Series) -> pd.Series:
+    """
+    Get hours from "HH:MM" times, parsing each distinct time only once
+    :param times:
+    :return:
+    """
+    times = pd.Series(times).astype("category")
+    hours = pd.to_numeric(times.cat.categories.str[0:2]).to_numpy(dtype="float64")
+    # missing times have code -1, i.e. the appended NaN
+    hours = np.append(hours, np.nan)[times.cat.codes.to_numpy()]
+    return pd.Series(hours, index=times.index, name=times.name)
+
+
+def get_daytime_bands(hours: pd.Series) -> pd.Series:
+    """
+    Set daytime bands on a series of hours
+    :param hours:
+    :return:
+    """
+    return cut_bands(hours, **DAYTIME_BANDS)
+
+
+def get_vehicule_age_bands(ages: pd.Series) -> pd.Series:
+    """
+    Set age bands on a series of vehicle ages
+    :param ages:
+    :return:
+    """
+    return cut_bands(ages, **VEHICULE_AGE_BANDS)
@@ -0,0 +1,82 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Kilometers of a degree of latitude
+DEGREE_KM = np.pi * EARTH_RADIUS_KM / 180
+# Half of the earth circumference, the largest great circle distance
+MAX_DISTANCE_KM = np.pi * EARTH_RADIUS_KM
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Get great circle distances between points, arrays of degrees being
+    broadcast against each other
+
+    :param lat1:
+    :param lon1:
+    :param lat2:
+    :param lon2:
+    :return: distances in km
+    """
+    a = get_haversine(lat1, lon1, lat2, lon2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def get_haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Get the haversine of the central angles between points, which grows with
+    their distance, so that distances are compared to a radius without
+    computing them, see get_haversine_limit
+
+    :param lat1:
+    :param lon1:
+    :param lat2:
+    :param lon2:
+    :return:
+    """
+    lat1, lat2 = np.radians(lat1), np.radians(lat2)
+    return (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    )
+
+
+def get_haversine_limit(radius_km) -> np.ndarray:
+    """
+    Get the haversine of the central angle of distances, the one of points
+    within a distance being at most its limit
+
+    :param radius_km:
+    :return:
+    """
+    angle = np.minimum(np.asarray(radius_km, dtype="float64"), MAX_DISTANCE_KM)
+    return np.sin(angle / EARTH_RADIUS_KM / 2) ** 2
+
+
+def get_bbox(latitudes, longitudes, radius_km) -> tuple:
+    """
+    Get bounding boxes holding the circles of a radius around points
+
+    Meridians are closest on the pole side of a circle, so that boxes are
+    widened in longitude for its latitude. Circles reaching a pole span
+    every longitude.
+
+    :param latitudes: degrees
+    :param longitudes: degrees
+    :param radius_km: radius of each circle
+    :return: min latitudes, min longitudes, max latitudes and max longitudes
+    """
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    lat_radius = np.asarray(radius_km, dtype="float64") / DEGREE_KM
+    pole_side = np.abs(latitudes) + lat_radius
+    cos_lat = np.cos(np.radians(np.minimum(pole_side, 90.0)))
+    with np.errstate(divide="ignore"):
+        lon_radius = np.where(pole_side < 90.0, lat_radius / cos_lat, 360.0)
+    lon_radius = np.minimum(lon_radius, 360.0)
+    return (
+        latitudes - lat_radius,
+        longitudes - lon_radius,
+        latitudes + lat_radius,
+        longitudes + lon_radius,
+    )
@@ -0,0 +1,253 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # resource is not available on windows
+    resource = None
+
+# Where stage records and profiles go, nothing is recorded when both are None
+_settings = {"metrics_file": None, "profile_folder": None}
+# Names of the running stages of each thread, outermost first
+_local = threading.local()
+# Held by the only cProfile profiler enabled in the process
+_profiler_lock = threading.Lock()
+
+
+def configure(metrics_file: str = None, profile_folder: str = None) -> None:
+    """
+    Set where stage records and profiles are written
+
+    :param metrics_file: JSON lines file stage records are appended to
+    :param profile_folder: folder of the pstats file of each outermost stage
+    :return:
+    """
+    _settings["metrics_file"] = metrics_file
+    _settings["profile_folder"] = profile_folder
+    if profile_folder:
+        os.makedirs(profile_folder, exist_ok=True)
+
+
+def init_process(settings: dict = None) -> None:
+    """
+    Record stages of a pool process like its parent, cProfile profiles being
+    only taken in the parent process
+
+    :param settings: get_settings result of the parent process
+    :return:
+    """
+    if settings is None:
+        return
+    # forked processes inherit the profiler of the parent stage
+    sys.setprofile(None)
+    configure(metrics_file=settings["metrics_file"])
+
+
+def get_settings() -> dict:
+    """
+    Get current settings, to configure other processes the same way
+
+    :return:
+    """
+    return dict(_settings)
+
+
+def is_enabled() -> bool:
+    """
+    Check stages are recorded
+
+    :return:
+    """
+    return bool(_settings["metrics_file"] or _settings["profile_folder"])
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """
+    Record wall time, CPU time and peak RSS growth of a block as a JSON line
+
+    The yielded record can be completed by the block, e.g. with row counts.
+    The outermost stage of a process is also profiled with cProfile when a
+    profile folder is set, one profiler being active at a time. Profiles of a
+    stage run several times are summed in the same pstats file.
+
+    :param name:
+    :param fields: fields added to the record
+    :return: record of the stage
+    """
+    record = {"stage": name, **fields}
+    if not is_enabled():
+        yield record
+        return
+
+    stack = _get_stack()
+    record["parent"] = stack[-1] if stack else None
+    profiler = None
+    # stages of other threads are not profiled while one is
+    if _settings["profile_folder"] and not stack and _profiler_lock.acquire(False):
+        profiler = cProfile.Profile()
+    stack.append(name)
+
+    status = "error"
+    start_rss = _max_rss_mb()
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+        status = "ok"
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+        end_rss = _max_rss_mb()
+        stack.pop()
+
+        record.update(
+            {
+                "status": status,
+                "wall_s": round(wall, 6),
+                "cpu_s": round(cpu, 6),
+                "peak_rss_delta_mb": _round(end_rss - start_rss),
+                "peak_rss_mb": _round(end_rss),
+                "pid": os.getpid(),
+                "time": time.time(),
+            }
+        )
+        write_record(record)
+        if profiler is not None:
+            dump_profile(profiler, name)
+
+
+def profiled(fct):
+    """
+    Decorator recording each call of fct as a stage named after it, with the
+    rows of its first DataFrame or Series argument and of its result
+
+    :param fct:
+    :return:
+    """
+
+    @functools.wraps(fct)
+    def wrapper(*args, **kwargs):
+        if not is_enabled():
+            return fct(*args, **kwargs)
+
+        with stage(fct.__qualname__) as record:
+            input_rows = next(
+                (len(v) for v in (*args, *kwargs.values()) if _is_frame(v)),
+                None,
+            )
+            if input_rows is not None:
+                record["input_rows"] = input_rows
+            result = fct(*args, **kwargs)
+            if _is_frame(result):
+                record["rows"] = len(result)
+        return result
+
+    return wrapper
+
+
+def profiled_iter(name: str, chunks):
+    """
+    Record the production of each chunk of a generator as a stage
+
+    :param name:
+    :param chunks: iterable of DataFrames
+    :return: generator of the same chunks
+    """
+    chunks = iter(chunks)
+    while True:
+        with stage(name) as record:
+            chunk = next(chunks, None)
+            if chunk is not None and _is_frame(chunk):
+                record["rows"] = len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def write_record(record: dict) -> None:
+    """
+    Append a stage record to the metrics file
+
+    :param record:
+    :return:
+    """
+    if not _settings["metrics_file"]:
+        return
+    # a single short write per line, so that processes can share the file
+    with open(_settings["metrics_file"], "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+def dump_profile(profiler: cProfile.Profile, name: str) -> str:
+    """
+    Add profiler stats to the pstats file of a stage
+
+    :param profiler:
+    :param name:
+    :return: path of the pstats file
+    """
+    path = os.path.join(_settings["profile_folder"], f"{name}.pstats")
+    stats = pstats.Stats(profiler)
+    if os.path.exists(path):
+        stats.add(path)
+    stats.dump_stats(path)
+    return path
+
+
+def _get_stack() -> list:
+    """
+    Get names of the running stages of the current thread
+
+    :return:
+    """
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _max_rss_mb() -> float:
+    """
+    Get peak resident set size of the process
+
+    :return:
+    """
+    if resource is None:
+        return float("nan")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return max_rss / 1e6 if sys.platform == "darwin" else max_rss / 1024
+
+
+def _is_frame(value) -> bool:
+    """
+    Check value has rows to count
+
+    :param value:
+    :return:
+    """
+    return isinstance(value, (pd.DataFrame, pd.Series))
+
+
+def _round(value: float):
+    """
+    Round a measure, None when it is not available
+
+    :param value:
+    :return:
+    """
+    return None if value != value else round(value, 3)
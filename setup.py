@@ -21,11 +21,12 @@ setup(
     ],
     entry_points={
         "console_scripts": [
-            "delivery_insights=delivery_insights.main:main",
-            "extract_pipeline=delivery_insights.pipelines.extract.pipeline:extract_pipeline",
-            "transform_pipeline=delivery_insights.pipelines.transform.pipeline:transform_pipeline",
-            "load_pipeline=delivery_insights.pipelines.load.pipeline:load_pipeline",
-            "visualize_pipeline=delivery_insights.pipelines.visualize.pipeline:visualize_pipeline",
+            "delivery_insights=delivery_insights.cli:main",
+            "extract_pipeline=delivery_insights.cli:extract_pipeline",
+            "stage_pipeline=delivery_insights.cli:stage_pipeline",
+            "transform_pipeline=delivery_insights.cli:transform_pipeline",
+            "load_pipeline=delivery_insights.cli:load_pipeline",
+            "visualize_pipeline=delivery_insights.cli:visualize_pipeline",
         ]
     },
 )